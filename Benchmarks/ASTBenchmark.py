@@ -0,0 +1,52 @@
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import Parser.AST as AST
+from Scanner.Scanner import Scanner
+from Parser.StructurePass import StructurePass
+from Parser.FunctionPass import FunctionPass
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+from Benchmarks.Common import inTemporaryDirectory, everyNode
+
+# Run with: python -m Benchmarks.ASTBenchmark [functions]
+# Parses every body of a generated module and measures what the trees hold on to once they're built,
+# as a whole and per node, along with the shallow size of a node of each class
+
+def shallowSize(node: AST.Node) -> int:
+    size = sys.getsizeof(node)
+    if hasattr(node, "__dict__"):
+        size += sys.getsizeof(node.__dict__)
+    return size
+
+if __name__ == "__main__":
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with inTemporaryDirectory() as directory:
+        root = ProgramGenerator(ProgramShape(functions=functions, longLines=functions // 200, longLineTerms=500)).write(directory)
+        _, tokens = Scanner.scan(os.path.basename(root))
+        success, module = StructurePass(tokens)
+        if not success:
+            raise Exception("Generated program didn't get through the structure pass: " + str(module[0]))
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    success, parsed = FunctionPass(module)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    if not success:
+        raise Exception("Generated program didn't get through the function pass: " + str(parsed[0]))
+
+    nodes = [node for function in parsed for node in everyNode(function.body)]
+    byClass = {}
+    for node in nodes:
+        byClass.setdefault(node.__class__.__name__, node)
+    print("bodies: %d  nodes: %d  parse: %.1f ms" % (len(parsed), len(nodes), seconds * 1e3))
+    print("retained: %.1f KiB, %.1f bytes per node" % (retained / 1024, retained / len(nodes)))
+    print("shallow node sizes: " + ", ".join([name + " " + str(shallowSize(node)) for name, node in sorted(byClass.items())]))
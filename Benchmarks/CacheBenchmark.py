@@ -0,0 +1,58 @@
+import os
+import sys
+
+from Scanner.Scanner import Scanner
+from Scanner.TokenCache import TokenCache
+from Benchmarks.ParallelBenchmark import writeProject
+from Benchmarks.Common import timed, inTemporaryDirectory
+
+# Run with: python -m Benchmarks.CacheBenchmark [files] [lines per file] [changed files]
+# Times an uncached scan, a cold cache, a warm cache, and a warm cache after a few files have changed,
+# like a CI rebuild of a mostly unchanged tree. Then squeezes the cache to check eviction keeps it in bounds
+
+def timedScan(filename: str, compact: bool, cache: TokenCache | None) -> tuple[float, tuple]:
+    return timed(lambda: Scanner.scan(filename, compact=compact, cache=cache))
+
+if __name__ == "__main__":
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    changed = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    allIdentical = True
+    with inTemporaryDirectory() as directory:
+        root = writeProject(directory, files, lines)
+        cacheDirectory = os.path.join(directory, TokenCache.DIRECTORY)
+        print("files:", files, " lines each:", lines)
+        for compact in [False, True]:
+            plainTime, (_, expected) = timedScan(root, compact, None)
+            cache = TokenCache(cacheDirectory + ("-compact" if compact else ""))
+            coldTime, (_, cold) = timedScan(root, compact, cache)
+            cache = TokenCache(cache.directory)
+            warmTime, (_, warm) = timedScan(root, compact, cache)
+            print("\t" + ("compact" if compact else "list"))
+            print("\t\tuncached:  %.4fs" % plainTime)
+            print("\t\tcold:      %.4fs" % coldTime)
+            print("\t\twarm:      %.4fs  %.1fx" % (warmTime, plainTime / warmTime))
+            print("\t\t" + cache.stats.report())
+            allIdentical = allIdentical and list(cold) == list(expected) and list(warm) == list(expected)
+
+        for i in range(changed):
+            with open("f" + str(i) + ".syl", "a") as io:
+                io.write("\nchanged" + str(i) + " := " + str(i))
+        _, (_, expected) = timedScan(root, False, None)
+        cache = TokenCache(cacheDirectory)
+        editedTime, (_, edited) = timedScan(root, False, cache)
+        print("\tafter changing %d files: %.4fs" % (changed, editedTime))
+        print("\t\t" + cache.stats.report())
+        allIdentical = allIdentical and edited == expected
+
+        limit = cache.totalBytes // 4
+        small = TokenCache(cacheDirectory, limit)
+        small.evict()
+        timedScan(root, False, small)
+        onDisk = sum([os.path.getsize(os.path.join(cacheDirectory, name)) for name in os.listdir(cacheDirectory)])
+        print("\tsqueezed to %d bytes: %d on disk" % (limit, onDisk))
+        print("\t\t" + small.stats.report())
+        allIdentical = allIdentical and onDisk <= limit
+        print("\tidentical:", allIdentical)
+    sys.exit(0 if allIdentical else 1)
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+import Core
+import Parser.AST as AST
+from Scanner.Tokens import *
+from Parser.TypeParser import children
+
+# What the benchmarks share. Each one is run from the repository root with python -m Benchmarks.<name>,
+# which is what puts the compiler's modules on the path for them
+
+LOCATION = Core.SourceInfo("bench.syl", 0, 0)
+
+# Seconds taken by a single run, and what it gave back
+def timed(run: Callable[[], object]) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = run()
+    return time.perf_counter() - start, result
+
+# Average seconds per run over however many repeats
+def perRun(run: Callable[[], object], repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        run()
+    return (time.perf_counter() - start) / repeats
+
+# The fastest of a few runs, which is less at the mercy of whatever else the machine is doing than an average
+def best(run: Callable[[], object], repeats: int) -> tuple[float, object]:
+    fastest = float("inf")
+    result = None
+    for _ in range(repeats):
+        seconds, result = timed(run)
+        fastest = min(fastest, seconds)
+    return fastest, result
+
+# Makes a temporary directory and works from inside it, for benchmarks that write out programs to compile
+@contextmanager
+def inTemporaryDirectory() -> Iterator[str]:
+    with tempfile.TemporaryDirectory() as directory:
+        previous = os.getcwd()
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            os.chdir(previous)
+
+def literal() -> AST.Node:
+    return AST.Literal(Token(TT.Literal, LiteralType.IntLit, LOCATION, "1"))
+
+def everyNode(root: AST.Node) -> List[AST.Node]:
+    nodes = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(children(node))
+    return nodes
@@ -0,0 +1,94 @@
+import sys
+
+import Core
+from Scanner.Scanner import Scanner, ScanEngine
+from Parser.StructurePass import StructurePass, StructureModule
+from Parser.FunctionPass import FunctionPass
+from Parser.TokenList import TokenList
+from Parser.Types import parseType
+from Parser.TypeParser import TypeTable, inferTypes
+from Benchmarks.Common import perRun, inTemporaryDirectory
+
+# Run with: python -m Benchmarks.ErrorBenchmark [repeats] [--print]
+# Structures files whose every definition is broken somewhere deep in a type, scans with the reader engine a
+# file of nothing but bad tags and strings, parses function bodies broken deep in an expression, type checks
+# bodies using variables that don't exist, and parses type expressions that are all wrong. Each of those runs
+# into the error limit or an error per expression. The same done on correct input shows what reporting costs
+# when nothing goes wrong. --print shows every error message, to check they haven't changed
+#
+# "raising" is what the same row took when body parsing, parseType and the reader engine still raised each error
+# and caught it again further up, the best of many runs on the same machine as the new numbers then were. They're
+# only kept for rows whose work is the same either side: the structure pass recovers differently now, and the
+# raising type checker couldn't type the inference inputs at all, so those rows have none. Timings here move by
+# a third from run to run, so compare against the best of a few: bad bodies went 654 -> 417, bad types 89 -> 49 and
+# bad lexing 362 -> 310, while good bodies went 653 -> 687 for the extra check at each level
+
+NESTING = "((i32, " * 6 + "{0}" + ") -> i32)" * 6
+EXPRESSION = "(" * 8 + "a + {0}" + ")" * 8
+PRELUDE = "@infix\nfunc +(a: i32, b: i32) -> i32 = a\n"
+
+INPUTS = {
+    "bad functions": "\n".join(["func broken{0}(a: {1}) -> i32 {{\n    return a\n}}".format(i, NESTING.format("Missing" + str(i))) for i in range(Core.MAX_ERRORS)]),
+    "good functions": "\n".join(["func fine{0}(a: {1}) -> i32 {{\n    return a\n}}".format(i, NESTING.format("i32")) for i in range(Core.MAX_ERRORS)]),
+    "bad typedefs": "\n".join(["using Broken{0} = {1} or (i32, i32)".format(i, NESTING.format("i32 ptr[x]")) for i in range(Core.MAX_ERRORS)]),
+    "bad lexing": "\n".join(["@unknown{0} \"unterminated {0}".format(i) for i in range(Core.MAX_ERRORS)]),
+    "bad bodies": PRELUDE + "\n".join(["func broken{0}(a: i32) -> i32 {{\n    return {1}\n}}".format(i, EXPRESSION.format("")) for i in range(Core.MAX_ERRORS)]),
+    "good bodies": PRELUDE + "\n".join(["func fine{0}(a: i32) -> i32 {{\n    return {1}\n}}".format(i, EXPRESSION.format("a")) for i in range(Core.MAX_ERRORS)]),
+    "bad inference": PRELUDE + "\n".join(["func broken{0}(a: i32) -> i32 {{\n    return {1}\n}}".format(i, EXPRESSION.format("missing" + str(i))) for i in range(Core.MAX_ERRORS)]),
+    "good inference": PRELUDE + "\n".join(["func fine{0}(a: i32) -> i32 {{\n    return {1}\n}}".format(i, EXPRESSION.format("a")) for i in range(Core.MAX_ERRORS)]),
+}
+
+RAISING = {"bad lexing": 362.2, "bad bodies": 653.8, "good bodies": 652.6, "bad types": 89.3, "good types": 112.8}
+
+def inferAll(parsed: list) -> tuple[bool, list]:
+    errors = [error for error in [inferTypes(function.body, TypeTable(function.symbols)) for function in parsed] if isinstance(error, Core.CompileError)]
+    return len(errors) == 0, errors
+
+def raising(name: str) -> str:
+    return "%.1f" % RAISING[name] if name in RAISING else "-"
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 200
+    printing = "--print" in sys.argv
+
+    with inTemporaryDirectory() as directory:
+        print("%-16s %-10s %8s %14s %14s" % ("input", "stage", "errors", "per run (us)", "raising (us)"))
+        for name, text in INPUTS.items():
+            filename = name.replace(" ", "_") + ".syl"
+            with open(filename, "w") as io:
+                io.write(text + "\n")
+            if name == "bad lexing":
+                stage = "reader"
+                run = lambda: Scanner.scan(filename, ScanEngine.Reader)
+            elif name.endswith("bodies"):
+                stage = "functions"
+                _, tokens = Scanner.scan(filename)
+                _, module = StructurePass(tokens)
+                run = lambda: FunctionPass(module)
+            elif name.endswith("inference"):
+                stage = "types"
+                _, tokens = Scanner.scan(filename)
+                _, module = StructurePass(tokens)
+                _, parsed = FunctionPass(module)
+                run = lambda: inferAll(parsed)
+            else:
+                stage = "structure"
+                _, tokens = Scanner.scan(filename)
+                run = lambda: StructurePass(tokens)
+            success, result = run()
+            errors = [] if success else result
+            print("%-16s %-10s %8d %14.1f %14s" % (name, stage, len(errors), perRun(run, repeats) * 1e6, raising(name)))
+            if printing:
+                for error in errors:
+                    print("\t", error)
+
+        types = StructureModule.getGlobalTypes()
+        for name, written in [("bad types", NESTING.format("Missing")), ("good types", NESTING.format("i32"))]:
+            with open("type.syl", "w") as io:
+                io.write(written + "\n")
+            _, tokens = Scanner.scan("type.syl")
+            result = parseType(types, TokenList(tokens))
+            failed = isinstance(result, Core.CompileError)
+            print("%-16s %-10s %8d %14.1f %14s" % (name, "parseType", int(failed), perRun(lambda: parseType(types, TokenList(tokens)), repeats * 20) * 1e6, raising(name)))
+            if printing and failed:
+                print("\t", result)
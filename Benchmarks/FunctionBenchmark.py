@@ -0,0 +1,37 @@
+import os
+import sys
+
+from Scanner.Scanner import Scanner
+from Parser.StructurePass import StructurePass
+from Parser.FunctionPass import FunctionPass, packTree
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+from Benchmarks.Common import timed, inTemporaryDirectory
+
+# Run with: python -m Benchmarks.FunctionBenchmark [functions] [workers...]
+# Parses every function body of a generated module serially and then across process pools, and checks
+# every pool gives back exactly the same trees. The speedup is bounded by how many cores the machine actually has
+
+if __name__ == "__main__":
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    workerCounts = [int(w) for w in sys.argv[2:]] if len(sys.argv) > 2 else [2, 4, os.cpu_count() or 1]
+
+    with inTemporaryDirectory() as directory:
+        root = ProgramGenerator(ProgramShape(functions=functions, longLines=functions // 200, longLineTerms=500)).write(directory)
+        _, tokens = Scanner.scan(os.path.basename(root))
+        success, module = StructurePass(tokens)
+        if not success:
+            raise Exception("Generated program didn't get through the structure pass: " + str(module[0]))
+
+    serialTime, (serialOk, serialOut) = timed(lambda: FunctionPass(module, 1))
+    if not serialOk:
+        raise Exception("Generated program didn't get through the function pass: " + str(serialOut[0]))
+    serialTrees = [packTree(parsed.body) for parsed in serialOut]
+    print("functions:", len(serialOut), " cores:", os.cpu_count())
+    print("\tserial:     %.4fs" % serialTime)
+    allIdentical = True
+    for workers in sorted(set(workerCounts)):
+        parallelTime, (parallelOk, parallelOut) = timed(lambda: FunctionPass(module, workers))
+        identical = parallelOk and [packTree(parsed.body) for parsed in parallelOut] == serialTrees
+        allIdentical = allIdentical and identical
+        print("\t%2d workers: %.4fs  speedup %.2fx  identical: %s" % (workers, parallelTime, serialTime / parallelTime, identical))
+    sys.exit(0 if allIdentical else 1)
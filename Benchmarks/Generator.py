@@ -0,0 +1,176 @@
+import os
+import random
+from dataclasses import dataclass
+from typing import List
+
+# Makes synthetic Sylph programs that get through scanning, the structure pass and verification,
+# at whatever scale is asked for. Everything is seeded so the same shape always gives the same program
+
+@dataclass
+class ProgramShape:
+    functions: int = 100
+    # How many versions of each function there are. They differ by arity, so verification is happy with them
+    overloads: int = 1
+    typedefs: int = 20
+    # How deeply typedefs nest sums, pointers, arrays and function pointers
+    typeDepth: int = 3
+    # Files each file includes, making a tree of however many files are asked for
+    files: int = 1
+    includeFanout: int = 2
+    # Files only use types from what they include themselves, not from whatever happened to be spliced in before them
+    selfContained: bool = False
+    # Functions whose whole body is one very long line
+    longLines: int = 0
+    longLineTerms: int = 500
+    # Bodies that get through type checking as well, see TYPED_STATEMENTS
+    typed: bool = False
+    seed: int = 0
+
+BASE_TYPES = ["i8", "i16", "i32", "i64", "u8", "u16", "u32", "u64", "float", "double", "bool", "string", "Null"]
+
+STATEMENTS = [
+    "if {0} > 0 then print(\"positive {1}\")",
+    "for i = 0; i < {0}; i++ do total := total + i * {1}",
+    "while {0} != {1} do {0} := {0} + 1",
+    "value := {0} as float * 3.25f / {1}",
+    "done := {0} > 2 or null or true",
+    "# Some comment about {0}",
+]
+
+# Every argument and result is an i32, and only variables that have been declared are used, so every body can be typed.
+# The operators they use are declared along with them, in TYPED_PRELUDE
+TYPED_STATEMENTS = [
+    "if {0} > {1} then {0} = {0} * 2 else {0} = {1}",
+    "for i: i32 = 0; i > {1}; i = i + 1 do {0} = {0} + i",
+    "while {0} > {1} do {0} = {0} + 1",
+    "v{1}: i32 = {0} * {1} + {0}",
+    "{{\n        w: i32 = {0} + {1}\n        {0} = w * w\n    }}",
+    "# Some comment about {0}",
+]
+
+TYPED_PRELUDE = [
+    "@infix", "func +(a: i32, b: i32) -> i32 = a",
+    "@infix", "func *(a: i32, b: i32) -> i32 = b",
+    "@infix", "func >(a: i32, b: i32) -> bool = true",
+]
+
+class ProgramGenerator:
+
+    def __init__(self, shape: ProgramShape):
+        self.shape = shape
+        self.random = random.Random(shape.seed)
+        self.typeNames = list(BASE_TYPES)
+
+    def randomType(self, depth: int) -> str:
+        if depth <= 0 or self.random.random() < 0.25:
+            return self.random.choice(self.typeNames)
+        kind = self.random.randrange(5)
+        if kind == 0:
+            return " or ".join([self.bracketed(depth - 1) for _ in range(self.random.randint(2, 4))])
+        if kind == 1:
+            return self.bracketed(depth - 1) + " ptr"
+        if kind == 2:
+            return self.bracketed(depth - 1) + "[" + str(self.random.choice([2, 4, 16, 64])) + "]"
+        if kind == 3:
+            arguments = ", ".join([self.randomType(depth - 1) for _ in range(self.random.randint(0, 3))])
+            return "((" + arguments + ") -> " + self.randomType(depth - 1) + ")"
+        return "(" + self.randomType(depth - 1) + ")"
+
+    # Sums have to be bracketed to be pointed to or put in arrays
+    def bracketed(self, depth: int) -> str:
+        written = self.randomType(depth)
+        return "(" + written + ")" if " or " in written else written
+
+    def typedef(self, name: str) -> str:
+        line = "using " + name + " = " + self.randomType(self.shape.typeDepth)
+        self.typeNames.append(name)
+        return line
+
+    def body(self, arguments: List[str]) -> List[str]:
+        lines = []
+        statements = TYPED_STATEMENTS if self.shape.typed else STATEMENTS
+        for i in range(self.random.randint(2, 6)):
+            argument = self.random.choice(arguments) if arguments else "x"
+            lines.append("    " + self.random.choice(statements).format(argument, i))
+        return lines
+
+    def function(self, name: str, arity: int) -> List[str]:
+        arguments = ["a" + str(i) for i in range(arity)]
+        lines = []
+        if self.shape.typed:
+            lines.append("func " + name + "(" + ", ".join([argument + ": i32" for argument in arguments]) + ") -> i32 {")
+            lines.extend(self.body(arguments))
+            lines.append("}")
+            return lines
+        header = ", ".join([argument + ": " + self.randomType(1) for argument in arguments])
+        if arity == 2 and self.random.random() < 0.2:
+            lines.append("@infix")
+        lines.append("func " + name + "(" + header + ") -> " + self.randomType(1) + "{")
+        lines.extend(self.body(arguments))
+        lines.append("}")
+        return lines
+
+    def longLine(self, name: str) -> List[str]:
+        # Ends on a name, a number at the very end of a file makes the scanner emit an EOF token
+        terms = " + ".join([str(i) + " * a0" for i in range(self.shape.longLineTerms)])
+        return ["func " + name + "(a0: i32) -> i32 = return " + terms]
+
+    def children(self, index: int) -> List[int]:
+        fanout = self.shape.includeFanout
+        return [child for child in range(fanout * index + 1, fanout * index + fanout + 1) if child < max(1, self.shape.files)]
+
+    # The order files' own definitions end up in once includes are spliced in: everything a file includes comes first
+    def spliceOrder(self, index: int = 0) -> List[int]:
+        order = []
+        for child in self.children(index):
+            order.extend(self.spliceOrder(child))
+        order.append(index)
+        return order
+
+    # Every file's text, the first one being the one to compile. Definitions are made in splice order,
+    # so a type is only ever used once it's been defined
+    def files(self) -> List[str]:
+        shape = self.shape
+        order = self.spliceOrder()
+        contents: List[List[str]] = [["include \"" + ProgramGenerator.fileName(child) + "\"" for child in self.children(i)] for i in range(len(order))]
+        if shape.typed:
+            contents[0].extend(TYPED_PRELUDE)
+        typedefs = [[] for _ in order]
+        functions = [[] for _ in order]
+        longLines = [[] for _ in order]
+        for i in range(shape.typedefs):
+            typedefs[i * len(order) // shape.typedefs].append(i)
+        for i in range(shape.functions):
+            functions[i * len(order) // shape.functions].append(i)
+        for i in range(shape.longLines):
+            longLines[i * len(order) // shape.longLines].append(i)
+
+        defined: List[List[str]] = []
+        for position, index in enumerate(order):
+            if shape.selfContained:
+                # A file's include tree is spliced in just before it, so that's every position back to its first
+                first = position + 1 - len(self.spliceOrder(index))
+                self.typeNames = BASE_TYPES + [name for names in defined[first:position] for name in names]
+            defined.append(["Type" + str(i) for i in typedefs[position]])
+            for i in typedefs[position]:
+                contents[index].append(self.typedef("Type" + str(i)))
+            for i in functions[position]:
+                for overload in range(max(1, shape.overloads)):
+                    contents[index].extend(self.function("function" + str(i), overload + 1))
+            for i in longLines[position]:
+                contents[index].extend(self.longLine("long" + str(i)))
+        return ["\n".join(lines) for lines in contents]
+
+    # Type expressions on their own, for timing parseType
+    def typeExpressions(self, count: int) -> List[str]:
+        return [self.randomType(self.shape.typeDepth) for _ in range(count)]
+
+    @staticmethod
+    def fileName(index: int) -> str:
+        return "generated" + str(index) + ".syl"
+
+    def write(self, directory: str) -> str:
+        for i, text in enumerate(self.files()):
+            with open(os.path.join(directory, ProgramGenerator.fileName(i)), "w") as io:
+                io.write(text)
+        return os.path.join(directory, ProgramGenerator.fileName(0))
@@ -0,0 +1,41 @@
+import sys
+import time
+
+from Scanner.Incremental import IncrementalScanner, TextEdit
+from Benchmarks.ScannerBenchmark import syntheticSource
+
+# Run with: python -m Benchmarks.IncrementalBenchmark [lines...]
+# Times a keystroke in the middle of the file, a new line, and pasting a few lines, incrementally and by
+# lexing the whole file again. Incremental times should stay flat as the file grows
+
+EDITS = [
+    ("keystroke", lambda line: TextEdit(line, 4, line, 4, "x")),
+    ("new line", lambda line: TextEdit(line, 0, line, 0, "\n")),
+    ("paste", lambda line: TextEdit(line, 0, line, 0, "a := 1\nb := a + 2\nprint(\"pasted\")\n")),
+]
+REPEATS = 20
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] if len(sys.argv) > 1 else [1000, 10000, 50000]
+    allIdentical = True
+    print("%8s %10s %16s %16s %10s" % ("lines", "edit", "incremental (ms)", "full (ms)", "identical"))
+    for lines in sizes:
+        text = syntheticSource(lines)
+        middle = text.count("\n") // 2
+        for name, makeEdit in EDITS:
+            scanner = IncrementalScanner("bench.syl", text)
+            edit = makeEdit(middle)
+            best = float("inf")
+            for _ in range(REPEATS):
+                start = time.perf_counter()
+                scanner.edit(edit)
+                best = min(best, time.perf_counter() - start)
+
+            edited = scanner.source.text()
+            start = time.perf_counter()
+            full = IncrementalScanner("bench.syl", edited)
+            fullTime = time.perf_counter() - start
+            identical = full.tokens == scanner.tokens
+            allIdentical = allIdentical and identical
+            print("%8d %10s %16.3f %16.3f %10s" % (lines, name, best * 1e3, fullTime * 1e3, identical))
+    sys.exit(0 if allIdentical else 1)
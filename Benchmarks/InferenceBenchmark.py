@@ -0,0 +1,71 @@
+import sys
+
+import Core
+import Parser.AST as AST
+from Types import *
+from Scanner.Tokens import *
+from Scanner.Scanner import Scanner
+from Parser.StructurePass import StructurePass
+from Parser.FunctionPass import FunctionPass
+from Parser.TypeParser import TypeTable
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+from Benchmarks.Common import timed, literal, everyNode, inTemporaryDirectory
+
+# Run with: python -m Benchmarks.InferenceBenchmark [depth...]
+# Asks for the type of every node in a tree of nested blocks and ifs. The recursive column is the old
+# getTypeOfNode, which worked each node's type out again from scratch on every call. Then types one
+# expression nested far past the recursion limit, and every body of a generated module that type checks
+
+def buildTree(depth: int) -> AST.Node:
+    if depth == 0:
+        return AST.Reference(literal())
+    return AST.Block([literal(), AST.If(literal(), buildTree(depth - 1), AST.Dereference(AST.Reference(buildTree(depth - 1))))])
+
+def recursiveType(node: AST.Node) -> SylphType:
+    match node:
+        case AST.Literal():
+            return IntType(True, 8)
+        case AST.Block():
+            return recursiveType(node.contents[-1])
+        case AST.If():
+            return SumType([recursiveType(node.body), recursiveType(node.elseNode)])
+        case AST.Reference():
+            return PtrType(recursiveType(node.of), False, None)
+        case AST.Dereference():
+            return recursiveType(node.of).ptrOf
+
+if __name__ == "__main__":
+    depths = [int(depth) for depth in sys.argv[1:]] if len(sys.argv) > 1 else [4, 8, 11]
+    print("%6s %8s %16s %16s %14s" % ("depth", "nodes", "recursive (ms)", "table (ms)", "reads (us)"))
+    for depth in depths:
+        root = buildTree(depth)
+        nodes = everyNode(root)
+        recursive, _ = timed(lambda: [recursiveType(node) for node in nodes])
+        table = TypeTable()
+        inferred, _ = timed(lambda: [table.typeOf(node) for node in nodes])
+        assert all([table.get(node) is recursiveType(node) for node in nodes])
+        reads = timed(lambda: [table.get(node) for node in nodes])[0] / len(nodes)
+        print("%6d %8d %16.3f %16.3f %14.3f" % (depth, len(nodes), recursive * 1e3, inferred * 1e3, reads * 1e6))
+
+    # Far deeper than the old recursive version could ever go
+    chain = literal()
+    for _ in range(100000):
+        chain = AST.Reference(chain)
+    table = TypeTable()
+    seconds, _ = timed(lambda: table.infer(chain))
+    print("typed a chain of %d references in %.3f ms" % (len(table.types), seconds * 1e3))
+
+    # Real bodies, with variables, scopes, and calls that go through overload resolution
+    with inTemporaryDirectory() as directory:
+        root = ProgramGenerator(ProgramShape(functions=2000, overloads=2, longLines=10, typed=True)).write(directory)
+        _, tokens = Scanner.scan(root)
+        success, module = StructurePass(tokens)
+        if not success:
+            raise Exception("Generated program didn't get through the structure pass: " + str(module[0]))
+    success, parsed = FunctionPass(module)
+    if not success:
+        raise Exception("Generated program didn't get through the function pass: " + str(parsed[0]))
+    table = TypeTable(parsed[0].symbols)
+    seconds, _ = timed(lambda: [table.infer(function.body) for function in parsed])
+    nodes = sum([len(everyNode(function.body)) for function in parsed])
+    print("typed %d bodies, %d nodes, in %.3f ms, %.3f us a node" % (len(parsed), nodes, seconds * 1e3, seconds * 1e6 / nodes))
@@ -0,0 +1,56 @@
+import os
+import sys
+
+from Scanner.Scanner import Scanner
+from Parser.StructurePass import StructurePass
+from Parser.Interface import InterfaceStore, InterfaceLoader
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+from Benchmarks.Common import timed, inTemporaryDirectory
+
+# Run with: python -m Benchmarks.InterfaceBenchmark [files] [functions]
+# Compiles the top of a generated include tree as far as the structure pass. Splicing every included file in
+# is compared against compiling with interfaces, first with none written yet and then with all of them there.
+# Each way has to give back the same types and function signatures
+
+def textual(filename: str):
+    _, tokens = Scanner.scan(filename)
+    return StructurePass(tokens)
+
+def withInterfaces(filename: str, directory: str) -> tuple[tuple, InterfaceLoader]:
+    loader = InterfaceLoader(InterfaceStore(directory))
+    success, tokens, includes = loader.scanAlone(filename)
+    if not success:
+        return (False, tokens), loader
+    success, module = loader.includedModule(filename, includes)
+    if success:
+        success, module = StructurePass(tokens, module)
+        loader.writeInterface(filename, module, includes)
+    return (success, module), loader
+
+def summary(module) -> tuple:
+    functions = [(name, [(func.signiture, func.name.location) for func in funcs]) for name, funcs in module.functions.items()]
+    return list(module.types.items()), functions
+
+if __name__ == "__main__":
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    functions = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+
+    with inTemporaryDirectory() as directory:
+        root = os.path.basename(ProgramGenerator(ProgramShape(functions=functions, typedefs=files * 5, files=files, selfContained=True)).write(directory))
+        interfaces = os.path.join(directory, "interfaces")
+        textTime, (textOk, textModule) = timed(lambda: textual(root))
+        coldTime, ((coldOk, coldModule), cold) = timed(lambda: withInterfaces(root, interfaces))
+        warmTime, ((warmOk, warmModule), warm) = timed(lambda: withInterfaces(root, interfaces))
+
+    if not textOk:
+        raise Exception("Generated program didn't get through the structure pass: " + str(textModule[0]))
+    expected = summary(textModule)
+    coldSame = coldOk and summary(coldModule) == expected
+    warmSame = warmOk and summary(warmModule) == expected
+    print("files:", files, " functions:", functions)
+    print("%-12s %10s %8s %8s %12s  %s" % ("mode", "time (ms)", "loaded", "rebuilt", "written (B)", "same module"))
+    print("%-12s %10.3f %8s %8s %12s  %s" % ("textual", textTime * 1e3, "-", "-", "-", True))
+    for mode, seconds, loader, same in [("cold", coldTime, cold, coldSame), ("warm", warmTime, warm, warmSame)]:
+        stats = loader.store.stats
+        print("%-12s %10.3f %8d %8d %12d  %s" % (mode, seconds * 1e3, stats.loaded, stats.rebuilt, stats.bytesWritten, same))
+    sys.exit(0 if coldSame and warmSame else 1)
@@ -0,0 +1,57 @@
+import sys
+import time
+
+import Core
+import Scanner.Scanner as ScannerModule
+from Scanner.Scanner import Scanner, Reader, File
+from Scanner.Tokens import *
+
+# Run with: python -m Benchmarks.KeywordBenchmark [identifiers]
+# Times classifying identifiers as the keyword set grows. The linear column is the old approach of
+# trying Reader.match with every keyword before falling back to reading an identifier.
+
+KEYWORD_SET_SIZES = [len(KeywordMap), 64, 256, 1024]
+
+def makeReader(line: str) -> Reader:
+    reader = Reader.__new__(Reader)
+    reader.lexedFiles = set()
+    reader.files = [File([line], "bench.syl")]
+    return reader
+
+def linearClassify(reader: Reader, keywords: List[str]):
+    for keyword in keywords:
+        isKeyword, _ = reader.match(keyword)
+        if isKeyword:
+            return keyword
+    return reader.readWord()
+
+def timePerIdentifier(line: str, count: int, classify) -> float:
+    reader = makeReader(line)
+    start = time.perf_counter()
+    while reader.reading():
+        classify(reader)
+        reader.removeWhitespace()
+    return (time.perf_counter() - start) / count
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    # Mostly plain identifiers with the odd keyword, like real code
+    words = ["value" + str(i) if i % 8 != 0 else "while" for i in range(count)]
+    line = " ".join(words)
+
+    originalWordMap = ScannerModule.WordMap
+    print("%10s %16s %16s" % ("keywords", "linear (us/id)", "lookup (us/id)"))
+    for size in KEYWORD_SET_SIZES:
+        keywords = list(KeywordMap.keys()) + ["kw" + str(i) for i in range(size - len(KeywordMap))]
+        wordMap = dict(originalWordMap)
+        for keyword in keywords[len(KeywordMap):]:
+            wordMap[keyword] = (TT.Keyword, Keywords.Const)
+
+        linear = timePerIdentifier(line, count, lambda reader: linearClassify(reader, keywords))
+        ScannerModule.WordMap = wordMap
+        try:
+            diagnostics = Core.Diagnostics()
+            lookup = timePerIdentifier(line, count, lambda reader: Scanner.processToken(reader, diagnostics))
+        finally:
+            ScannerModule.WordMap = originalWordMap
+        print("%10d %16.3f %16.3f" % (size, linear * 1e6, lookup * 1e6))
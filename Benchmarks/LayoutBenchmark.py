@@ -0,0 +1,69 @@
+import sys
+
+from Types import *
+from Layout import LayoutEngine, TARGETS
+from Benchmarks.Common import perRun
+
+# Run with: python -m Benchmarks.LayoutBenchmark [depth...]
+# Sizes arrays of sums of arrays, nested a few levels deep. The recursive column is the old getSize,
+# which walked the whole type again on every call. Then compares how big a few sums are: the old getSize's
+# unaligned largest option plus a byte, laid out plainly (a byte of tag after the largest option, padded out to
+# its alignment), with niches and the smallest tags but arrays kept whole as if their elements were referenced,
+# and by default, where arrays of sums keep their tags apart
+
+# SumTest is from test.syl
+FOOTPRINTS: Dict[str, SylphType] = {
+    "SumTest": PtrType(SumType([IntType(True, 1), PtrType(StringType(), False, None), FunctionPtr([], NullType()), SumType([IntType(False, 4), FloatType(False)])]), True, 64),
+    "string ptr or Null": SumType([PtrType(StringType(), False, None), NullType()]),
+    "bool or Null": SumType([BoolType(), NullType()]),
+    "(bool or Null)[256]": PtrType(SumType([BoolType(), NullType()]), True, 256),
+    "(i32 or float)[1000]": PtrType(SumType([IntType(False, 4), FloatType(False)]), True, 1000),
+    "(double or u8)[1000]": PtrType(SumType([FloatType(True), IntType(True, 1)]), True, 1000),
+}
+
+def buildType(depth: int) -> SylphType:
+    if depth == 0:
+        return IntType(False, 4)
+    inner = buildType(depth - 1)
+    options = [PtrType(inner, True, 8), PtrType(inner, False, None), FloatType(True), SumType([BoolType(), PtrType(inner, True, 2)])]
+    return PtrType(SumType(options), True, 16)
+
+def recursiveSize(sylphType: SylphType, pointerSize: int = 8) -> int:
+    match sylphType:
+        case IntType(_, sizeBytes):
+            return sizeBytes
+        case FloatType(double):
+            return 8 if double else 4
+        case BoolType():
+            return 1
+        case NullType():
+            return 0
+        case PtrType(ptrOf, True, length):
+            return recursiveSize(ptrOf, pointerSize) * length
+        case SumType(options):
+            return max([recursiveSize(option, pointerSize) for option in options]) + 1
+    return pointerSize
+
+if __name__ == "__main__":
+    depths = [int(depth) for depth in sys.argv[1:]] if len(sys.argv) > 1 else [2, 4, 6]
+    print("%6s %-8s %16s %16s %16s %12s" % ("depth", "target", "recursive (us)", "first (us)", "cached (us)", "size"))
+    for depth in depths:
+        sylphType = buildType(depth)
+        for target in TARGETS.values():
+            recursive = perRun(lambda: recursiveSize(sylphType, target.pointerSize), 3)
+            # A fresh engine each time, so this is the cost of laying out everything once
+            first = perRun(lambda: LayoutEngine(target).layout(sylphType), 3)
+            engine = LayoutEngine(target)
+            engine.layout(sylphType)
+            cached = perRun(lambda: engine.layout(sylphType), 100000)
+            print("%6d %-8s %16.2f %16.2f %16.3f %12d" % (depth, target.name, recursive * 1e6, first * 1e6, cached * 1e6, engine.sizeOf(sylphType)))
+
+    print()
+    print("%-22s %-8s %10s %10s %10s %10s" % ("type", "target", "old", "plain", "whole", "default"))
+    for name, sylphType in FOOTPRINTS.items():
+        for target in TARGETS.values():
+            plain = LayoutEngine(target, packSums=False).sizeOf(sylphType)
+            whole = LayoutEngine(target)
+            if isinstance(sylphType, PtrType) and sylphType.isArray:
+                whole.keepWhole(sylphType)
+            print("%-22s %-8s %10d %10d %10d %10d" % (name, target.name, recursiveSize(sylphType, target.pointerSize), plain, whole.sizeOf(sylphType), LayoutEngine(target).sizeOf(sylphType)))
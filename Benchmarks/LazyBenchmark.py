@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import tracemalloc
+
+from Scanner.Scanner import Scanner
+from Parser.StructurePass import StructurePass
+from Parser.FunctionPass import FunctionPass
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+from Benchmarks.Common import inTemporaryDirectory
+
+# Run with: python -m Benchmarks.LazyBenchmark [library functions] [functions used]
+# A small main file includes a big generated library and calls a handful of it. Parsing every body is
+# compared against only parsing and type checking what main can reach, for time and for the most memory
+# held at once
+
+def measure(module, entryPoints) -> tuple[float, int, tuple]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = FunctionPass(module, 1, entryPoints)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, result
+
+if __name__ == "__main__":
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    used = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    with inTemporaryDirectory() as directory:
+        library = os.path.basename(ProgramGenerator(ProgramShape(functions=functions, typed=True)).write(directory))
+        calls = "\n".join(["    function" + str(i * functions // used) + "(1)" for i in range(used)])
+        with open("main.syl", "w") as io:
+            io.write("include \"" + library + "\"\nfunc main() -> i32 {\n" + calls + "\n}\n")
+        _, tokens = Scanner.scan("main.syl")
+        success, module = StructurePass(tokens)
+        if not success:
+            raise Exception("Generated program didn't get through the structure pass: " + str(module[0]))
+
+    eagerTime, eagerPeak, (eagerOk, eagerOut) = measure(module, None)
+    lazyTime, lazyPeak, (lazyOk, lazyOut) = measure(module, ["main"])
+    print("library functions:", functions, " called from main:", used)
+    print("%-8s %10s %12s %12s" % ("mode", "bodies", "time (ms)", "peak (KiB)"))
+    print("%-8s %10d %12.3f %12.1f" % ("eager", len(eagerOut), eagerTime * 1e3, eagerPeak / 1024))
+    print("%-8s %10d %12.3f %12.1f" % ("lazy", len(lazyOut), lazyTime * 1e3, lazyPeak / 1024))
+    # Along with main and what it calls, lazy mode reaches the operators those bodies use
+    called = set(["function" + str(i * functions // used) for i in range(used)])
+    reached = set([parsed.function.name.string for parsed in lazyOut if parsed.function.name.string.startswith("function")])
+    sys.exit(0 if eagerOk and lazyOk and reached == called else 1)
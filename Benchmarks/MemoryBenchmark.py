@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from Scanner.Scanner import Scanner
+from Benchmarks.ScannerBenchmark import syntheticSource
+
+# Run with: python -m Benchmarks.MemoryBenchmark [lines]
+# Compares how much memory a scan holds onto per token, as a list of Tokens and as a TokenStore.
+# The source text itself is counted for the store, since that's what its tokens point into
+
+def retainedBytes(filename: str, compact: bool) -> tuple[int, int, int]:
+    tracemalloc.start()
+    success, tokens = Scanner.scan(filename, compact=compact)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    if not success:
+        raise Exception("Scan failed: " + str(tokens[0]))
+    return retained, len(tokens), tokens.nbytes() if compact else retained
+
+if __name__ == "__main__":
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 150000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.syl")
+        with open(path, "w") as io:
+            io.write(syntheticSource(lines))
+
+        listBytes, count, _ = retainedBytes(path, False)
+        storeBytes, _, arrayBytes = retainedBytes(path, True)
+
+    print("tokens:            ", count)
+    print("token list:         %.1f MB, %.1f bytes/token" % (listBytes / 1e6, listBytes / count))
+    print("token store:        %.1f MB, %.1f bytes/token" % (storeBytes / 1e6, storeBytes / count))
+    print("  of which arrays:  %.1f bytes/token" % (arrayBytes / count))
+    print("reduction:          %.1fx (%.1fx leaving out the source text)" % (listBytes / storeBytes, listBytes / arrayBytes))
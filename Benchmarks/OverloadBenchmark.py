@@ -0,0 +1,53 @@
+import itertools
+import sys
+
+import Core
+from Types import *
+from Scanner.Tokens import *
+from Parser.StructurePass import StructureModule, CollectedFunction
+from Parser.Types import FunctionSigniture
+from Benchmarks.Common import timed
+
+# Run with: python -m Benchmarks.OverloadBenchmark [overloads...]
+# Times verifying one heavily overloaded name. The pairwise column is the old approach of comparing
+# every pair of overloads (without its printing, which made it far slower still)
+
+ARGUMENT_KINDS = [IntType(False, 4), FloatType(False), BoolType(), StringType(), NullType(), PtrType(IntType(True, 1), False, None), FunctionPtr([], NullType()), SumType([BoolType(), NullType()])]
+
+def makeModule(overloads: int, clashes: int = 0) -> StructureModule:
+    module = StructureModule()
+    functions = []
+    # Every combination of argument kinds, shortest first, so no two overloads look the same
+    for arity in itertools.count(1):
+        for argumentTypes in itertools.product(ARGUMENT_KINDS, repeat=arity):
+            if len(functions) == overloads:
+                break
+            name = Token(TT.Identifier, IdentifierType.OperatingIdentifier, Core.SourceInfo("bench.syl", len(functions), 5), "+")
+            functions.append(CollectedFunction(FunctionSigniture([TagType.Infix], list(argumentTypes), NullType()), name, [], []))
+        if len(functions) == overloads:
+            break
+    functions.extend(functions[:clashes])
+    module.functions["+"] = functions
+    return module
+
+def pairwiseVerify(module: StructureModule) -> tuple[bool, list]:
+    errors = []
+    for funcs in module.functions.values():
+        for i in range(len(funcs)):
+            for j in range(i + 1, len(funcs)):
+                if not funcs[i].signiture.hasDifferentArgumentTypes(funcs[j].signiture):
+                    errors.append(Core.CompileError("Functions cannot be differentiated by return type (" + funcs[i].name.string + ") against " + str(funcs[j].name.location), funcs[i].name.location))
+    return len(errors) == 0, errors
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] if len(sys.argv) > 1 else [100, 1000, 4000]
+    agree = True
+    print("%10s %14s %14s %10s %8s" % ("overloads", "pairwise (ms)", "keyed (ms)", "speedup", "errors"))
+    for size in sizes:
+        module = makeModule(size, clashes=3)
+        pairwiseTime, (_, pairwiseErrors) = timed(lambda: pairwiseVerify(module))
+        keyedTime, (_, keyedErrors) = timed(module.verify)
+        # Each clash is reported once against the first overload it matches
+        agree = agree and len(keyedErrors) == 3 and len(pairwiseErrors) == 3
+        print("%10d %14.3f %14.3f %9.1fx %8d" % (size, pairwiseTime * 1e3, keyedTime * 1e3, pairwiseTime / keyedTime, len(keyedErrors)))
+    sys.exit(0 if agree else 1)
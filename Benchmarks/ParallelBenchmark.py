@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+
+from Scanner.Scanner import Scanner
+from Benchmarks.ScannerBenchmark import syntheticSource, REPEATS
+from Benchmarks.Common import inTemporaryDirectory
+
+# Run with: python -m Benchmarks.ParallelBenchmark [files] [lines per file] [workers...]
+# Builds a project where every file includes the next two, like a binary tree, with a few files
+# included more than once, then times a serial scan against the parallel one.
+# The speedup is bounded by how many cores the machine actually has
+
+def writeProject(directory: str, files: int, lines: int) -> str:
+    body = syntheticSource(lines)
+    for i in range(files):
+        includes = "".join(['include "f' + str(j) + '.syl"\n' for j in [2 * i + 1, 2 * i + 2] if j < files])
+        # Repeated includes should be skipped the same way in both
+        if i % 7 == 3:
+            includes += 'include "f1.syl"\n'
+        with open(os.path.join(directory, "f" + str(i) + ".syl"), "w") as io:
+            io.write(includes + body.replace("combine", "combine" + str(i) + "_"))
+    return "f0.syl"
+
+def timeScan(filename: str, workers: int) -> tuple[float, tuple]:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = Scanner.scan(filename, compact=True, workers=workers)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+if __name__ == "__main__":
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    workerCounts = [int(w) for w in sys.argv[3:]] if len(sys.argv) > 3 else [2, 4, os.cpu_count() or 1]
+
+    with inTemporaryDirectory() as directory:
+        root = writeProject(directory, files, lines)
+        serialTime, (serialOk, serialOut) = timeScan(root, 1)
+        print("files:", files, " lines each:", lines, " cores:", os.cpu_count())
+        print("\ttokens:    ", len(serialOut) if serialOk else "errors")
+        print("\tserial:     %.4fs" % serialTime)
+        allIdentical = True
+        for workers in sorted(set(workerCounts)):
+            parallelTime, (parallelOk, parallelOut) = timeScan(root, workers)
+            identical = serialOk == parallelOk and list(serialOut) == list(parallelOut)
+            allIdentical = allIdentical and identical
+            print("\t%2d workers: %.4fs  speedup %.2fx  identical: %s" % (workers, parallelTime, serialTime / parallelTime, identical))
+    sys.exit(0 if allIdentical else 1)
@@ -0,0 +1,81 @@
+import sys
+from typing import List
+
+import Core
+import Parser.AST as AST
+from Types import *
+from Scanner.Tokens import *
+from Scanner.Scanner import Scanner
+from Parser.Types import SymbolTable
+from Parser.StructurePass import StructurePass
+from Parser.FunctionPass import FunctionPass
+from Parser.TypeParser import TypeTable
+from Parser.Passes import PassManager, TypeInference, ConstantDetection, LValueCheck
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+from Benchmarks.Common import timed, literal, inTemporaryDirectory
+
+# Run with: python -m Benchmarks.PassBenchmark [depth...]
+# Types, finds constants in and checks lvalues of a tree of nested blocks, ifs, assignments and references.
+# Every reference is to something with no address, so the lvalue check has an error to report for each.
+# Each analysis walking the tree on its own is compared against all three fused into one walk, which has
+# to give the same answers. The same goes for every body of a generated module that type checks. Then the
+# fused walk again with every handler timed
+
+def buildTree(depth: int) -> AST.Node:
+    if depth == 0:
+        return AST.Dereference(AST.Reference(literal()))
+    target = AST.Dereference(AST.Reference(buildTree(depth - 1)))
+    return AST.Block([
+        AST.As(literal(), IntType(False, 4)),
+        AST.Assign(target, literal()),
+        AST.If(literal(), buildTree(depth - 1), AST.EmptyNode()),
+    ])
+
+def separately(roots: List[AST.Node], symbols: SymbolTable | None = None) -> tuple[TypeInference, ConstantDetection, LValueCheck]:
+    passes = TypeInference(symbols), ConstantDetection(symbols.getModule() if symbols is not None else None), LValueCheck()
+    for analysis in passes:
+        manager = PassManager([analysis], symbols.getModule() if symbols is not None else None)
+        for root in roots:
+            manager.run(root)
+    return passes
+
+def fused(roots: List[AST.Node], symbols: SymbolTable | None = None, timedHandlers: bool = False) -> tuple[PassManager, tuple]:
+    passes = TypeInference(symbols), ConstantDetection(symbols.getModule() if symbols is not None else None), LValueCheck()
+    manager = PassManager(list(passes), symbols.getModule() if symbols is not None else None, timedHandlers)
+    for root in roots:
+        manager.run(root)
+    return manager, passes
+
+# Times typing on demand, each analysis on its own and all of them fused, and checks they all agree
+def compare(label: str, roots: List[AST.Node], symbols: SymbolTable | None = None) -> bool:
+    onDemand = TypeTable(symbols)
+    onDemandTime, _ = timed(lambda: [onDemand.infer(root) for root in roots])
+    separateTime, separateResult = timed(lambda: separately(roots, symbols))
+    fusedTime, (manager, (types, constants, lvalues)) = timed(lambda: fused(roots, symbols))
+    same = types.table.types == onDemand.types == separateResult[0].table.types
+    same = same and constants.constant == separateResult[1].constant and len(lvalues.errors) == len(separateResult[2].errors)
+    print("%-8s %8d %16.3f %14.3f %14.3f %10s" % (label, len(onDemand.types), onDemandTime * 1e3, separateTime * 1e3, fusedTime * 1e3, same))
+    return same
+
+if __name__ == "__main__":
+    depths = [int(depth) for depth in sys.argv[1:]] if len(sys.argv) > 1 else [6, 10, 13]
+    allSame = True
+    print("%-8s %8s %16s %14s %14s %10s" % ("depth", "nodes", "on demand (ms)", "separate (ms)", "fused (ms)", "same"))
+    for depth in depths:
+        allSame = compare(str(depth), [buildTree(depth)]) and allSame
+
+    # Every body of a generated module, with variables to look up and overloads to resolve
+    with inTemporaryDirectory() as directory:
+        root = ProgramGenerator(ProgramShape(functions=2000, overloads=2, longLines=10, typed=True)).write(directory)
+        _, tokens = Scanner.scan(root)
+        success, module = StructurePass(tokens)
+        if not success:
+            raise Exception("Generated program didn't get through the structure pass: " + str(module[0]))
+    success, parsed = FunctionPass(module)
+    if not success:
+        raise Exception("Generated program didn't get through the function pass: " + str(parsed[0]))
+    allSame = compare("bodies", [function.body for function in parsed], parsed[0].symbols) and allSame
+
+    manager, _ = fused([buildTree(depths[-1])], timedHandlers=True)
+    print("fused with every handler timed, " + manager.report())
+    sys.exit(0 if allSame else 1)
@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+
+from Scanner.Scanner import Scanner, ScanEngine
+from Benchmarks.Common import best
+
+# Run with: python -m Benchmarks.ScannerBenchmark [lines] [files...]
+# With no files a synthetic source of roughly the given number of lines is used.
+
+SNIPPET = """using Grid{0} = (u8 or string ptr or (()->Null) or (i32 or float))[64]
+
+# Some comment about function {0}
+@infix
+func combine{0}(first: u8, second: u8) -> i8 = return second as i8 - first as i8
+
+func body{0}(count: u8, flag: bool) -> string{{
+    if flag then print("value number {0}")
+    else for i = 0; i < count; i++ do{{
+        diff := i combine{0} count
+        total := 3.25f * diff / 17
+        done := total > 2 or null or true
+    }}
+}}
+"""
+
+def syntheticSource(lines: int) -> str:
+    perSnippet = SNIPPET.count("\n") + 1
+    return "".join([SNIPPET.format(i) for i in range(max(1, lines // perSnippet))])
+
+REPEATS = 3
+
+def compareEngines(filename: str) -> bool:
+    readerTime, (readerOk, readerOut) = best(lambda: Scanner.scan(filename, ScanEngine.Reader), REPEATS)
+    fastTime, (fastOk, fastOut) = best(lambda: Scanner.scan(filename, ScanEngine.Fast), REPEATS)
+    compactTime, (compactOk, compactOut) = best(lambda: Scanner.scan(filename, ScanEngine.Fast, True), REPEATS)
+
+    identical = readerOk == fastOk and readerOut == fastOut
+    if fastOk and compactOk:
+        identical = identical and list(compactOut) == fastOut
+    if readerOk and fastOk and not identical:
+        for i, (a, b) in enumerate(zip(readerOut, fastOut)):
+            if a != b:
+                print("\tFirst difference at token", i, "\n\t\treader:", a, "\n\t\tfast:  ", b)
+                break
+        else:
+            print("\tToken counts differ:", len(readerOut), "vs", len(fastOut))
+
+    print(filename)
+    print("\ttokens:  ", len(fastOut) if fastOk else "errors")
+    print("\treader:   %.4fs" % readerTime)
+    print("\tfast:     %.4fs" % fastTime)
+    print("\tcompact:  %.4fs" % compactTime)
+    print("\tspeedup:  %.1fx" % (readerTime / fastTime if fastTime > 0 else float("inf")))
+    print("\tidentical:", identical)
+    return identical
+
+if __name__ == "__main__":
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    files = sys.argv[2:]
+    allIdentical = True
+    if len(files) == 0:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "synthetic.syl")
+            with open(path, "w") as io:
+                io.write(syntheticSource(lines))
+            allIdentical = compareEngines(path)
+    else:
+        for filename in files:
+            allIdentical = compareEngines(filename) and allIdentical
+    sys.exit(0 if allIdentical else 1)
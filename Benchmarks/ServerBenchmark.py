@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from CompileServer import CompileServer
+from client import request
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+from Benchmarks.Common import timed
+
+# Run with: python -m Benchmarks.ServerBenchmark [files] [functions]
+# Compiles a generated include tree with a fresh main.py, and then through a server: the first compile,
+# one with nothing changed, and after editing a leaf file's body and then a signature in it.
+# Every server compile has to agree with main.py on whether the program compiles
+
+REPEATS = 5
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def appendTo(filename: str, text: str):
+    with open(filename, "a") as io:
+        io.write(text)
+
+if __name__ == "__main__":
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    functions = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+
+    with tempfile.TemporaryDirectory() as directory:
+        generator = ProgramGenerator(ProgramShape(functions=functions, typedefs=files * 5, files=files, selfContained=True))
+        root = os.path.basename(generator.write(directory))
+        leaf = ProgramGenerator.fileName(files - 1)
+        socketPath = os.path.join(directory, "server.sock")
+        compileMessage = {"command": "compile", "cwd": directory, "files": [root], "quiet": True}
+
+        fresh, result = timed(lambda: subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), root, "--quiet"], cwd=directory, capture_output=True))
+        expected = result.returncode == 0
+
+        server = CompileServer(socketPath, os.path.join(directory, "interfaces"))
+        thread = threading.Thread(target=server.serve)
+        thread.start()
+        while not os.path.exists(socketPath):
+            time.sleep(0.01)
+        try:
+            rows = []
+            allAgree = True
+            def compile(name: str):
+                global allAgree
+                seconds, response = timed(lambda: request(compileMessage, socketPath))
+                allAgree = allAgree and response["success"] == expected
+                rows.append((name, seconds, response["files"][0]["phases"]))
+
+            compile("first")
+            for _ in range(REPEATS):
+                compile("unchanged")
+            for i in range(REPEATS):
+                appendTo(os.path.join(directory, leaf), "\nfunc edited" + str(i) + "(a0: i32) -> i32 {\n    a0 := a0 + " + str(i) + "\n}")
+                compile("new function")
+            for i in range(REPEATS):
+                # A body edit on a new last line moves nothing else, so includers keep their modules
+                appendTo(os.path.join(directory, leaf), "\n# edit " + str(i))
+                compile("comment")
+        finally:
+            request({"command": "shutdown"}, socketPath)
+            thread.join()
+
+    print("files:", files, " functions:", functions, " fresh main.py: %.1f ms" % (fresh * 1e3))
+    print("%-14s %10s  %s" % ("compile", "time (ms)", "phases"))
+    for name, seconds, phases in rows:
+        counters = ", ".join([phase["name"] + " " + " ".join([key + "=" + str(value) for key, value in phase["counters"].items()]) for phase in phases])
+        print("%-14s %10.3f  %s" % (name, seconds * 1e3, counters))
+    sys.exit(0 if allAgree else 1)
@@ -0,0 +1,50 @@
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+from Scanner.Scanner import Scanner
+from Scanner.TokenStore import TokenStore
+from Parser.StructurePass import StructurePass
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+from Benchmarks.Common import inTemporaryDirectory
+
+# Run with: python -m Benchmarks.SliceBenchmark [functions]
+# Structures a generated module from a token list and from a TokenStore, and measures what the module holds on to
+# and the most that was allocated at once along the way, on top of the tokens it was given. With function bodies
+# kept as ranges over those tokens, what's held grows with the number of functions rather than the number of tokens.
+# A TokenStore also keeps the bracket index it was given, for the function pass to use again. That's the store's and
+# a few bytes per token, so it's shown on its own and left out of what each function holds. The rest of the gap
+# is the name and argument tokens, which a store has to make for the module where a list already had them
+
+# Timed without tracing, which slows every allocation down
+def structured(tokens) -> tuple[float, int, int, object]:
+    start = time.perf_counter()
+    StructurePass(tokens)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    success, module = StructurePass(tokens)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if not success:
+        raise Exception("Generated program didn't get through the structure pass: " + str(module[0]))
+    return seconds, retained, peak, module
+
+if __name__ == "__main__":
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+
+    with inTemporaryDirectory() as directory:
+        root = ProgramGenerator(ProgramShape(functions=functions, longLines=functions // 200, longLineTerms=500)).write(directory)
+        _, tokenList = Scanner.scan(os.path.basename(root))
+        _, tokenStore = Scanner.scan(os.path.basename(root), compact=True)
+
+    print("%-8s %8s %10s %12s %14s %12s %12s %16s" % ("tokens", "count", "functions", "time (ms)", "retained (KiB)", "peak (KiB)", "index (KiB)", "retained/function"))
+    for name, tokens in [("list", tokenList), ("store", tokenStore)]:
+        seconds, retained, peak, module = structured(tokens)
+        count = sum([len(funcs) for funcs in module.functions.values()])
+        index = tokens.bracketIndex if isinstance(tokens, TokenStore) else None
+        indexBytes = index.partners.itemsize * len(index.partners) if index is not None else 0
+        print("%-8s %8d %10d %12.1f %14.1f %12.1f %12.1f %16.1f" % (name, len(tokens), count, seconds * 1e3, retained / 1024, peak / 1024, indexBytes / 1024, (retained - indexBytes) / count))
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import platform
+import sys
+from dataclasses import replace
+from typing import Dict, List
+
+from Scanner.Scanner import Scanner
+from Scanner.Tokens import Token
+from Parser.StructurePass import StructurePass
+from Parser.FunctionPass import FunctionPass
+from Parser.Types import parseType
+from Parser.TokenList import TokenList
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+from Benchmarks.Common import best, inTemporaryDirectory
+
+# Run with: python -m Benchmarks.Suite [--scale N] [--repeats N] [--save-baseline] [--output FILE]
+# Times each front end phase on generated programs of a few different shapes, and compares against
+# the stored baseline. Exits with 1 if anything got slower than the threshold allows, by more than the
+# smallest difference that isn't just noise
+
+SUITE: Dict[str, ProgramShape] = {
+    "functions": ProgramShape(functions=2000, typedefs=20),
+    "overloads": ProgramShape(functions=300, overloads=4, typedefs=20),
+    "types": ProgramShape(functions=50, typedefs=1000, typeDepth=5),
+    "includes": ProgramShape(functions=1000, typedefs=100, files=40, includeFanout=3),
+    "longLines": ProgramShape(functions=20, longLines=50, longLineTerms=2000),
+}
+TYPE_EXPRESSIONS = 500
+REPEATS = 5
+# Phases that take well under a millisecond can be twice as slow from one run to the next, so a ratio on its own
+# isn't enough to call something a regression
+MIN_DELTA = 0.002
+# Whatever else the machine is busy with can slow down a whole benchmark, not just one run of it
+RETRIES = 3
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+RESULTS_VERSION = 1
+
+def scaled(shape: ProgramShape, scale: float) -> ProgramShape:
+    return replace(shape,
+        functions=max(1, int(shape.functions * scale)),
+        typedefs=int(shape.typedefs * scale),
+        longLines=int(shape.longLines * scale),
+    )
+
+# Type expressions are written one to a line, so the tokens for each are every token on its line
+def tokensByLine(tokens: List[Token]) -> List[List[Token]]:
+    lines: Dict[int, List[Token]] = {}
+    for token in tokens:
+        lines.setdefault(token.location.line_number, []).append(token)
+    return list(lines.values())
+
+def runBenchmark(shape: ProgramShape, directory: str, repeats: int) -> Dict[str, float]:
+    generator = ProgramGenerator(shape)
+    root = os.path.basename(generator.write(directory))
+    times: Dict[str, float] = {}
+
+    times["scan"], (success, tokens) = best(lambda: Scanner.scan(root), repeats)
+    if not success:
+        raise Exception("Generated program didn't scan: " + str(tokens[0]))
+    times["structure"], (success, module) = best(lambda: StructurePass(tokens), repeats)
+    if not success:
+        raise Exception("Generated program didn't get through the structure pass: " + str(module[0]))
+    times["verify"], (success, errors) = best(module.verify, repeats)
+    if not success:
+        raise Exception("Generated program didn't verify: " + str(errors[0]))
+    times["functions"], (success, bodies) = best(lambda: FunctionPass(module), repeats)
+    if not success:
+        raise Exception("Generated program didn't get through the function pass: " + str(bodies[0]))
+
+    with open("types.syl", "w") as io:
+        io.write("\n".join(generator.typeExpressions(TYPE_EXPRESSIONS)))
+    _, (_, typeTokens) = best(lambda: Scanner.scan("types.syl"), repeats)
+    expressions = tokensByLine(typeTokens)
+    times["parseType"], _ = best(lambda: [parseType(module.types, TokenList(expression)) for expression in expressions], repeats)
+    return times
+
+def runSuite(scale: float, only: List[str], repeats: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for name, shape in SUITE.items():
+        if only and not name in only:
+            continue
+        with inTemporaryDirectory() as directory:
+            results[name] = runBenchmark(scaled(shape, scale), directory, repeats)
+    return results
+
+def isSlower(seconds: float, before: float | None, threshold: float, minDelta: float) -> bool:
+    return before is not None and before > 0 and seconds / before > threshold and seconds - before > minDelta
+
+# Benchmarks with a phase that looks slower than the baseline
+def slowerBenchmarks(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float, minDelta: float) -> List[str]:
+    return [name for name, times in results.items() if any([isSlower(seconds, baseline.get(name, {}).get(phase), threshold, minDelta) for phase, seconds in times.items()])]
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]] | None, threshold: float, minDelta: float) -> bool:
+    ok = True
+    print("%-12s %-10s %12s %12s %8s" % ("benchmark", "phase", "time (ms)", "baseline", "ratio"))
+    for name, times in results.items():
+        for phase, seconds in times.items():
+            before = baseline.get(name, {}).get(phase) if baseline is not None else None
+            if before is None or before <= 0:
+                print("%-12s %-10s %12.3f %12s %8s" % (name, phase, seconds * 1e3, "-", "-"))
+                continue
+            ratio = seconds / before
+            flag = ""
+            if isSlower(seconds, before, threshold, minDelta):
+                flag = "  SLOWER"
+                ok = False
+            print("%-12s %-10s %12.3f %12.3f %7.2fx%s" % (name, phase, seconds * 1e3, before * 1e3, ratio, flag))
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="Benchmarks.Suite")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the size of every generated program")
+    parser.add_argument("--only", nargs="*", default=[], help="just run these benchmarks")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--output", help="write these results to a file too")
+    parser.add_argument("--threshold", type=float, default=1.25, help="how many times slower than the baseline counts as a regression")
+    parser.add_argument("--min-delta", type=float, default=MIN_DELTA * 1e3, help="milliseconds slower a phase has to be as well before it counts")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="how many times each phase is run, the fastest is kept")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="how many more times to run a benchmark that looks slower before believing it")
+    options = parser.parse_args()
+
+    results = runSuite(options.scale, options.only, options.repeats)
+    report = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scale": options.scale,
+        "results": results,
+    }
+
+    baseline = None
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as io:
+            stored = json.load(io)
+        # Different sized programs can't be compared
+        if stored.get("version") == RESULTS_VERSION and stored.get("scale") == options.scale:
+            baseline = stored["results"]
+        else:
+            print("Baseline was recorded at a different scale or version, not comparing")
+    # Something that looks slower is run again, and only counts if it's still slower at its fastest
+    for _ in range(options.retries if baseline is not None and not options.save_baseline else 0):
+        slower = slowerBenchmarks(results, baseline, options.threshold, options.min_delta / 1e3)
+        if not slower:
+            break
+        for name, times in runSuite(options.scale, slower, options.repeats).items():
+            results[name] = {phase: min(seconds, results[name][phase]) for phase, seconds in times.items()}
+    ok = compare(results, baseline, options.threshold, options.min_delta / 1e3)
+
+    if options.output:
+        with open(options.output, "w") as io:
+            io.write(json.dumps(report, indent=2) + "\n")
+    if options.save_baseline:
+        # Running only some of the benchmarks keeps the baseline for the rest
+        if baseline is not None:
+            report["results"] = {**baseline, **results}
+        with open(options.baseline, "w") as io:
+            io.write(json.dumps(report, indent=2) + "\n")
+    sys.exit(0 if ok or options.save_baseline else 1)
@@ -0,0 +1,58 @@
+import sys
+
+import Core
+from Types import *
+from Scanner.Tokens import *
+from Parser.Types import Symbol, SymbolTable
+from Benchmarks.Common import perRun
+
+# Run with: python -m Benchmarks.SymbolBenchmark [depth...]
+# Looks up a global from the innermost of a lot of nested scopes, each declaring a few locals. The frames
+# column is the old SymbolFrame, which walked every parent frame on the way out
+
+class SymbolFrame:
+    def __init__(self, parent):
+        self.parent = parent
+        self.symbols: Dict[str, Symbol] = {}
+
+    def get(self, name: str) -> Symbol | None:
+        if name in self.symbols.keys():
+            return self.symbols[name]
+        elif self.parent is not None:
+            return self.parent.get(name)
+        return None
+
+    def add(self, symbol: Symbol):
+        self.symbols[symbol.token.string] = symbol
+
+LOCALS = 4
+
+def makeSymbol(name: str) -> Symbol:
+    return Symbol(Token(TT.Identifier, IdentifierType.OperatingIdentifier, Core.SourceInfo("bench.syl", 0, 0), name), IntType(False, 4), None)
+
+if __name__ == "__main__":
+    depths = [int(depth) for depth in sys.argv[1:]] if len(sys.argv) > 1 else [1, 10, 100, 500]
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), max(depths) * 2 + 100))
+    print("%6s %14s %14s %16s" % ("depth", "frames (us)", "table (us)", "push+pop (us)"))
+    for depth in depths:
+        frame = SymbolFrame(None)
+        table = SymbolTable()
+        frame.add(makeSymbol("global"))
+        table.add(makeSymbol("global"))
+        for level in range(depth):
+            frame = SymbolFrame(frame)
+            table.pushScope()
+            for i in range(LOCALS):
+                frame.add(makeSymbol("local" + str(i)))
+                table.add(makeSymbol("local" + str(i)))
+        assert frame.get("global") is not None and table.get("global") is not None
+        frames = perRun(lambda: frame.get("global"), 10000)
+        flat = perRun(lambda: table.get("global"), 100000)
+        symbols = [makeSymbol("local" + str(i)) for i in range(LOCALS)]
+        def scope():
+            table.pushScope()
+            for symbol in symbols:
+                table.add(symbol)
+            table.popScope()
+        pushPop = perRun(scope, 10000)
+        print("%6d %14.3f %14.3f %16.3f" % (depth, frames * 1e6, flat * 1e6, pushPop * 1e6))
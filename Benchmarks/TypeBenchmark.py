@@ -0,0 +1,38 @@
+import sys
+from dataclasses import fields
+
+from Types import *
+from Benchmarks.Common import perRun
+
+# Run with: python -m Benchmarks.TypeBenchmark [depth...]
+# Compares two separately built but identical types, and uses them as dict keys. The structural column
+# is what dataclass equality used to do, walking both types all the way down
+
+def buildType(depth: int, width: int = 3) -> SylphType:
+    if depth == 0:
+        return IntType(False, 4)
+    inner = [buildType(depth - 1, width) for _ in range(width)]
+    return SumType([PtrType(inner[0], True, 16), FunctionPtr(inner[1:], inner[0]), PtrType(inner[-1], False, None)])
+
+def structurallyEqual(a, b) -> bool:
+    if a.__class__ is not b.__class__:
+        return False
+    if isinstance(a, tuple):
+        return len(a) == len(b) and all([structurallyEqual(x, y) for x, y in zip(a, b)])
+    if not isinstance(a, SylphType):
+        return a == b
+    return all([structurallyEqual(getattr(a, field.name), getattr(b, field.name)) for field in fields(a)])
+
+if __name__ == "__main__":
+    depths = [int(depth) for depth in sys.argv[1:]] if len(sys.argv) > 1 else [2, 4, 6]
+    print("%6s %18s %18s %16s" % ("depth", "structural (us)", "interned (us)", "dict key (us)"))
+    for depth in depths:
+        first = buildType(depth)
+        second = buildType(depth)
+        assert first is second
+        structural = perRun(lambda: structurallyEqual(first, second), 20)
+        interned = perRun(lambda: first == second, 100000)
+        table = {first: "found"}
+        lookup = perRun(lambda: table[second], 100000)
+        print("%6d %18.2f %18.3f %16.3f" % (depth, structural * 1e6, interned * 1e6, lookup * 1e6))
+
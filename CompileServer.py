@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import selectors
+import socket
+import traceback
+from dataclasses import dataclass, field, asdict, replace
+from typing import List, Dict, Set
+import Core
+from Scanner.Tokens import Token
+from Scanner.TokenCache import TokenCache
+from Parser.StructurePass import StructurePass, StructureModule
+from Parser.FunctionPass import FunctionPass, ParsedFunction
+from Parser.Passes import compilePasses, wholeArrays
+from Parser.Interface import InterfaceStore, InterfaceLoader, ModuleInterface, encodeInterface
+from Types import SylphType
+from Layout import LayoutEngine, TARGETS, DEFAULT_TARGET
+from Driver import FileStats, PhaseTimer, formatErrors, formatTable
+
+SOCKET = ".sylph-server.sock"
+# How often files are checked for changes while the server is idle
+POLL_SECONDS = 0.2
+# Requests are a single line of JSON, anything bigger than this isn't one
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# Everything kept about one file between compiles. Each stage is dropped once what it was made from changes
+@dataclass
+class FileState:
+    filename: str
+    # Files are watched by absolute path, so it doesn't matter where the server is when it checks
+    path: str
+    stamp: tuple[int, int] | None = None
+    tokens: List[Token] | None = None
+    includes: List[tuple[str, Core.SourceInfo]] = field(default_factory=list)
+    module: StructureModule | None = None
+    # The file's interface without any keys, kept through edits to tell if what includes it needs redoing
+    shape: bytes | None = None
+    bodies: List[ParsedFunction] | None = None
+    # Array types the bodies take references to elements of, which have to be laid out whole
+    wholeArrays: Set[SylphType] = field(default_factory=set)
+
+@dataclass
+class WorkspaceStats:
+    compiles: int = 0
+    scanned: int = 0
+    structured: int = 0
+    parsed: int = 0
+    changes: int = 0
+
+class StageFailed(Exception):
+    def __init__(self, title: str, errors: List[Core.CompileError]):
+        self.title = title
+        self.errors = errors
+        super().__init__(title)
+
+def stampOf(path: str) -> tuple[int, int] | None:
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return info.st_mtime_ns, info.st_size
+
+# Two interfaces with the same shape give whoever includes them the same module, whatever their keys say
+def shapeOf(interface: ModuleInterface) -> bytes:
+    return encodeInterface(replace(interface, key="", includes=[(path, "") for path, _ in interface.includes]))
+
+# The files compiled from one directory. Include paths are relative to where the compiler runs, so each
+# directory a client compiles from gets its own
+class Workspace:
+
+    def __init__(self, directory: str, interfaceDirectory: str):
+        self.directory = directory
+        self.loader = InterfaceLoader(InterfaceStore(os.path.join(directory, interfaceDirectory)))
+        self.files: Dict[str, FileState] = {}
+        self.includers: Dict[str, Set[str]] = {}
+        self.stats = WorkspaceStats()
+
+    def state(self, filename: str) -> FileState:
+        state = self.files.get(filename)
+        if state is None:
+            state = FileState(filename, os.path.join(self.directory, filename))
+            self.files[filename] = state
+        return state
+
+    # Everything depending on a file's tokens goes with them, but its includers only need redoing if its
+    # interface turns out different once it's been structured again
+    def invalidate(self, filename: str):
+        state = self.files[filename]
+        state.tokens = None
+        state.module = None
+        state.bodies = None
+        self.loader.interfaces.pop(filename, None)
+
+    def dropModule(self, filename: str):
+        state = self.files[filename]
+        state.module = None
+        state.bodies = None
+        self.loader.interfaces.pop(filename, None)
+
+    # Modules have everything below them merged in, so it's every file that includes this one at any depth
+    def includersOf(self, filename: str) -> List[str]:
+        found: List[str] = []
+        stack = list(self.includers.get(filename, ()))
+        while stack:
+            includer = stack.pop()
+            if includer in found or includer == filename:
+                continue
+            found.append(includer)
+            stack.extend(self.includers.get(includer, ()))
+        return found
+
+    def poll(self) -> List[str]:
+        changed = [state.filename for state in self.files.values() if state.stamp is not None and stampOf(state.path) != state.stamp]
+        for filename in changed:
+            self.invalidate(filename)
+            self.files[filename].stamp = None
+        self.stats.changes += len(changed)
+        return changed
+
+    def scan(self, filename: str) -> FileState:
+        state = self.state(filename)
+        if state.tokens is not None:
+            return state
+        # Stamped before reading, so an edit made while it's being read is still seen as a change
+        state.stamp = stampOf(state.path)
+        success, result, includes = self.loader.scanAlone(filename)
+        if not success:
+            raise StageFailed("Scanner Errors:", result)
+        for path, _ in state.includes:
+            self.includers.get(path, set()).discard(filename)
+        for path, _ in includes:
+            self.includers.setdefault(path, set()).add(filename)
+        state.tokens = result
+        state.includes = includes
+        self.stats.scanned += 1
+        return state
+
+    # Every file the root needs, each after everything it includes, the same order splicing would have used
+    def includeOrder(self, root: str) -> List[FileState]:
+        order: List[FileState] = []
+        seen: Set[str] = set()
+        stack: List[tuple[str, bool]] = [(root, False)]
+        while stack:
+            filename, expanded = stack.pop()
+            if expanded:
+                order.append(self.files[filename])
+                continue
+            if filename in seen:
+                continue
+            seen.add(filename)
+            state = self.scan(filename)
+            stack.append((filename, True))
+            stack.extend([(path, False) for path, _ in reversed(state.includes)])
+        return order
+
+    def structure(self, state: FileState) -> bool:
+        if state.module is not None:
+            return False
+        success, module = self.loader.includedModule(state.filename, state.includes)
+        if success and len(state.tokens) > 0:
+            success, module = StructurePass(state.tokens, module)
+        if not success:
+            raise StageFailed("Structure Pass Errors:", module)
+        success, errors = module.verify()
+        if not success:
+            raise StageFailed("Verification Errors", errors)
+
+        self.loader.writeInterface(state.filename, module, state.includes)
+        shape = shapeOf(self.loader.interfaces[state.filename])
+        if state.shape is not None and shape != state.shape:
+            for includer in self.includersOf(state.filename):
+                self.dropModule(includer)
+        state.shape = shape
+        state.module = module
+        state.bodies = None
+        self.stats.structured += 1
+        return True
+
+    def parseBodies(self, state: FileState, workers: int) -> bool:
+        if state.bodies is not None:
+            return False
+        manager = compilePasses(state.module)
+        success, result = FunctionPass(state.module, workers, None, manager)
+        if not success:
+            raise StageFailed("Function Pass Errors:", result)
+        state.bodies = result
+        state.wholeArrays = wholeArrays(manager)
+        self.stats.parsed += 1
+        return True
+
+    # Brings every file the root needs up to date, redoing only the stages whose inputs changed
+    def compile(self, filename: str, target: str, workers: int) -> tuple[FileStats, List[str]]:
+        stats = FileStats(filename)
+        self.stats.compiles += 1
+        self.poll()
+        try:
+            with PhaseTimer(stats, "scan", False) as phase:
+                scanned = self.stats.scanned
+                order = self.includeOrder(filename)
+            phase.counters["files"] = len(order)
+            phase.counters["rescanned"] = self.stats.scanned - scanned
+
+            with PhaseTimer(stats, "structure", False) as phase:
+                phase.counters["restructured"] = sum([self.structure(state) for state in order])
+            phase.counters["functions"] = sum([len([func for func in funcs if not func.external]) for funcs in order[-1].module.functions.values()])
+
+            with PhaseTimer(stats, "functions", False) as phase:
+                phase.counters["reparsed"] = sum([self.parseBodies(state, workers) for state in order])
+            phase.counters["bodies"] = sum([len(state.bodies) for state in order])
+
+            with PhaseTimer(stats, "layout", False) as phase:
+                layoutEngine = LayoutEngine.forTarget(TARGETS[target], set().union(*[state.wholeArrays for state in order]))
+                layouts = layoutEngine.layoutTypes(order[-1].module.types)
+            phase.counters["types"] = len(layouts)
+        except StageFailed as failed:
+            stats.success = False
+            return stats, [formatErrors(failed.title, failed.errors)]
+        return stats, []
+
+# Compiles files for clients on a local socket, one request at a time, and keeps what it's done in memory
+# between requests. While it's waiting, every file it has seen is checked for changes
+class CompileServer:
+
+    def __init__(self, socketPath: str = SOCKET, interfaceDirectory: str = TokenCache.DIRECTORY):
+        self.socketPath = os.path.abspath(socketPath)
+        self.interfaceDirectory = interfaceDirectory
+        self.workspaces: Dict[str, Workspace] = {}
+        self.running = False
+
+    def workspace(self, directory: str) -> Workspace:
+        if not directory in self.workspaces:
+            self.workspaces[directory] = Workspace(directory, self.interfaceDirectory)
+        return self.workspaces[directory]
+
+    def handle(self, request: dict) -> dict:
+        match request.get("command"):
+            case "compile":
+                directory = request.get("cwd", os.getcwd())
+                os.chdir(directory)
+                workspace = self.workspace(directory)
+                target = request.get("target", DEFAULT_TARGET.name)
+                if not target in TARGETS:
+                    return {"success": False, "output": "Unknown target \"" + target + "\""}
+                allStats: List[FileStats] = []
+                output: List[str] = []
+                for filename in request.get("files", []):
+                    stats, errors = workspace.compile(filename, target, request.get("workers", 1))
+                    allStats.append(stats)
+                    output.extend(errors)
+                    if stats.success and not request.get("quiet", False):
+                        output.append(str(workspace.files[filename].module))
+                if request.get("stats", False):
+                    output.append(formatTable(allStats))
+                return {"success": all([stats.success for stats in allStats]), "output": "\n".join(output), "files": [asdict(stats) for stats in allStats]}
+            case "stats":
+                return {"success": True, "workspaces": {directory: asdict(workspace.stats) for directory, workspace in self.workspaces.items()}}
+            case "shutdown":
+                self.running = False
+                return {"success": True}
+        return {"success": False, "output": "Unknown command " + json.dumps(request.get("command"))}
+
+    def respond(self, connection: socket.socket):
+        connection.settimeout(5)
+        with connection, connection.makefile("rwb") as io:
+            line = io.readline(MAX_REQUEST_BYTES)
+            try:
+                response = self.handle(json.loads(line))
+            except Exception:
+                # A broken request or a bug in the compiler shouldn't take down everything else in memory
+                response = {"success": False, "output": traceback.format_exc()}
+            io.write((json.dumps(response) + "\n").encode("utf-8"))
+
+    def poll(self):
+        for workspace in self.workspaces.values():
+            workspace.poll()
+
+    def serve(self):
+        if os.path.exists(self.socketPath):
+            os.remove(self.socketPath)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socketPath)
+        listener.listen()
+        selector = selectors.DefaultSelector()
+        selector.register(listener, selectors.EVENT_READ)
+        self.running = True
+        try:
+            while self.running:
+                if selector.select(POLL_SECONDS):
+                    connection, _ = listener.accept()
+                    self.respond(connection)
+                else:
+                    self.poll()
+        finally:
+            selector.close()
+            listener.close()
+            if os.path.exists(self.socketPath):
+                os.remove(self.socketPath)
+
+def main(arguments: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="sylph-server", description="Keeps compiled Sylph files in memory and recompiles them for client.py")
+    parser.add_argument("--socket", default=SOCKET, help="where to listen")
+    parser.add_argument("--interfaces", default=TokenCache.DIRECTORY, metavar="DIR", help="where to keep interface files, relative to each client's directory")
+    options = parser.parse_args(arguments)
+    CompileServer(options.socket, options.interfaces).serve()
+    return 0
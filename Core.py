@@ -3,7 +3,7 @@ from dataclasses import dataclass
 
 MAX_ERRORS = 20
 
-@dataclass
+@dataclass(slots=True)
 class SourceInfo:
     source_name: str
     line_number: int
@@ -15,28 +15,45 @@ class CompileError(Exception):
         self.location = location
         super().__init__(str(location) + " Uncaught Compiler Error: " + self.message)
 
+    # So errors survive being sent back from worker processes
+    def __reduce__(self):
+        return (self.__class__, (self.message, self.location))
+
 class RuntimeError(Exception):
     def __init__(self, message, location):
         self.message = message
         self.location = location
         super().__init__(str(location) + " Internal Runtime Error: " + self.message)
 
-def orError(func):
-    def wrapper(*args, **kwargs):
-        result = None
-        try:
-            result = func(*args, **kwargs)
-        except CompileError as cError:
-            result = cError
-        return result
-    return wrapper
-
-def orErrorMethod(func):
-    def wrapper(self, *args, **kwargs):
-        result = None
-        try:
-            result = func(self, *args, **kwargs)
-        except CompileError as cError:
-            result = cError
-        return result
-    return wrapper
\ No newline at end of file
+    def __reduce__(self):
+        return (self.__class__, (self.message, self.location))
+
+# What a parse function gives back once it's reported an error, rather than raising it. Callers check for it with
+# "is" and hand it straight back up, so an error costs one comparison per level instead of an exception
+class Failed:
+    def __repr__(self) -> str:
+        return "FAILED"
+
+FAILED = Failed()
+
+# Where errors are reported as they're found. Stops taking them once it has MAX_ERRORS, like every error loop does
+class Diagnostics:
+    def __init__(self, limit: int = MAX_ERRORS):
+        self.errors: list[CompileError] = []
+        self.limit = limit
+
+    def error(self, message: str, location: SourceInfo) -> Failed:
+        if len(self.errors) < self.limit:
+            self.errors.append(CompileError(message, location))
+        return FAILED
+
+    def add(self, error: CompileError) -> Failed:
+        if len(self.errors) < self.limit:
+            self.errors.append(error)
+        return FAILED
+
+    def full(self) -> bool:
+        return len(self.errors) >= self.limit
+
+    def __len__(self) -> int:
+        return len(self.errors)
@@ -0,0 +1,219 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict
+import Core
+from Scanner.Scanner import Scanner, ScanEngine
+from Scanner.TokenCache import TokenCache
+from Parser.StructurePass import StructurePass, StructureModule
+from Parser.FunctionPass import FunctionPass
+from Parser.Passes import PassManager, compilePasses, wholeArrays
+from Parser.Interface import InterfaceStore, InterfaceLoader
+from Layout import LayoutEngine, TARGETS, DEFAULT_TARGET
+
+# Bumped whenever the layout of the JSON stats changes
+STATS_VERSION = 1
+
+@dataclass
+class PhaseStats:
+    name: str
+    seconds: float = 0.0
+    # Only measured with --stats, tracing allocations slows everything down a lot
+    peakBytes: int | None = None
+    counters: Dict[str, int | float] = field(default_factory=dict)
+
+@dataclass
+class FileStats:
+    filename: str
+    success: bool = True
+    phases: List[PhaseStats] = field(default_factory=list)
+
+# Times a phase and, when memory is being traced, the most that was allocated at once during it
+class PhaseTimer:
+    def __init__(self, stats: FileStats, name: str, traceMemory: bool):
+        self.phase = PhaseStats(name)
+        self.traceMemory = traceMemory
+        stats.phases.append(self.phase)
+
+    def __enter__(self) -> PhaseStats:
+        if self.traceMemory:
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self.phase
+
+    def __exit__(self, *_):
+        self.phase.seconds = time.perf_counter() - self.start
+        if self.traceMemory:
+            self.phase.peakBytes = tracemalloc.get_traced_memory()[1]
+        return False
+
+# The analyses are run inside the function pass, so their rows are part of its time rather than added to it
+def analysisPhases(manager: PassManager) -> List[PhaseStats]:
+    phases = [PhaseStats("functions/walk", manager.walkSeconds, counters={"walks": manager.walks})]
+    for analysis, passStats in zip(manager.passes, manager.stats):
+        phases.append(PhaseStats("functions/" + passStats.name, passStats.seconds, counters={"nodes": passStats.nodes, "errors": len(analysis.errors)}))
+    return phases
+
+def parseArguments(arguments: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="sylph", description="Compiles Sylph source files")
+    parser.add_argument("files", nargs="*", default=["simple.syl"])
+    parser.add_argument("--time-passes", "--stats", dest="stats", action="store_true", help="report time, counters and peak memory for each phase")
+    parser.add_argument("--stats-json", metavar="FILE", help="also write the stats as JSON, - for stdout")
+    parser.add_argument("--engine", choices=["fast", "reader"], default="fast", help="which scanner to use")
+    parser.add_argument("--compact", action="store_true", help="keep tokens in a TokenStore rather than a list")
+    parser.add_argument("--stream", action="store_true", help="parse tokens as they're scanned rather than scanning everything first")
+    parser.add_argument("--workers", type=int, default=1, help="lex included files and parse function bodies across this many processes")
+    parser.add_argument("--cache", nargs="?", const=TokenCache.DIRECTORY, metavar="DIR", help="reuse tokens for files that haven't changed")
+    parser.add_argument("--interfaces", nargs="?", const=TokenCache.DIRECTORY, metavar="DIR", help="compile against the interfaces of included files rather than their source")
+    parser.add_argument("--entry", action="append", metavar="NAME", help="only compile what this function needs, can be given more than once")
+    parser.add_argument("--target", choices=list(TARGETS.keys()), default=DEFAULT_TARGET.name, help="what machine to lay data out for")
+    parser.add_argument("--quiet", action="store_true", help="don't print the collected module")
+    return parser.parse_args(arguments)
+
+def formatErrors(title: str, errors: List[Core.CompileError]) -> str:
+    return "\n".join([title] + ["\t " + str(error) for error in errors])
+
+def printErrors(title: str, errors: List[Core.CompileError]):
+    print(formatErrors(title, errors))
+
+def compileFile(filename: str, options: argparse.Namespace, cache: TokenCache | None, loader: InterfaceLoader | None = None) -> FileStats:
+    stats = FileStats(filename)
+    engine = ScanEngine.Reader if options.engine == "reader" else ScanEngine.Fast
+    traceMemory = options.stats
+
+    if options.stream:
+        # Scanning and the structure pass run interleaved, so they can only be timed together
+        errors: List[Core.CompileError] = []
+        with PhaseTimer(stats, "scan+structure", traceMemory) as phase:
+            tokens = Scanner.stream(filename, errors, engine)
+            success, structureResult = StructurePass(tokens)
+        if len(errors) > 0:
+            printErrors("Scanner Errors:", errors)
+            stats.success = False
+            return stats
+    elif loader is not None:
+        # Only this file is lexed, whatever it includes comes in through interfaces
+        with PhaseTimer(stats, "scan", traceMemory) as phase:
+            success, scannerResult, includes = loader.scanAlone(filename, options.compact)
+        if not success:
+            printErrors("Scanner Errors:", scannerResult)
+            stats.success = False
+            return stats
+        phase.counters["tokens"] = len(scannerResult)
+        phase.counters["includes"] = len(includes)
+
+        with PhaseTimer(stats, "interfaces", traceMemory) as phase:
+            loaded, rebuilt = loader.store.stats.loaded, loader.store.stats.rebuilt
+            success, structureResult = loader.includedModule(filename, includes)
+        phase.counters["loaded"] = loader.store.stats.loaded - loaded
+        phase.counters["rebuilt"] = loader.store.stats.rebuilt - rebuilt
+        if success:
+            with PhaseTimer(stats, "structure", traceMemory) as phase:
+                if len(scannerResult) > 0:
+                    success, structureResult = StructurePass(scannerResult, structureResult)
+            if success:
+                loader.writeInterface(filename, structureResult, includes)
+    else:
+        with PhaseTimer(stats, "scan", traceMemory) as phase:
+            success, scannerResult = Scanner.scan(filename, engine, options.compact, options.workers, cache)
+        if not success:
+            printErrors("Scanner Errors:", scannerResult)
+            stats.success = False
+            return stats
+        phase.counters["tokens"] = len(scannerResult)
+        phase.counters["tokensPerSecond"] = len(scannerResult) / phase.seconds if phase.seconds > 0 else 0
+
+        with PhaseTimer(stats, "structure", traceMemory) as phase:
+            success, structureResult = StructurePass(scannerResult)
+
+    if not success:
+        printErrors("Structure Pass Errors:", structureResult)
+        stats.success = False
+        return stats
+    phase.counters["functions"] = sum([len([func for func in functions if not func.external]) for functions in structureResult.functions.values()])
+    phase.counters["types"] = len(structureResult.types) - len(StructureModule.getGlobalTypes())
+
+    with PhaseTimer(stats, "verify", traceMemory) as phase:
+        success, errors = structureResult.verify()
+    phase.counters["errors"] = len(errors)
+    if not success:
+        printErrors("Verification Errors", errors)
+        stats.success = False
+        return stats
+
+    manager = compilePasses(structureResult, options.stats)
+    with PhaseTimer(stats, "functions", traceMemory) as phase:
+        success, functionResult = FunctionPass(structureResult, options.workers, options.entry, manager)
+    if not success:
+        printErrors("Function Pass Errors:", functionResult)
+        stats.success = False
+        return stats
+    phase.counters["bodies"] = len(functionResult)
+    phase.counters["skipped"] = sum([len([func for func in functions if not func.external]) for functions in structureResult.functions.values()]) - len(functionResult)
+    if options.stats:
+        stats.phases.extend(analysisPhases(manager))
+    # Inference doesn't cover the whole language yet, print or a for loop counter that was never declared can't be
+    # typed, so what the analyses find is reported without stopping the compile
+    analysisErrors = manager.errors()
+    phase.counters["analysisErrors"] = len(analysisErrors)
+    if len(analysisErrors) > 0:
+        printErrors("Analysis Errors:", analysisErrors[:Core.MAX_ERRORS])
+
+    with PhaseTimer(stats, "layout", traceMemory) as phase:
+        layoutEngine = LayoutEngine.forTarget(TARGETS[options.target], wholeArrays(manager))
+        layouts = layoutEngine.layoutTypes(structureResult.types)
+    phase.counters["types"] = len(layouts)
+    phase.counters["laidOut"] = len(layoutEngine.table())
+    phase.counters["wholeArrays"] = len(layoutEngine.wholeArrays)
+
+    if not options.quiet:
+        print(str(structureResult))
+    return stats
+
+def formatTable(allStats: List[FileStats]) -> str:
+    lines = ["%-24s %-20s %10s %12s  %s" % ("file", "phase", "time (ms)", "peak (KiB)", "counters")]
+    for stats in allStats:
+        for phase in stats.phases:
+            peak = "%12.1f" % (phase.peakBytes / 1024) if phase.peakBytes is not None else "%12s" % "-"
+            counters = ", ".join([name + "=" + ("%.0f" % value if isinstance(value, float) else str(value)) for name, value in phase.counters.items()])
+            lines.append("%-24s %-20s %10.3f %s  %s" % (stats.filename, phase.name, phase.seconds * 1e3, peak, counters))
+    return "\n".join(lines)
+
+def main(arguments: List[str]) -> int:
+    options = parseArguments(arguments)
+    cache = TokenCache(options.cache) if options.cache is not None else None
+    loader = InterfaceLoader(InterfaceStore(options.interfaces), cache) if options.interfaces is not None else None
+    if options.stats:
+        tracemalloc.start()
+
+    allStats: List[FileStats] = []
+    try:
+        for filename in options.files:
+            allStats.append(compileFile(filename, options, cache, loader))
+    finally:
+        if options.stats:
+            tracemalloc.stop()
+
+    if options.stats:
+        print(formatTable(allStats))
+        if cache is not None:
+            print(cache.stats.report())
+        if loader is not None:
+            print(loader.store.stats.report())
+    if options.stats_json is not None:
+        report = {"version": STATS_VERSION, "files": [asdict(stats) for stats in allStats]}
+        if cache is not None:
+            report["cache"] = asdict(cache.stats)
+        if loader is not None:
+            report["interfaces"] = asdict(loader.store.stats)
+        text = json.dumps(report, indent=2)
+        if options.stats_json == "-":
+            print(text)
+        else:
+            with open(options.stats_json, "w") as io:
+                io.write(text + "\n")
+
+    return 0 if all([stats.success for stats in allStats]) else -1
@@ -0,0 +1,185 @@
+from dataclasses import dataclass
+from typing import Dict, List, Set
+from Types import *
+
+# What the machine we're compiling for looks like, as far as laying out data goes
+@dataclass(frozen=True)
+class Target:
+    name: str
+    pointerSize: int
+    functionPointerSize: int
+    # Nothing ever needs to line up to more than this. 1 means the target doesn't care at all
+    maxAlignment: int
+
+# The 65816 can only really jump and load across banks with long (24 bit) addresses, and it's happy reading anything from anywhere
+SNES = Target("snes", pointerSize=3, functionPointerSize=3, maxAlignment=1)
+# Everything lines up to its size here, sums included. That costs room: the old sizes were the largest option plus
+# a byte of tag with no padding, and SumTest in test.syl was 64 * 9 = 576 bytes. Its largest options are pointers, so
+# each element would pad its tag out to 16 and the array would be 1024. Arrays of sums keep their tags apart instead
+# (536 bytes), unless something takes a reference to one of their elements
+X86_64 = Target("x86_64", pointerSize=8, functionPointerSize=8, maxAlignment=8)
+TARGETS: Dict[str, Target] = {target.name: target for target in [X86_64, SNES]}
+DEFAULT_TARGET = X86_64
+
+# Bit patterns a type never uses, which a sum holding it can use to say it's one of its other options instead
+@dataclass(frozen=True, slots=True)
+class Niche:
+    offset: int
+    size: int
+    # The unused values are start, start + 1, ... up to count of them
+    start: int
+    count: int
+
+    def after(self, used: int) -> "Niche | None":
+        return Niche(self.offset, self.size, self.start + used, self.count - used) if used < self.count else None
+
+# How a sum says which option it holds
+@dataclass(frozen=True, slots=True)
+class TagLayout:
+    # Where the tag (or the value holding the niche) is, and how many bytes of it. Arrays of sums with their tags kept
+    # apart have every tag in those bytes, packed bits at a time
+    offset: int
+    size: int
+    # 0 when there's no tag at all, and the other options live in the niche of the dataful one
+    bits: int
+    dataful: int | None = None
+    firstNiche: int = 0
+
+@dataclass(frozen=True, slots=True)
+class Layout:
+    size: int
+    alignment: int
+    # Where each part of the type starts. Sums are their payload then their tag, arrays are their first element,
+    # and arrays of sums with their tags kept apart are their payloads then their packed tags
+    offsets: tuple[int, ...] = ()
+    niche: Niche | None = None
+    tag: TagLayout | None = None
+
+def alignTo(value: int, alignment: int) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+# Works out how every type sits in memory for one target. Each type is only ever laid out once, and since types are
+# interned, asking again is one dict lookup however big or nested the type is
+class LayoutEngine:
+    engines: Dict[str, "LayoutEngine"] = {}
+
+    # Without packing, every sum is its largest option and then a byte of tag, the way C would lay out a tagged union
+    def __init__(self, target: Target, packSums: bool = True):
+        self.target = target
+        self.packSums = packSums
+        self.layouts: Dict[SylphType, Layout] = {}
+        self.wholeArrays: set[SylphType] = set()
+
+    # One engine is kept for each target, for as long as it's asked for with the same arrays kept whole
+    @staticmethod
+    def forTarget(target: Target = DEFAULT_TARGET, wholeArrays: Set[SylphType] = frozenset()) -> "LayoutEngine":
+        engine = LayoutEngine.engines.get(target.name)
+        if engine is None or engine.target != target or engine.wholeArrays != wholeArrays:
+            engine = LayoutEngine.engines[target.name] = LayoutEngine(target)
+            for arrayType in wholeArrays:
+                engine.keepWhole(arrayType)
+        return engine
+
+    # Arrays of sums keep every tag after all of the payloads, in as few bits as they need, whenever that's smaller.
+    # An element is in two pieces then, so nothing can point at one. An array type whose elements something takes a
+    # reference to (ref a[i]) has to be told to keep each element whole, with its tag next to it. Since that's decided
+    # by type, every array of that type anywhere in what's being compiled together gets the same layout
+    def keepWhole(self, arrayType: PtrType):
+        if arrayType in self.wholeArrays:
+            return
+        self.wholeArrays.add(arrayType)
+        # Anything laid out already could have this array inside it at its split size
+        self.layouts.clear()
+
+    def layout(self, sylphType: SylphType) -> Layout:
+        found = self.layouts.get(sylphType)
+        if found is None:
+            found = self.layouts[sylphType] = self.compute(sylphType)
+        return found
+
+    def sizeOf(self, sylphType: SylphType) -> int:
+        return self.layout(sylphType).size
+
+    def alignmentOf(self, sylphType: SylphType) -> int:
+        return self.layout(sylphType).alignment
+
+    # Everything laid out so far, for code generation to pick through
+    def table(self) -> Dict[SylphType, Layout]:
+        return dict(self.layouts)
+
+    def layoutTypes(self, types: Dict[str, SylphType]) -> Dict[str, Layout]:
+        return {name: self.layout(sylphType) for name, sylphType in types.items()}
+
+    def scalar(self, size: int, niche: Niche | None = None) -> Layout:
+        return Layout(size, max(1, min(size, self.target.maxAlignment)), niche=niche)
+
+    # Sylph pointers are never null (that's what "or Null" is for), so null is free for a sum to use
+    def pointer(self, size: int) -> Layout:
+        return self.scalar(size, Niche(0, size, 0, 1) if self.packSums else None)
+
+    def compute(self, sylphType: SylphType) -> Layout:
+        match sylphType:
+            case IntType(_, sizeBytes):
+                return self.scalar(sizeBytes)
+            case FloatType(double):
+                return self.scalar(8 if double else 4)
+            case BoolType():
+                return self.scalar(1, Niche(0, 1, 2, 254) if self.packSums else None)
+            # Under the hood its just a pointer
+            case StringType():
+                return self.pointer(self.target.pointerSize)
+            # Now... I really hope 0 makes sense
+            case NullType():
+                return Layout(0, 1)
+            case PtrType(ptrOf, True, length):
+                return self.arrayLayout(self.layout(ptrOf), length, isinstance(ptrOf, SumType) and not sylphType in self.wholeArrays)
+            case PtrType():
+                return self.pointer(self.target.pointerSize)
+            case FunctionPtr():
+                return self.pointer(self.target.functionPointerSize)
+            # Sums inside sums were already flattened into one when the type was made
+            case SumType(options):
+                options = [self.layout(option) for option in options]
+                if self.packSums:
+                    return self.nicheLayout(options) or self.taggedLayout(options, tagBytes(len(options)))
+                return self.taggedLayout(options, 1)
+        raise Exception("No layout for type " + str(sylphType))
+
+    def arrayLayout(self, element: Layout, length: int, splitTags: bool = False) -> Layout:
+        # Elements are already padded out to their alignment, so the size is the stride
+        inline = Layout(element.size * length, element.alignment, (0,), element.niche if length > 0 else None)
+        if not splitTags or not self.packSums or element.tag is None or element.tag.bits == 0:
+            return inline
+        # Tags padded out next to every payload can cost as much as the payload does. Keeping the payloads together,
+        # and every tag after them in as few bits as it needs, is often a lot smaller
+        payloads = alignTo(element.tag.offset, element.alignment) * length
+        tags = (length * element.tag.bits + 7) // 8
+        split = Layout(alignTo(payloads + tags, element.alignment), element.alignment, (0, payloads), tag=TagLayout(payloads, tags, element.tag.bits))
+        return split if split.size < inline.size else inline
+
+    # When every other option is empty (like Null), they can be told apart by values the largest option never uses, and there's no tag
+    def nicheLayout(self, options: List[Layout]) -> Layout | None:
+        empty = [option for option in options if option.size == 0]
+        if len(empty) != len(options) - 1:
+            return None
+        dataful = next(i for i, option in enumerate(options) if option.size > 0)
+        niche = options[dataful].niche
+        if niche is None or niche.count < len(empty):
+            return None
+        return Layout(options[dataful].size, options[dataful].alignment, (0,), niche.after(len(empty)), TagLayout(niche.offset, niche.size, 0, dataful, niche.start))
+
+    # Largest option, with the tag after it, and the whole thing padded out so the next one in an array lines up too.
+    # Tag values past the last option are free for an outer sum to use
+    def taggedLayout(self, options: List[Layout], tagSize: int) -> Layout:
+        tagAlignment = self.scalar(tagSize).alignment
+        alignment = max([option.alignment for option in options] + [tagAlignment])
+        tagOffset = alignTo(max([option.size for option in options]), tagAlignment)
+        niche = Niche(tagOffset, tagSize, len(options), (1 << (8 * tagSize)) - len(options)) if self.packSums else None
+        return Layout(alignTo(tagOffset + tagSize, alignment), alignment, (0, tagOffset), niche, TagLayout(tagOffset, tagSize, (len(options) - 1).bit_length()))
+
+# The fewest whole bytes that can count every option
+def tagBytes(options: int) -> int:
+    size = 1
+    while (1 << (8 * size)) < options:
+        size *= 2
+    return size
@@ -1,31 +1,35 @@
-from enum import Enum
+from enum import Flag
 from Scanner.Tokens import *
 from Types import SylphType
-from Parser.Types import SymbolFrame
 from dataclasses import dataclass
-from typing import Dict, Set
+from typing import ClassVar, Dict, Set
 from Parser.StructurePass import CollectedFunction
 from Parser.Types import Symbol
 
-class NodeTrait(Enum):
+class NodeTrait(Flag):
+    Nothing = 0
     # Assignable or addressable
-    LValue = 0
-    Constant = 1
+    LValue = 1
+    Constant = 2
     
 
+# Nodes are slotted, so they don't each carry a __dict__, and their traits live on the class since every node of
+# a class has the same ones. Nodes don't keep a symbol table either, only identifiers keep the one Symbol they
+# resolved to, and whatever needs the module is given it along with the tree
 def ast(*nodeTraits):
-    traits = set()
+    traits = NodeTrait.Nothing
     for trait in nodeTraits:
-        traits.add(trait)
+        traits |= trait
     def inner(cls):
-        cls.traits = lambda self: traits
-        return dataclass(cls)
+        cls = dataclass(cls, slots=True)
+        cls.traits = traits
+        return cls
     return inner
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
-    frame: SymbolFrame
+    traits: ClassVar[NodeTrait] = NodeTrait.Nothing
 
 @ast()
 class EmptyNode(Node):
@@ -35,10 +39,13 @@ class EmptyNode(Node):
 class Literal(Node):
     lit: Token
 
+# Only the innermost scope of a symbol table is live, so a variable is looked up once while its body is being
+# parsed and the Symbol it meant is kept here. Anything that isn't a variable, like a module function, has none
 @ast(NodeTrait.LValue)
 class Identifier(Node):
     token: Token
     name: str
+    symbol: Symbol | None = None
 
 @ast()
 class Block(Node):
@@ -68,6 +75,13 @@ class FunctionCall(Node):
     function: Node | CollectedFunction | Symbol
     arguments: List[Node]
 
+# Infix operators are just functions with two arguments
+@ast()
+class BinaryOp(Node):
+    operator: Token
+    left: Node
+    right: Node
+
 @ast(NodeTrait.LValue)
 class Index(Node):
     of: Node
@@ -95,7 +109,17 @@ class Dereference(Node):
 class Return(Node):
     val: Node
 
-@ast
+@ast()
 class Assign(Node):
     left: Node
-    right: Node
\ No newline at end of file
+    right: Node
+
+# Both x : T = value and x := value, where the type is left as None to be worked out from the value. It keeps the
+# Symbol it declared, which every use of the variable resolved to
+@ast(NodeTrait.LValue)
+class VariableDef(Node):
+    token: Token
+    name: str
+    type: SylphType | None
+    value: Node
+    symbol: Symbol | None = None
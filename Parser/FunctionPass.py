@@ -0,0 +1,468 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from typing import List, Dict, Set, Sequence
+import Core
+import Parser.AST as AST
+from Scanner.Tokens import *
+from Types import *
+from Parser.TokenList import TokenList, TokenRange, tokenListFor
+from Parser.Types import *
+from Parser.StructurePass import StructureModule, CollectedFunction
+from Parser.TypeParser import TypeTable, children
+from Parser.Passes import PassManager, TypeInference
+
+# How tightly each infix operator binds, tightest highest. Anything else tagged @infix, or any other
+# operator, sits between comparisons and arithmetic
+INFIX_PRECEDENCE: Dict[str, int] = {
+    "=": 1,
+    "or": 2, "||": 2,
+    "and": 3, "&&": 3,
+    "==": 4, "!=": 4, "<": 4, ">": 4, "<=": 4, ">=": 4,
+    "|": 6, "^": 6, "&": 6,
+    "+": 7, "-": 7,
+    "*": 8, "/": 8,
+}
+USER_PRECEDENCE = 5
+CAST_PRECEDENCE = 9
+PREFIX_PRECEDENCE = 10
+POSTFIX_OPERATORS = {"++", "--"}
+
+# Everything about the module a function body can see while it's parsed. Every worker gets its own copy up
+# front, and nothing ever writes to it, so bodies can be parsed in any order
+@dataclass
+class ModuleSnapshot:
+    types: TypeDict
+    infix: Set[str]
+    prefix: Set[str]
+    postfix: Set[str]
+
+    @staticmethod
+    def of(module: StructureModule) -> "ModuleSnapshot":
+        tagged: Dict[TagType, Set[str]] = {tag: set() for tag in TagType}
+        for name, funcs in module.functions.items():
+            for func in funcs:
+                for tag in func.signiture.tags:
+                    tagged[tag].add(name)
+        return ModuleSnapshot(dict(module.types), tagged[TagType.Infix], tagged[TagType.Prefix], tagged[TagType.Postfix])
+
+@dataclass
+class ParsedFunction:
+    function: CollectedFunction
+    body: AST.Block
+    # The module's own table, shared by every body, for a TypeTable to look module functions up in. The body's
+    # variables aren't in it, their scopes are gone, but each of its identifiers kept the Symbol it resolved to
+    symbols: SymbolTable
+    # Bodies run through a TypeInference, or reached from entry points, were typed as they were parsed, with any errors
+    # in the table's diagnostics. Anything else is left for whoever needs it
+    types: TypeTable | None = None
+
+# A Pratt parser over one function's tokens. Statements are just expressions one after another. Like the structure
+# pass, an error is reported to the diagnostics and FAILED handed back, which every level passes straight up
+class BodyParser:
+
+    def __init__(self, snapshot: ModuleSnapshot, tList: TokenList, symbols: SymbolTable, diagnostics: Core.Diagnostics):
+        self.snapshot = snapshot
+        self.tList = tList
+        self.symbols = symbols
+        self.diagnostics = diagnostics
+
+    def statements(self, end: TT | None) -> List[AST.Node] | Core.Failed:
+        contents: List[AST.Node] = []
+        while self.tList.hasTokens() and self.tList.peekType() != end:
+            statement = self.statement()
+            if statement is Core.FAILED:
+                return Core.FAILED
+            contents.append(statement)
+        return contents
+
+    def statement(self) -> AST.Node | Core.Failed:
+        if self.tList.peekType() == TT.Identifier and self.tList.peekType(1) == TT.Colon:
+            return self.variableDef()
+        return self.expression(0)
+
+    def variableDef(self) -> AST.Node | Core.Failed:
+        FAILED = Core.FAILED
+        tList = self.tList
+        nameToken = tList.get()
+        if tList.want(TT.Colon, self.diagnostics) is FAILED:
+            return FAILED
+        varType = None
+        if tList.peekStr() != "=":
+            varType = readType(self.snapshot.types, tList, self.diagnostics)
+            if varType is FAILED:
+                return FAILED
+        if tList.want("=", self.diagnostics) is FAILED:
+            return FAILED
+        value = self.expression(0)
+        if value is FAILED:
+            return FAILED
+        symbol = Symbol(nameToken, varType, nameToken.location)
+        self.symbols.add(symbol)
+        return AST.VariableDef(nameToken, nameToken.string, varType, value, symbol)
+
+    def isInfix(self, token: Token) -> bool:
+        if token.ttype != TT.Identifier or token.string in POSTFIX_OPERATORS:
+            return False
+        return token.detail == IdentifierType.OperatingIdentifier or token.string in INFIX_PRECEDENCE or token.string in self.snapshot.infix
+
+    def expression(self, minimum: int) -> AST.Node | Core.Failed:
+        FAILED = Core.FAILED
+        tList = self.tList
+        diagnostics = self.diagnostics
+        left = self.prefix()
+        if left is FAILED:
+            return FAILED
+        while True:
+            token = tList.peek()
+            match token.ttype, token.detail:
+                case TT.OpenBracket, _:
+                    tList.get()
+                    arguments: List[AST.Node] = []
+                    while tList.peekType() != TT.CloseBracket:
+                        if len(arguments) > 0 and tList.want(TT.Comma, diagnostics) is FAILED:
+                            return FAILED
+                        argument = self.expression(0)
+                        if argument is FAILED:
+                            return FAILED
+                        arguments.append(argument)
+                    if tList.want(TT.CloseBracket, diagnostics) is FAILED:
+                        return FAILED
+                    left = AST.FunctionCall(left, arguments)
+                case TT.OpenBrace, _:
+                    tList.get()
+                    by = self.expression(0)
+                    if by is FAILED or tList.want(TT.CloseBrace, diagnostics) is FAILED:
+                        return FAILED
+                    left = AST.Index(left, by)
+                case TT.Identifier, _ if token.string in POSTFIX_OPERATORS or token.string in self.snapshot.postfix:
+                    tList.get()
+                    left = AST.FunctionCall(AST.Identifier(token, token.string), [left])
+                case TT.Keyword, (Keywords.As | Keywords.Is) if CAST_PRECEDENCE > minimum:
+                    tList.get()
+                    castType = readType(self.snapshot.types, tList, diagnostics)
+                    if castType is FAILED:
+                        return FAILED
+                    left = (AST.As if token.detail == Keywords.As else AST.Is)(left, castType)
+                case TT.Identifier, _ if self.isInfix(token):
+                    precedence = INFIX_PRECEDENCE.get(token.string, USER_PRECEDENCE)
+                    if precedence <= minimum:
+                        return left
+                    tList.get()
+                    # Assignment is the only one that groups to the right
+                    if token.string == "=":
+                        if not AST.NodeTrait.LValue in left.traits:
+                            return diagnostics.error("Cannot assign to this expression", token.location)
+                        right = self.expression(precedence - 1)
+                        if right is FAILED:
+                            return FAILED
+                        left = AST.Assign(left, right)
+                    else:
+                        right = self.expression(precedence)
+                        if right is FAILED:
+                            return FAILED
+                        left = AST.BinaryOp(token, left, right)
+                case _:
+                    return left
+
+    def prefix(self) -> AST.Node | Core.Failed:
+        FAILED = Core.FAILED
+        tList = self.tList
+        diagnostics = self.diagnostics
+        token = tList.peek()
+        match token.ttype, token.detail:
+            case TT.Literal, _:
+                return AST.Literal(tList.get())
+            case TT.OpenBracket, _:
+                tList.get()
+                inner = self.expression(0)
+                if inner is FAILED or tList.want(TT.CloseBracket, diagnostics) is FAILED:
+                    return FAILED
+                return inner
+            case TT.OpenCurly, _:
+                tList.get()
+                with self.symbols.scope():
+                    contents = self.statements(TT.CloseCurly)
+                if contents is FAILED or tList.want(TT.CloseCurly, diagnostics) is FAILED:
+                    return FAILED
+                return AST.Block(contents)
+            case TT.Keyword, Keywords.If:
+                return self.ifExpression()
+            case TT.Keyword, Keywords.While:
+                tList.get()
+                condition = self.expression(0)
+                if condition is FAILED or tList.want(Keywords.Do, diagnostics) is FAILED:
+                    return FAILED
+                body = self.statement()
+                if body is FAILED:
+                    return FAILED
+                elseNode = self.statement() if tList.match(Keywords.Else)[0] else AST.EmptyNode()
+                if elseNode is FAILED:
+                    return FAILED
+                return AST.While(condition, body, elseNode)
+            case TT.Keyword, Keywords.For:
+                return self.forExpression()
+            case TT.Keyword, Keywords.Return:
+                tList.get()
+                if not tList.hasTokens() or tList.peekType() == TT.CloseCurly:
+                    return AST.Return(AST.EmptyNode())
+                value = self.expression(0)
+                return FAILED if value is FAILED else AST.Return(value)
+            case TT.Keyword, Keywords.Ref:
+                tList.get()
+                of = self.expression(PREFIX_PRECEDENCE)
+                return FAILED if of is FAILED else AST.Reference(of)
+            case TT.Keyword, Keywords.Deref:
+                tList.get()
+                of = self.expression(PREFIX_PRECEDENCE)
+                return FAILED if of is FAILED else AST.Dereference(of)
+            case TT.Identifier, _ if token.detail == IdentifierType.OperatingIdentifier or token.string in self.snapshot.prefix:
+                tList.get()
+                operand = self.expression(PREFIX_PRECEDENCE)
+                return FAILED if operand is FAILED else AST.FunctionCall(AST.Identifier(token, token.string), [operand])
+            case TT.Identifier, _:
+                tList.get()
+                return AST.Identifier(token, token.string, self.symbols.get(token.string))
+        return diagnostics.error("Expected an expression, found \"" + token.string + "\"", token.location)
+
+    # elif is just an if in the else
+    def ifExpression(self) -> AST.Node | Core.Failed:
+        FAILED = Core.FAILED
+        tList = self.tList
+        tList.get()
+        condition = self.expression(0)
+        if condition is FAILED or tList.want(Keywords.Then, self.diagnostics) is FAILED:
+            return FAILED
+        body = self.statement()
+        if body is FAILED:
+            return FAILED
+        elseNode = AST.EmptyNode()
+        if tList.matchBool(Keywords.Elif):
+            elseNode = self.ifExpression()
+        elif tList.match(Keywords.Else)[0]:
+            elseNode = self.statement()
+        if elseNode is FAILED:
+            return FAILED
+        return AST.If(condition, body, elseNode)
+
+    def forExpression(self) -> AST.Node | Core.Failed:
+        FAILED = Core.FAILED
+        tList = self.tList
+        tList.get()
+        with self.symbols.scope():
+            parts: List[AST.Node] = []
+            for end in [TT.Semicolon, TT.Semicolon, Keywords.Do]:
+                if tList.matchBool(end):
+                    parts.append(AST.EmptyNode())
+                else:
+                    part = self.statement()
+                    if part is FAILED:
+                        return FAILED
+                    parts.append(part)
+                if tList.want(end, self.diagnostics) is FAILED:
+                    return FAILED
+            body = self.statement()
+        if body is FAILED:
+            return FAILED
+        return AST.For(parts[0], parts[1], parts[2], body)
+
+# Parses one function against the snapshot. Every scope is popped again by the end, so nothing is left in the
+# symbol table, but each variable in the body already has the Symbol it resolved to. Like parseType, the first
+# error is handed back as a value, since that's what has to go back from a worker anyway
+def parseBody(snapshot: ModuleSnapshot, function: CollectedFunction, module: StructureModule | None = None) -> AST.Block | Core.CompileError:
+    symbols = SymbolTable(module)
+    diagnostics = Core.Diagnostics(1)
+    parser = BodyParser(snapshot, tokenListFor(function.definition), symbols, diagnostics)
+    with symbols.scope():
+        for argToken, argType in zip(function.argTokens, function.signiture.argumentTypes):
+            symbols.add(Symbol(argToken, argType, argToken.location))
+        contents = parser.statements(None)
+    if contents is Core.FAILED:
+        return diagnostics.errors[0]
+    return AST.Block(contents)
+
+# The functions a body calls. Once it's been typed, that's the overload each call resolved to. Otherwise it's every
+# overload of anything the body calls or uses as an operator, whatever it would've resolved to
+def calledFunctions(body: AST.Node, module: StructureModule, table: TypeTable | None) -> List[CollectedFunction]:
+    found: List[CollectedFunction] = []
+    stack: List[AST.Node] = [body]
+    while stack:
+        node = stack.pop()
+        if table is not None:
+            func = table.calls.get(id(node))
+            if func is not None:
+                found.append(func)
+        elif isinstance(node, AST.FunctionCall) and isinstance(node.function, AST.Identifier):
+            found.extend(module.functions.get(node.function.name, []))
+        elif isinstance(node, AST.BinaryOp):
+            found.extend(module.functions.get(node.operator.string, []))
+        stack.extend(children(node))
+    return found
+
+# Pickling a deep tree recurses once per level, and a long line of sums is thousands of levels deep. Packed nodes are
+# flat, each one's children are numbers pointing back at nodes earlier in the list. Tokens are sent as negative numbers
+# counting into the function's own definition, which the other side already has. Nodes never hold plain ints
+# themselves, so any int in a packed node is one of those
+def packTree(root: AST.Node, tokenIndices: Dict[int, int] | None = None) -> List[tuple]:
+    packed: List[tuple] = []
+    indices: Dict[int, int] = {}
+    stack: List[tuple[AST.Node, bool]] = [(root, False)]
+    while stack:
+        node, childrenPacked = stack.pop()
+        if id(node) in indices:
+            continue
+        values = [getattr(node, name) for name in nodeFields(node.__class__)]
+        if not childrenPacked:
+            stack.append((node, True))
+            for value in values:
+                if isinstance(value, AST.Node):
+                    stack.append((value, False))
+                elif isinstance(value, list):
+                    stack.extend([(item, False) for item in value])
+            continue
+        for i, value in enumerate(values):
+            if isinstance(value, AST.Node):
+                values[i] = indices[id(value)]
+            elif isinstance(value, list):
+                values[i] = [indices[id(item)] for item in value]
+            elif value.__class__ is Token and tokenIndices is not None and id(value) in tokenIndices:
+                values[i] = -1 - tokenIndices[id(value)]
+        indices[id(node)] = len(packed)
+        packed.append((node.__class__, values))
+    return packed
+
+def unpackTree(packed: List[tuple], tokens: Sequence[Token]) -> AST.Node:
+    # A range's tokens are read straight out of what's under it
+    offset = 0
+    if isinstance(tokens, TokenRange):
+        tokens, offset = tokens.tokens, tokens.start
+    nodes: List[AST.Node] = []
+    for cls, values in packed:
+        for i, value in enumerate(values):
+            if value.__class__ is int:
+                values[i] = nodes[value] if value >= 0 else tokens[offset - 1 - value]
+            elif value.__class__ is list:
+                values[i] = [nodes[item] for item in value]
+        nodes.append(cls(*values))
+    return nodes[-1]
+
+fieldsByClass: Dict[type, tuple[str, ...]] = {}
+
+def nodeFields(cls: type) -> tuple[str, ...]:
+    names = fieldsByClass.get(cls)
+    if names is None:
+        names = fieldsByClass[cls] = tuple([field.name for field in fields(cls)])
+    return names
+
+# Set once in each worker process, before it parses anything. Forked workers get them for free, and
+# otherwise they're only sent once per worker, so a task is just the number of the function to parse
+workerSnapshot: ModuleSnapshot | None = None
+workerFunctions: List[CollectedFunction] = []
+
+def setSnapshot(snapshot: ModuleSnapshot, functions: List[CollectedFunction]):
+    global workerSnapshot, workerFunctions
+    workerSnapshot = snapshot
+    workerFunctions = functions
+
+def parseInWorker(index: int) -> List[tuple] | Core.CompileError:
+    function = workerFunctions[index]
+    result = parseBody(workerSnapshot, function)
+    if isinstance(result, Core.CompileError):
+        return result
+    return packTree(result, {id(token): i for i, token in enumerate(function.definition)})
+
+def parseWave(pool: ProcessPoolExecutor | None, workers: int, snapshot: ModuleSnapshot, module: StructureModule, functions: List[CollectedFunction], indices: List[int]) -> List[AST.Block | Core.CompileError]:
+    if pool is None or len(indices) <= 1:
+        return [parseBody(snapshot, functions[index], module) for index in indices]
+    results: List[AST.Block | Core.CompileError] = []
+    # A few chunks per worker keeps them all busy without paying for a round trip per function
+    chunksize = max(1, len(indices) // (workers * 4))
+    for index, result in zip(indices, pool.map(parseInWorker, indices, chunksize=chunksize)):
+        if not isinstance(result, Core.CompileError):
+            result = unpackTree(result, functions[index].definition)
+        results.append(result)
+    return results
+
+# Parses function bodies, across a process pool when there's more than one worker. Each function is its own
+# task, and the results come back in the order the functions were collected in, so the errors and bodies are
+# always the same however the work was split up.
+# Given entry points, only they are parsed to begin with. Each body is type checked as soon as it's parsed, and
+# the overloads its calls resolved to are parsed next, and so on a wave at a time. Anything no call ever resolves
+# to is left as just its signature, as is anything from an interface. A body that can't be typed is still parsed
+# fine, its errors stay in its table, and every overload of anything it calls is reached instead, so lazily or
+# not the same bodies parse the same way.
+# Given a PassManager, every body that parses is run through its analyses straight away, in this process. If one of
+# them is TypeInference, its table is the one bodies are typed with, and theirs is the one they're given
+def FunctionPass(module: StructureModule, workers: int = 1, entryPoints: List[str] | None = None, manager: PassManager | None = None) -> tuple[bool, List[ParsedFunction] | List[Core.CompileError]]:
+    functions = [func for funcs in module.functions.values() for func in funcs if not func.external]
+    snapshot = ModuleSnapshot.of(module)
+    moduleSymbols = module.getGlobalFrame()
+    results: Dict[int, AST.Block | Core.CompileError] = {}
+    tables: Dict[int, TypeTable] = {}
+    errors: List[Core.CompileError] = []
+    typesIndex = next((i for i, analysis in enumerate(manager.passes) if isinstance(analysis, TypeInference)), None) if manager is not None else None
+    shared = manager.passes[typesIndex].table if typesIndex is not None else None
+
+    pool = None
+    if workers > 1 and len(functions) > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=setSnapshot, initargs=(snapshot, functions))
+    try:
+        if entryPoints is None:
+            wave = list(range(len(functions)))
+        else:
+            positions: Dict[str, List[int]] = {}
+            for i, func in enumerate(functions):
+                positions.setdefault(func.name.string, []).append(i)
+            indexOf = {id(func): i for i, func in enumerate(functions)}
+            # Everything that's been put in a wave so far, so nothing is parsed twice
+            queued: Set[int] = set()
+            wave = []
+            for name in entryPoints:
+                if not name in positions:
+                    errors.append(Core.CompileError("Cannot start compiling from \"" + name + "\", there's no function called that", Core.SourceInfo("NULL", -1, -1)))
+                    continue
+                wave.extend([index for index in positions[name] if not index in queued])
+                queued.update(positions[name])
+
+        while len(wave) > 0:
+            waveResults = parseWave(pool, workers, snapshot, module, functions, wave)
+            results.update(zip(wave, waveResults))
+            if entryPoints is None:
+                for index, result in zip(wave, waveResults):
+                    if manager is not None and not isinstance(result, Core.CompileError):
+                        manager.run(result)
+                        if shared is not None:
+                            tables[index] = shared
+                break
+            reached: List[int] = []
+            for index, result in zip(wave, waveResults):
+                if isinstance(result, Core.CompileError):
+                    continue
+                if manager is not None:
+                    manager.run(result)
+                if shared is not None:
+                    table = tables[index] = shared
+                    typed = not typesIndex in manager.failed
+                else:
+                    table = tables[index] = TypeTable(moduleSymbols)
+                    typed = table.infer(result) is not Core.FAILED
+                for func in calledFunctions(result, module, table if typed else None):
+                    called = indexOf.get(id(func))
+                    if called is not None and not called in queued:
+                        queued.add(called)
+                        reached.append(called)
+            wave = reached
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    parsed: List[ParsedFunction] = []
+    for index in sorted(results.keys()):
+        result = results[index]
+        if isinstance(result, Core.CompileError):
+            errors.append(result)
+        else:
+            parsed.append(ParsedFunction(functions[index], result, moduleSymbols, tables.get(index)))
+
+    if len(errors) > 0:
+        return False, errors[:Core.MAX_ERRORS]
+    return True, parsed
@@ -0,0 +1,342 @@
+import os
+import gc
+import marshal
+import hashlib
+from dataclasses import dataclass, field
+from typing import List, Dict, Set
+import Core
+from Types import *
+from Scanner.Tokens import *
+from Scanner.TokenStore import TokenStore
+from Scanner.Source import SourceFile
+from Scanner.FastScanner import FastScanner, SCANNER_VERSION
+from Scanner.TokenCache import TokenCache
+from Parser.Types import FunctionSigniture, TypeDict
+from Parser.StructurePass import StructurePass, StructureModule, CollectedFunction
+
+# Bump whenever what goes into an interface, or how it's written, changes
+INTERFACE_VERSION = 1
+
+# What a file gives whoever includes it: the typedefs and function signatures it makes itself, and the files it
+# includes in turn. Nothing about function bodies, those are compiled with the file they're in
+@dataclass
+class ModuleInterface:
+    filename: str
+    # Covers this file's contents and, through their keys, everything it includes
+    key: str
+    includes: List[tuple[str, str]]
+    types: TypeDict
+    functions: List[CollectedFunction]
+
+@dataclass
+class InterfaceStats:
+    loaded: int = 0
+    rebuilt: int = 0
+    bytesWritten: int = 0
+
+    def report(self) -> str:
+        return "Interfaces: %d loaded, %d rebuilt, %d bytes written" % (self.loaded, self.rebuilt, self.bytesWritten)
+
+# Types are written once each, children before parents, with every child being the number of an earlier one.
+# Interned types are shared, so a type used all over an interface is still only written once
+class TypeEncoder:
+    def __init__(self):
+        self.records: List[tuple] = []
+        self.indices: Dict[SylphType, int] = {}
+
+    def encode(self, sylphType: SylphType) -> int:
+        index = self.indices.get(sylphType)
+        if index is not None:
+            return index
+        stack: List[tuple[SylphType, bool]] = [(sylphType, False)]
+        while stack:
+            current, childrenDone = stack.pop()
+            if current in self.indices:
+                continue
+            children = TypeEncoder.children(current)
+            if not childrenDone:
+                stack.append((current, True))
+                stack.extend([(child, False) for child in children if not child in self.indices])
+                continue
+            self.indices[current] = len(self.records)
+            self.records.append(self.record(current))
+        return self.indices[sylphType]
+
+    @staticmethod
+    def children(sylphType: SylphType) -> List[SylphType]:
+        match sylphType:
+            case PtrType(ptrOf):
+                return [ptrOf]
+            case FunctionPtr(argumentTypes, returnType):
+                return [*argumentTypes, returnType]
+            case SumType(options):
+                return list(options)
+        return []
+
+    def record(self, sylphType: SylphType) -> tuple:
+        indices = self.indices
+        match sylphType:
+            case IntType(unsigned, sizeBytes):
+                return (0, unsigned, sizeBytes)
+            case FloatType(double):
+                return (1, double)
+            case BoolType():
+                return (2,)
+            case StringType():
+                return (3,)
+            case NullType():
+                return (4,)
+            case PtrType(ptrOf, isArray, length):
+                return (5, indices[ptrOf], isArray, length)
+            case FunctionPtr(argumentTypes, returnType):
+                return (6, tuple([indices[argType] for argType in argumentTypes]), indices[returnType])
+            case SumType(options):
+                return (7, tuple([indices[option] for option in options]))
+        raise Core.RuntimeError("Cannot write type " + str(sylphType) + " to an interface", Core.SourceInfo("INTERNAL_ERROR", -1, -1))
+
+def decodeTypes(records: tuple) -> List[SylphType]:
+    types: List[SylphType] = []
+    for record in records:
+        match record:
+            case (0, unsigned, sizeBytes):
+                types.append(IntType(unsigned, sizeBytes))
+            case (1, double):
+                types.append(FloatType(double))
+            case (2,):
+                types.append(BoolType())
+            case (3,):
+                types.append(StringType())
+            case (4,):
+                types.append(NullType())
+            case (5, ptrOf, isArray, length):
+                types.append(PtrType(types[ptrOf], isArray, length))
+            case (6, argumentTypes, returnType):
+                types.append(FunctionPtr([types[argType] for argType in argumentTypes], types[returnType]))
+            case (7, options):
+                types.append(SumType([types[option] for option in options]))
+    return types
+
+def encodeToken(token: Token) -> tuple:
+    return (token.string, detailValue(token.detail), token.location.line_number, token.location.column_number)
+
+def decodeToken(filename: str, encoded: tuple) -> Token:
+    string, detail, line, column = encoded
+    return Token(TT.Identifier, IdentifierType(detail), Core.SourceInfo(filename, line, column), string)
+
+def detailValue(detail: TokenSubtype) -> int:
+    return detail.value if detail is not None else IdentifierType.StandardIdentifier.value
+
+# Interfaces are plain tuples of numbers and strings written with marshal, which is quick to read and
+# doesn't have to rebuild any objects beyond what's actually in the interface
+def encodeInterface(interface: ModuleInterface) -> bytes:
+    encoder = TypeEncoder()
+    types = tuple([(name, encoder.encode(sylphType)) for name, sylphType in interface.types.items()])
+    functions = tuple([(
+        encodeToken(func.name),
+        tuple([tag.value for tag in func.signiture.tags]),
+        tuple([encodeToken(argToken) for argToken in func.argTokens]),
+        tuple([encoder.encode(argType) for argType in func.signiture.argumentTypes]),
+        encoder.encode(func.signiture.returnType),
+    ) for func in interface.functions])
+    return marshal.dumps((INTERFACE_VERSION, interface.filename, interface.key, tuple(interface.includes), tuple(encoder.records), types, functions))
+
+def decodeInterface(data: bytes) -> ModuleInterface | None:
+    decoded = marshal.loads(data)
+    if decoded[0] != INTERFACE_VERSION:
+        return None
+    _, filename, key, includes, records, types, functions = decoded
+    decodedTypes = decodeTypes(records)
+    collected = [CollectedFunction(
+        FunctionSigniture([TagType(tag) for tag in tags], [decodedTypes[argType] for argType in argTypes], decodedTypes[returnType]),
+        decodeToken(filename, name),
+        [decodeToken(filename, argToken) for argToken in argTokens],
+        [],
+        external=True,
+    ) for name, tags, argTokens, argTypes, returnType in functions]
+    return ModuleInterface(filename, key, [tuple(include) for include in includes], {name: decodedTypes[index] for name, index in types}, collected)
+
+# One interface per source file, named after the file's path so a changed file replaces its old interface
+class InterfaceStore:
+    EXTENSION = ".interface"
+
+    def __init__(self, directory: str = TokenCache.DIRECTORY):
+        self.directory = directory
+        self.stats = InterfaceStats()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, filename: str) -> str:
+        name = hashlib.blake2b(os.path.abspath(filename).encode("utf-8"), digest_size=20).hexdigest()
+        return os.path.join(self.directory, name + InterfaceStore.EXTENSION)
+
+    def load(self, filename: str) -> ModuleInterface | None:
+        try:
+            with open(self.path(filename), "rb") as io:
+                return decodeInterface(io.read())
+        except Exception:
+            # Missing, from another version of python, or left half written by a run that was killed
+            return None
+
+    def save(self, interface: ModuleInterface):
+        data = encodeInterface(interface)
+        path = self.path(interface.filename)
+        partial = path + "." + str(os.getpid())
+        try:
+            with open(partial, "wb") as io:
+                io.write(data)
+            os.replace(partial, path)
+        except OSError:
+            return
+        self.stats.bytesWritten += len(data)
+
+# Compiles a file against the interfaces of what it includes rather than splicing their tokens in. An include
+# whose interface is still up to date, along with everything it includes, is never lexed or structured again.
+# Included definitions go in first, in the same order splicing would have put them, so includes are expected
+# at the top of a file like they normally are
+class InterfaceLoader:
+
+    def __init__(self, store: InterfaceStore, cache: TokenCache | None = None):
+        self.store = store
+        self.cache = cache
+        # Everything already worked out this run, by file name
+        self.interfaces: Dict[str, ModuleInterface] = {}
+        self.building: Set[str] = set()
+
+    # Lexes just this one file, noting down what it includes (once each, like splicing) without following them
+    def scanAlone(self, filename: str, compact: bool = False) -> tuple[bool, List[Token] | TokenStore | List[Core.CompileError], List[tuple[str, Core.SourceInfo]]]:
+        includes: List[tuple[str, Core.SourceInfo]] = []
+        fileOpener = self.cache.opener() if self.cache is not None else FastScanner.openFile
+
+        def opener(path: str, location: Core.SourceInfo, store: TokenStore | None):
+            if location.source_name == "NullFile":
+                return fileOpener(path, location, store)
+            if not os.path.exists(path):
+                raise Core.CompileError("Cannot find file '" + path + "'", location)
+            includes.append((path, location))
+            return iter([]), 0
+
+        store = TokenStore() if compact or self.cache is not None else None
+        tokens: List[Token] = []
+        errors: List[Core.CompileError] = []
+        # Like FastScanner.scan, the cyclic collector would only slow this down walking every token
+        gcWasEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            for batch in FastScanner.batches(filename, errors, store, opener):
+                tokens.extend(batch)
+        finally:
+            if gcWasEnabled:
+                gc.enable()
+        if len(errors) > 0:
+            return False, errors, includes
+        if store is None:
+            return True, tokens, includes
+        return True, store if compact else store.tokens(), includes
+
+    @staticmethod
+    def sourceKey(filename: str) -> str:
+        source = SourceFile.load(filename)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update((str(INTERFACE_VERSION) + "\0" + str(SCANNER_VERSION) + "\0" + filename + "\0").encode("utf-8"))
+        digest.update(source.buffer)
+        source.close()
+        return digest.hexdigest()
+
+    @staticmethod
+    def deepKey(sourceKey: str, includes: List[tuple[str, str]]) -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(sourceKey.encode("utf-8"))
+        for path, key in includes:
+            digest.update(("\0" + path + "\0" + key).encode("utf-8"))
+        return digest.hexdigest()
+
+    # The interface for a file, loaded if neither it nor anything it includes has changed since it was written.
+    # Something already being built further up is an include cycle, which splicing would have skipped too
+    def interfaceFor(self, filename: str) -> ModuleInterface | None:
+        found = self.interfaces.get(filename)
+        if found is not None or filename in self.building:
+            return found
+        self.building.add(filename)
+        try:
+            interface = self.store.load(filename)
+            if interface is not None and interface.filename == filename:
+                sourceKey = InterfaceLoader.sourceKey(filename)
+                includes = [(path, self.keyOf(path)) for path, _ in interface.includes]
+                if interface.includes == includes and interface.key == InterfaceLoader.deepKey(sourceKey, includes):
+                    self.store.stats.loaded += 1
+                    self.interfaces[filename] = interface
+                    return interface
+
+            success, result = self.build(filename)
+            if not success:
+                raise CompileErrors(result)
+            return self.interfaces[filename]
+        finally:
+            self.building.discard(filename)
+
+    def keyOf(self, filename: str) -> str:
+        interface = self.interfaceFor(filename)
+        return interface.key if interface is not None else ""
+
+    # Adds an interface's definitions to a module, after those of everything it includes that isn't already there
+    def merge(self, module: StructureModule, interface: ModuleInterface, merged: Set[str]):
+        if interface.filename in merged:
+            return
+        merged.add(interface.filename)
+        for path, _ in interface.includes:
+            included = self.interfaces.get(path)
+            if included is not None:
+                self.merge(module, included, merged)
+        module.types.update(interface.types)
+        for func in interface.functions:
+            module.functions.setdefault(func.name.string, []).append(func)
+
+    # A module holding everything a file includes, ready for the file's own definitions to go on top of.
+    # Anything included only has its signature
+    def includedModule(self, filename: str, includes: List[tuple[str, Core.SourceInfo]]) -> tuple[bool, StructureModule | List[Core.CompileError]]:
+        module = StructureModule()
+        merged: Set[str] = {filename}
+        try:
+            for path, _ in includes:
+                interface = self.interfaceFor(path)
+                if interface is not None:
+                    self.merge(module, interface, merged)
+        except CompileErrors as failed:
+            return False, failed.errors
+        return True, module
+
+    # Compiles a file as far as its interface and writes that out
+    def build(self, filename: str) -> tuple[bool, StructureModule | List[Core.CompileError]]:
+        success, tokens, includes = self.scanAlone(filename)
+        if not success:
+            return False, tokens
+        success, module = self.includedModule(filename, includes)
+        if success and len(tokens) > 0:
+            success, module = StructurePass(tokens, module)
+        if not success:
+            return False, module
+        self.writeInterface(filename, module, includes)
+        self.store.stats.rebuilt += 1
+        return True, module
+
+    # Only what the file defines itself goes in, what it includes has interfaces of its own
+    def writeInterface(self, filename: str, module: StructureModule, includes: List[tuple[str, Core.SourceInfo]]):
+        inherited = StructureModule()
+        merged: Set[str] = {filename}
+        for path, _ in includes:
+            interface = self.interfaces.get(path)
+            if interface is not None:
+                self.merge(inherited, interface, merged)
+        ownTypes = {name: sylphType for name, sylphType in module.types.items() if inherited.types.get(name) is not sylphType}
+        ownFunctions = [func for funcs in module.functions.values() for func in funcs if not func.external]
+        includeKeys = [(path, self.keyOf(path)) for path, _ in includes]
+        key = InterfaceLoader.deepKey(InterfaceLoader.sourceKey(filename), includeKeys)
+        external = [CollectedFunction(func.signiture, func.name, func.argTokens, [], external=True) for func in ownFunctions]
+        interface = ModuleInterface(filename, key, includeKeys, ownTypes, external)
+        self.interfaces[filename] = interface
+        self.store.save(interface)
+
+# Carries every error from compiling an include back up to whoever included it
+class CompileErrors(Exception):
+    def __init__(self, errors: List[Core.CompileError]):
+        self.errors = errors
+        super().__init__(str(errors[0]) if len(errors) > 0 else "")
@@ -0,0 +1,209 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Dict, Set
+import Core
+import Parser.AST as AST
+from Scanner.Tokens import *
+from Types import *
+from Parser.Types import SymbolTable
+from Parser.StructurePass import StructureModule
+from Parser.TypeParser import TypeTable, children, childFields
+
+Handler = Callable[[AST.Node], None | Core.Failed]
+
+# An analysis over function bodies. Handlers are keyed by node class, and one is called for each node of that class
+# (or of a subclass, the closest class wins) after every child of the node has been handled. A pass has no
+# handler for anything it doesn't care about, and never walks the tree itself. Errors go to the pass's diagnostics
+class AnalysisPass:
+    name = "analysis"
+
+    def __init__(self, diagnostics: Core.Diagnostics | None = None):
+        self.diagnostics = diagnostics if diagnostics is not None else Core.Diagnostics()
+        self.errors: List[Core.CompileError] = self.diagnostics.errors
+
+    def handlers(self) -> Dict[type, Handler]:
+        return {}
+
+@dataclass
+class PassStats:
+    name: str
+    # Only measured when the manager is timing, it means a clock read either side of every handler
+    seconds: float = 0.0
+    nodes: int = 0
+
+# Runs any number of passes together in a single walk of each tree. Each node's class is looked up once in a table
+# of every pass's handler for it. A pass whose handler hands back FAILED is dropped from the rest of the walk, since
+# what it would have worked out next would've needed what it just failed on
+class PassManager:
+
+    def __init__(self, passes: List[AnalysisPass], module: StructureModule | None = None, timed: bool = False):
+        self.passes = passes
+        self.module = module
+        self.timed = timed
+        self.handlerMaps = [analysis.handlers() for analysis in passes]
+        self.stats = [PassStats(analysis.name) for analysis in passes]
+        self.failed: Set[int] = set()
+        self.tables: Dict[type, List[tuple[int, Handler]]] = {}
+        self.walks = 0
+        self.walkSeconds = 0.0
+
+    def dispatch(self, cls: type) -> List[tuple[int, Handler]]:
+        table = self.tables.get(cls)
+        if table is None:
+            table = []
+            for index, handlers in enumerate(self.handlerMaps):
+                if index in self.failed:
+                    continue
+                for base in cls.__mro__:
+                    handler = handlers.get(base)
+                    if handler is not None:
+                        table.append((index, handler))
+                        break
+            self.tables[cls] = table
+        return table
+
+    def fail(self, index: int):
+        self.failed.add(index)
+        self.tables = {}
+
+    # Passes that failed are only dropped for the rest of the tree they failed on, each tree starts with all of them
+    def run(self, root: AST.Node):
+        if self.failed:
+            self.failed = set()
+            self.tables = {}
+        start = time.perf_counter()
+        self.walks += 1
+        stats = self.stats
+        module = self.module
+        timed = self.timed
+        stack: List[tuple[AST.Node, bool]] = [(root, False)]
+        while stack:
+            node, childrenDone = stack.pop()
+            if not childrenDone:
+                stack.append((node, True))
+                # Reversed, so children are handled in the order they're written, the same as a TypeTable types them
+                stack.extend([(child, False) for child in reversed(children(node, module))])
+                continue
+            for index, handler in self.dispatch(node.__class__):
+                handlerStart = time.perf_counter() if timed else 0.0
+                if handler(node) is Core.FAILED:
+                    self.fail(index)
+                if timed:
+                    stats[index].seconds += time.perf_counter() - handlerStart
+                stats[index].nodes += 1
+        self.walkSeconds += time.perf_counter() - start
+
+    def errors(self) -> List[Core.CompileError]:
+        return [error for analysis in self.passes for error in analysis.errors]
+
+    def report(self) -> str:
+        lines = ["%d walks in %.3f ms" % (self.walks, self.walkSeconds * 1e3)]
+        for analysis, passStats in zip(self.passes, self.stats):
+            timing = "%10.3f ms" % (passStats.seconds * 1e3) if self.timed else "%13s" % "-"
+            lines.append("\t%-12s %s %8d nodes %4d errors" % (passStats.name, timing, passStats.nodes, len(analysis.errors)))
+        return "\n".join(lines)
+
+# Fills a TypeTable using the same rules it types nodes with on its own
+class TypeInference(AnalysisPass):
+    name = "types"
+
+    def __init__(self, symbols: SymbolTable | None = None, table: TypeTable | None = None):
+        self.table = table if table is not None else TypeTable(symbols)
+        super().__init__(self.table.diagnostics)
+
+    def handlers(self) -> Dict[type, Handler]:
+        table = self.table
+        types = table.types
+        def handlerFor(rule) -> Handler:
+            def handler(node: AST.Node) -> None | Core.Failed:
+                computed = rule(table, node)
+                if computed is Core.FAILED:
+                    return Core.FAILED
+                types[id(node)] = computed
+            return handler
+        return {cls: handlerFor(rule) for cls, rule in TypeTable.rules.items()}
+
+# Nodes whose value is known without running anything: literals, and anything made only out of them that can't have
+# side effects. Calls and variables never are
+class ConstantDetection(AnalysisPass):
+    name = "constants"
+
+    def __init__(self, module: StructureModule | None = None):
+        super().__init__()
+        self.module = module
+        self.constant: Set[int] = set()
+
+    def isConstant(self, node: AST.Node) -> bool:
+        return id(node) in self.constant
+
+    def handlers(self) -> Dict[type, Handler]:
+        constant = self.constant
+        module = self.module
+        def always(node: AST.Node):
+            constant.add(id(node))
+        def ifChildrenAre(node: AST.Node):
+            if all([id(child) in constant for child in children(node, module)]):
+                constant.add(id(node))
+        return {
+            AST.EmptyNode: always, AST.Literal: always,
+            AST.Block: ifChildrenAre, AST.If: ifChildrenAre, AST.BinaryOp: ifChildrenAre, AST.Is: ifChildrenAre, AST.As: ifChildrenAre,
+        }
+
+# Only something with a place in memory can be assigned to or have a reference taken to it
+class LValueCheck(AnalysisPass):
+    name = "lvalues"
+
+    def handlers(self) -> Dict[type, Handler]:
+        diagnostics = self.diagnostics
+        def assign(node: AST.Assign):
+            if not AST.NodeTrait.LValue in node.left.traits:
+                diagnostics.error("Cannot assign to this expression", locationOf(node.left))
+        def reference(node: AST.Reference):
+            if not AST.NodeTrait.LValue in node.of.traits:
+                diagnostics.error("Cannot take a reference to this expression", locationOf(node.of))
+        return {AST.Assign: assign, AST.Reference: reference}
+
+# Array types something takes a reference to an element of (ref a[i]). Their elements have to stay whole for that,
+# rather than having their tags kept apart from them. Reads the types from a TypeInference that runs before it
+class ElementReferences(AnalysisPass):
+    name = "elements"
+
+    def __init__(self, table: TypeTable):
+        super().__init__()
+        self.table = table
+        self.arrays: Set[SylphType] = set()
+
+    def handlers(self) -> Dict[type, Handler]:
+        types = self.table.types
+        arrays = self.arrays
+        def reference(node: AST.Reference):
+            if isinstance(node.of, AST.Index):
+                indexed = types.get(id(node.of.of))
+                if isinstance(indexed, PtrType) and indexed.isArray:
+                    arrays.add(indexed)
+        return {AST.Reference: reference}
+
+# Where the first token under a node is, for pointing errors at nodes
+def locationOf(node: AST.Node) -> Core.SourceInfo:
+    stack: List[AST.Node] = [node]
+    while stack:
+        current = stack.pop()
+        values = [getattr(current, name) for name in childFields(current.__class__)]
+        for value in values:
+            if isinstance(value, Token):
+                return value.location
+        for value in reversed(values):
+            if isinstance(value, AST.Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(reversed([item for item in value if isinstance(item, AST.Node)]))
+    return Core.SourceInfo("NULL", -1, -1)
+
+# What every compile runs over the bodies it parses
+def compilePasses(module: StructureModule, timed: bool = False) -> PassManager:
+    types = TypeInference(module.getGlobalFrame())
+    return PassManager([types, ConstantDetection(module), LValueCheck(), ElementReferences(types.table)], module, timed)
+
+# The array types whose elements have to be kept whole, as far as a manager's ElementReferences saw
+def wholeArrays(manager: PassManager) -> Set[SylphType]:
+    return {arrayType for analysis in manager.passes if isinstance(analysis, ElementReferences) for arrayType in analysis.arrays}
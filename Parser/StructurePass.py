@@ -3,7 +3,9 @@ from enum import Enum
 from Types import *
 from typing import Dict, List
 import Core
-from Parser.TokenList import TokenList
+from Parser.TokenList import TokenList, TokenRange, tokenListFor, bracketMessage
+from Scanner.TokenStore import TokenStore
+from collections.abc import Iterable
 from Parser.Types import *
 
 @dataclass
@@ -13,8 +15,12 @@ class CollectedFunction:
     name: Token
 
     # TODO: Having only one arg token and one def list means no pattern matching
+    # The arguments are split up by their types, so they stay a list, but there's only ever a few of them
     argTokens: List[Token]
-    definition: List[Token]
+    definition: TokenRange | List[Token]
+
+    # Only the signature of this one is known, its body is compiled along with the file it came from
+    external: bool = False
 
 class StructureModule:
 
@@ -36,11 +42,18 @@ class StructureModule:
     def verify(self) -> tuple[bool, list[Core.CompileError]]:
         errors: list[Core.CompileError] = []
         for funcs in self.functions.values():
-            for i in range(len(funcs)):
-                for j in range(i + 1, len(funcs)):
-                    print("Checking\n\t",funcs[i].name,"\n\t", funcs[j].name)
-                    if not funcs[i].signiture.hasDifferentArgumentTypes(funcs[j].signiture):
-                        errors.append(Core.CompileError("Functions cannot be differentiated by return type (" + funcs[i].name.string + ") against " + str(funcs[j].name.location), funcs[i].name.location))
+            # Most names only have the one function, which has nothing to clash with
+            if len(funcs) == 1:
+                continue
+            # The first overload seen with each argument key, anything after it with the same key clashes with it
+            seen: Dict[tuple, CollectedFunction] = {}
+            for func in funcs:
+                key = func.signiture.argumentKey()
+                first = seen.get(key)
+                if first is None:
+                    seen[key] = func
+                else:
+                    errors.append(Core.CompileError("Functions cannot be differentiated by return type (" + first.name.string + ") against " + str(func.name.location), first.name.location))
         return len(errors) == 0, errors
 
     def isFunctionWithArity(self, name: str, arity: int) -> bool:
@@ -48,10 +61,8 @@ class StructureModule:
             return True in [len(func.signiture.argumentTypes) == arity for func in self.functions[name]]
         return False
 
-    def getGlobalFrame(self) -> SymbolFrame:
-        frame = SymbolFrame(None)
-        frame.module = self
-        return frame
+    def getGlobalFrame(self) -> SymbolTable:
+        return SymbolTable(self)
 
     @staticmethod
     # TODO: Support half width floating points? Fixed point? (For snes lmao)
@@ -63,117 +74,131 @@ class StructureModule:
             "bool": BoolType(), "string": StringType(), "Null": NullType(), 
         }
 
-@Core.orError
-def parseTypedef(types: TypeDict, tList: TokenList):
-    tList.expect(Keywords.Using)
+# Each of these reports its first error to the diagnostics and gives back FAILED, or None once it's parsed
+def parseTypedef(types: TypeDict, tList: TokenList, diagnostics: Core.Diagnostics) -> None | Core.Failed:
+    FAILED = Core.FAILED
+    if tList.want(Keywords.Using, diagnostics) is FAILED:
+        return FAILED
     newTypeName = tList.get()
-    tList.expect("=")
-    parsedTypeOrError = parseType(types, tList)
-    if isinstance(parsedTypeOrError, Core.CompileError):
-        raise parsedTypeOrError
-    types[newTypeName.string] = parsedTypeOrError
+    if tList.want("=", diagnostics) is FAILED:
+        return FAILED
+    parsedType = readType(types, tList, diagnostics)
+    if parsedType is FAILED:
+        return FAILED
+    types[newTypeName.string] = parsedType
     return None
 
 # TODO: No forward declaration (not that you need it)
-@Core.orError
-def parseFunc(module: StructureModule, tList: TokenList, tags: List[Token] = []):
-    tList.expect(Keywords.Func)
-    nameToken = tList.expect(TT.Identifier)
-    tList.expect(TT.OpenBracket)
+def parseFunc(module: StructureModule, tList: TokenList, diagnostics: Core.Diagnostics, tags: List[Token] = []) -> None | Core.Failed:
+    FAILED = Core.FAILED
+    if tList.require(Keywords.Func, diagnostics) is FAILED:
+        return FAILED
+    nameToken = tList.want(TT.Identifier, diagnostics)
+    if nameToken is FAILED or tList.require(TT.OpenBracket, diagnostics) is FAILED:
+        return FAILED
 
     argTokens: List[Token] = []
     argTypes: List[SylphType] = []
 
     while tList.peekType() != TT.CloseBracket:
-        if len(argTokens) > 0:
-            tList.expect(TT.Comma)
-        argTokens.append(tList.expect(TT.Identifier))
-        tList.expect(TT.Colon)
-        argType = parseType(module.types, tList)
-        if isinstance(argType, Core.CompileError):
-            raise argType
+        if len(argTokens) > 0 and tList.require(TT.Comma, diagnostics) is FAILED:
+            return FAILED
+        argToken = tList.want(TT.Identifier, diagnostics)
+        if argToken is FAILED or tList.require(TT.Colon, diagnostics) is FAILED:
+            return FAILED
+        argTokens.append(argToken)
+        argType = readType(module.types, tList, diagnostics)
+        if argType is FAILED:
+            return FAILED
         argTypes.append(argType)
-    tList.expect(TT.CloseBracket)
+    if tList.require(TT.CloseBracket, diagnostics) is FAILED:
+        return FAILED
 
     returnType = NullType()
 
-    if True in tList.match("->"):
-        rtOrError = parseType(module.types, tList)
-        if isinstance(rtOrError, Core.CompileError):
-            raise rtOrError
-        returnType = rtOrError
+    if tList.matchBool("->"):
+        tList.skip()
+        returnType = readType(module.types, tList, diagnostics)
+        if returnType is FAILED:
+            return FAILED
     
-    contentsTokens: List[Token] = []
-    # Get the contents of the function
+    # Get the contents of the function, as a range of the tokens rather than a copy
     if tList.peekStr() == "=":
-        tList.get()
-        lineLoc = tList.peek().location.line_number
-        while tList.peek().location.line_number == lineLoc:
-            contentsTokens.append(tList.get())
+        tList.skip()
+        start = tList.mark()
+        tList.skipLine()
+        contents = tList.since(start)
     else:
-        # TODO: This could be split up into a block grabbing thing
-        startingCurly = tList.expect(TT.OpenCurly)
-        depth = 1
-        while depth > 0:
-            token = tList.get()
-            if token.location.source_name != startingCurly.location.source_name:
-                raise Core.CompileError("Unexpected EOF while parsing definition for function \"" + nameToken.string + "\"", startingCurly.location)
-            if token.ttype == TT.OpenCurly:
-                depth += 1
-            elif token.ttype == TT.CloseCurly:
-                depth -= 1
-            
-            if depth > 0:
-                contentsTokens.append(token)
+        if tList.require(TT.OpenCurly, diagnostics) is FAILED:
+            return FAILED
+        start = tList.mark()
+        if tList.closeGroup(diagnostics) is FAILED:
+            return FAILED
+        # Leaving off the closing curly
+        contents = tList.since(start, 1)
     
-    collectedFunc = CollectedFunction(FunctionSigniture(tags, argTypes, returnType), nameToken, argTokens, contentsTokens)
+    collectedFunc = CollectedFunction(FunctionSigniture(tags, argTypes, returnType), nameToken, argTokens, contents)
     if not nameToken.string in module.functions:
         module.functions[nameToken.string] = [collectedFunc]
     else:
         module.functions[nameToken.string].append(collectedFunc)
     return None
 
-@Core.orError
-def parseTaggedFunc(module: StructureModule, tList: TokenList):
+def parseTaggedFunc(module: StructureModule, tList: TokenList, diagnostics: Core.Diagnostics) -> None | Core.Failed:
     tags: List[TagType] = []
     while tList.peekType() == TT.Tag:
         tags.append(tList.get().detail)
     match tList.peekTypeSubtype():
         case [TT.Keyword, Keywords.Func]:
-            if x := parseFunc(module, tList, tags):
-                raise x
+            return parseFunc(module, tList, diagnostics, tags)
         case _:
-            raise Core.CompileError("")
+            return diagnostics.error("Expected a function after tags, found \"" + tList.peekStr() + "\"", tList.peek().location)
+
 
+# Skips what's left of a declaration that didn't parse, up to wherever the next one starts. Anything in brackets is
+# jumped over whole, so a body is never mistaken for more declarations
+def skipDeclaration(tList: TokenList):
+    while tList.hasTokens():
+        match tList.peekTypeSubtype():
+            case [TT.Keyword, Keywords.Using | Keywords.Func] | [TT.Tag, _]:
+                return
+            case [TT.OpenBracket | TT.OpenBrace | TT.OpenCurly, _]:
+                tList.skipGroup()
+            case _:
+                tList.get()
 
-def StructurePass(tokens: List[Token]) -> tuple[bool, StructureModule | List[Core.CompileError]]:
+# Takes every token up front (as a list or a TokenStore), or an iterable like Scanner.stream to pull tokens from as it goes.
+# Given a module, definitions are added to that, so a file can be structured on top of what it includes
+def StructurePass(tokens: List[Token] | TokenStore | Iterable[Token], module: StructureModule | None = None) -> tuple[bool, StructureModule | List[Core.CompileError]]:
 
-    tList = TokenList(tokens)
-    module = StructureModule()
-    errors: List[Core.CompileError] = []
-    si = tList.peek().location
+    tList = tokenListFor(tokens)
+    if module is None:
+        module = StructureModule()
+    diagnostics = Core.Diagnostics()
+    # The only brackets reported here are the ones declarations run into, a body that's never closed or a stray one at
+    # the top level. What's inside a body is left to the function pass, which is what actually parses it
 
     # Error Contingency
-    def EC(value: None | Core.CompileError):
-        if value is not None:
-            errors.append(value)
-            tList.panic(si.line_number)
+    def EC(value: None | Core.Failed):
+        if value is Core.FAILED:
+            skipDeclaration(tList)
 
-    while tList.hasTokens() and len(errors) < Core.MAX_ERRORS:
-        si = tList.peek().location
+    while tList.hasTokens() and not diagnostics.full():
         match tList.peekTypeSubtype():
             case [TT.Keyword, Keywords.Using]:
-                EC(parseTypedef(module.types, tList))
+                EC(parseTypedef(module.types, tList, diagnostics))
             case [TT.Keyword, Keywords.Func]:
-                EC(parseFunc(module, tList))
+                EC(parseFunc(module, tList, diagnostics))
             case [TT.Tag, _]:
-                EC(parseTaggedFunc(module, tList))
+                EC(parseTaggedFunc(module, tList, diagnostics))
             case _:
-                errors.append(Core.CompileError("Unexpected token found at top level \"" + str(tList.peek().string) +"\"", tList.peek().location))
-                tList.panic()
+                if tList.peekUnmatched():
+                    diagnostics.error(bracketMessage(tList.peek()), tList.peek().location)
+                else:
+                    diagnostics.error("Unexpected token found at top level \"" + str(tList.peek().string) +"\"", tList.peek().location)
+                tList.get()
+                skipDeclaration(tList)
     
-    if len(errors) > 0:
-        return False, errors
+    if len(diagnostics) > 0:
+        return False, diagnostics.errors
     return True, module
-
-
@@ -1,16 +1,63 @@
-from typing import List
+from typing import List, Iterable, Iterator
+from bisect import bisect_right
+from collections import deque
+from itertools import islice
 from Scanner.Tokens import *
+from Scanner.TokenStore import TokenStore
+from Scanner.Brackets import BracketIndex, BracketTracker, BracketCodes, BracketFlagsById
+from collections.abc import Sequence
 
-class TokenList:
-    def __init__(self, tokens: List[Token]):
+# Tokens [start, end) of a list or TokenStore, without copying them out. Everything holding one shares the tokens
+# under it, so a module's function bodies are a few ints each on top of the tokens the module was scanned into
+class TokenRange(Sequence):
+    __slots__ = ("tokens", "start", "end")
+
+    def __init__(self, tokens: List[Token] | TokenStore, start: int, end: int):
         self.tokens = tokens
-        self.currentIndex = 0
+        self.start = start
+        self.end = max(start, end)
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __getitem__(self, index: int | slice) -> Token | List[Token]:
+        if isinstance(index, slice):
+            return [self.tokens[self.start + i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("Token range index out of range")
+        return self.tokens[self.start + index]
+
+    def __iter__(self) -> Iterator[Token]:
+        return map(self.tokens.__getitem__, range(self.start, self.end))
+
+    # Compares and prints like the list of tokens it used to be
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Sequence) and len(self) == len(other) and all([a == b for a, b in zip(self, other)])
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class TokenList:
+    # Over a range the tokens under it are read directly, so indexing doesn't go through the range each time
+    def __init__(self, tokens: List[Token] | TokenRange):
+        if isinstance(tokens, TokenRange):
+            self.tokens = tokens.tokens
+            self.currentIndex = tokens.start
+            self.end = tokens.end
+        else:
+            self.tokens = tokens
+            self.currentIndex = 0
+            self.end = len(tokens)
+        self.bracketIndex: BracketIndex | None = None
     
     def hasTokens(self) -> bool:
-        return self.currentIndex < len(self.tokens)
+        return self.currentIndex < self.end
 
     def peek(self, extraAhead: int = 0) -> Token:
-        if self.currentIndex + extraAhead >= len(self.tokens):
+        if self.currentIndex + extraAhead >= self.end:
             return Token(TT.Error, None, Core.SourceInfo("NULL", -1, -1), "")
         return self.tokens[self.currentIndex + extraAhead]
     
@@ -28,44 +75,78 @@ class TokenList:
         val = self.peek()
         self.currentIndex += 1
         return val
+
+    # get, for when the token itself isn't wanted
+    def skip(self):
+        self.get()
     
     def putBack(self, amount: int = 1):
         self.currentIndex -= amount
 
-    # Panic down to the next line hoping that the errors stop
-    def panic(self, startingLineNum: int | None = None):
+    # Gets every token on the same line as the next one
+    def skipLine(self):
+        line = self.peek().location.line_number
+        while self.hasTokens() and self.peek().location.line_number == line:
+            self.get()
+
+    # Where the list is up to, to take a range of the tokens from later on
+    def mark(self) -> int:
+        return self.currentIndex
+
+    # The tokens got since the mark, leaving off however many were got last
+    def since(self, start: int, leaveOff: int = 0) -> TokenRange:
+        return TokenRange(self.tokens, start, self.currentIndex - leaveOff)
+
+    # Made the first time anything needs to know where a bracket is closed
+    def brackets(self) -> BracketIndex:
+        if self.bracketIndex is None:
+            self.bracketIndex = BracketIndex.ofTokens(self.tokens)
+        return self.bracketIndex
+
+    # Peeking at an opening bracket, skips past whatever closes it. Anything else, or a bracket that's never
+    # closed, is skipped on its own
+    def skipGroup(self):
+        closing = self.brackets().partner(self.currentIndex) if self.currentIndex < self.end else -1
+        self.currentIndex = closing + 1 if closing > self.currentIndex else self.currentIndex + 1
 
-        newLoc = self.peek().location.line_number
-        # if for whatever reason we don't have the line number, we can estimate one
-        if startingLineNum is None:
-            startingLineNum = newLoc
+    # Having just got an opening bracket, moves to just past the one closing it. Whatever is inside isn't looked at
+    def closeGroup(self, diagnostics: Core.Diagnostics) -> None | Core.Failed:
+        opening = self.currentIndex - 1
+        closing = self.brackets().partner(opening)
+        if closing < opening:
+            return diagnostics.error(bracketMessage(self.tokens[opening]), self.tokens[opening].location)
+        self.currentIndex = closing + 1
+        return None
 
-        while startingLineNum == newLoc and self.hasTokens():
-            newLoc = self.get().location.line_number
+    def peekUnmatched(self, extraAhead: int = 0) -> bool:
+        index = self.currentIndex + extraAhead
+        if index >= self.end or self.peekType(extraAhead) not in BracketCodes:
+            return False
+        return self.brackets().partner(index) < 0
     
     def match(self, value: TT | List[TT] | Keywords | str) -> tuple[bool, Token | None]:
         match value:
-            case TT() if self.peek().ttype == value:
+            case TT() if self.peekType() == value:
                 return True, self.get()
             case [TT(), *_] if self.peekType() in value:
                 return True, self.get()
-            case Keywords() if isinstance(self.peek().detail, Keywords):
-                if self.peek().detail == value:
+            case Keywords() if isinstance(self.peekTypeSubtype()[1], Keywords):
+                if self.peekTypeSubtype()[1] == value:
                     return True, self.get()
-            case str() if self.peek().string == value:
+            case str() if self.peekStr() == value:
                 return True, self.get()
         return False, None
     
     def matchBool(self, value: TT | List[TT] | Keywords | str) -> bool:
         match value:
-            case TT() if self.peek().ttype == value:
+            case TT() if self.peekType() == value:
                 return True
             case [TT(), *_] if self.peekType() in value:
                 return True
-            case Keywords() if isinstance(self.peek().detail, Keywords):
-                if self.peek().detail == value:
+            case Keywords() if isinstance(self.peekTypeSubtype()[1], Keywords):
+                if self.peekTypeSubtype()[1] == value:
                     return True
-            case str() if self.peek().string == value:
+            case str() if self.peekStr() == value:
                 return True
         return False
     
@@ -73,16 +154,247 @@ class TokenList:
         matched, tokens = self.match(value)
         if matched:
             return tokens
-        else:
-            message = "Undefined"
-            match value:
-                case TT():
-                    message = "Expected " + str(value) + " found " + self.peek().string
-                case [TT(), *_]:
-                    message = "Expected one of [" + ",".join([str(i) for i in value]) + "], found " + self.peek().string
-                case Keywords():
-                    message = "Expected " + str(value) + " found " + self.peek().string
-                case str():
-                    message = "Expected " + value + ", found " + self.peek().string
-            
-            raise Core.CompileError(message, self.peek().location)
+        raise Core.CompileError(self.expectedMessage(value), self.peek().location)
+
+    # expect, but reporting to the diagnostics and handing back FAILED rather than raising
+    def want(self, value: TT | List[TT] | Keywords | str, diagnostics: Core.Diagnostics) -> Token | Core.Failed:
+        matched, tokens = self.match(value)
+        if matched:
+            return tokens
+        return diagnostics.error(self.expectedMessage(value), self.peek().location)
+
+    # want, for when only whether it was there matters
+    def require(self, value: TT | List[TT] | Keywords | str, diagnostics: Core.Diagnostics) -> None | Core.Failed:
+        if self.matchBool(value):
+            self.skip()
+            return None
+        return diagnostics.error(self.expectedMessage(value), self.peek().location)
+
+    def expectedMessage(self, value: TT | List[TT] | Keywords | str) -> str:
+        message = "Undefined"
+        match value:
+            case TT():
+                message = "Expected " + str(value) + " found " + self.peek().string
+            case [TT(), *_]:
+                message = "Expected one of [" + ",".join([str(i) for i in value]) + "], found " + self.peek().string
+            case Keywords():
+                message = "Expected " + str(value) + " found " + self.peek().string
+            case str():
+                message = "Expected " + value + ", found " + self.peek().string
+        return message
+
+
+# Over a TokenStore, peeking at a type or string doesn't need a whole Token view made
+class StoreTokenList(TokenList):
+    def __init__(self, tokens: TokenStore | TokenRange):
+        super().__init__(tokens)
+
+    def peekType(self, extraAhead: int = 0) -> TT:
+        index = self.currentIndex + extraAhead
+        if index >= self.end:
+            return TT.Error
+        return self.tokens.ttypeAt(index)
+
+    def peekTypeSubtype(self, extraAhead: int = 0) -> tuple[TT, TokenSubtype]:
+        index = self.currentIndex + extraAhead
+        if index >= self.end:
+            return TT.Error, None
+        return self.tokens.ttypeAt(index), self.tokens.detailAt(index)
+
+    def peekStr(self, extraAhead: int = 0) -> str:
+        index = self.currentIndex + extraAhead
+        if index >= self.end:
+            return ""
+        return self.tokens.stringAt(index)
+
+    def skip(self):
+        self.currentIndex += 1
+
+    # The store keeps its own, so it's only made once however many lists read it
+    def brackets(self) -> BracketIndex:
+        return self.tokens.brackets()
+
+    # Tokens from the same file are on the line while they start before the next one does, so no locations are
+    # made for them. Anything from another file, like an end of file token, is still compared by its line number
+    def skipLine(self):
+        if not self.hasTokens():
+            return
+        store = self.tokens
+        starts = store.starts
+        fileIds = store.fileIds
+        index = self.currentIndex
+        fileId = fileIds[index]
+        source = store.sources[fileId]
+        lineStarts = source.getLineStarts()
+        line = bisect_right(lineStarts, starts[index]) - 1
+        lineEnd = lineStarts[line + 1] if line + 1 < len(lineStarts) else len(source) + 1
+        while index < self.end and (starts[index] < lineEnd if fileIds[index] == fileId else store.locationAt(index).line_number == line):
+            index += 1
+        self.currentIndex = index
+
+
+# Same interface as TokenList, but pulls tokens out of an iterator as they're needed. Only the lookahead
+# being peeked at and a short history for putBack are kept, so a streaming scanner can run alongside the parser.
+# Finding where a group closes reads the group into the lookahead first
+class StreamTokenList(TokenList):
+    # How many consumed tokens can be put back
+    HISTORY = 32
+
+    def __init__(self, tokens: Iterable[Token]):
+        self.source = iter(tokens)
+        self.ahead: deque[Token] = deque()
+        self.behind: deque[Token] = deque(maxlen=StreamTokenList.HISTORY)
+        self.currentIndex = 0
+        # Tokens actually consumed, currentIndex can run past the end like it does in TokenList
+        self.consumed = 0
+        # Nothing is kept around to take a range of, so from a mark every token got is copied in here
+        self.recording: List[Token] | None = None
+        self.recordingStart = 0
+        # What's open among every token got so far, counting each only once however often it's put back
+        self.tracker = BracketTracker()
+        self.tracked = 0
+
+    def fill(self, count: int) -> bool:
+        while len(self.ahead) < count:
+            token = next(self.source, None)
+            if token is None:
+                return False
+            self.ahead.append(token)
+        return True
+
+    def hasTokens(self) -> bool:
+        return len(self.ahead) > 0 or self.fill(1)
+
+    def peek(self, extraAhead: int = 0) -> Token:
+        if extraAhead >= len(self.ahead) and not self.fill(extraAhead + 1):
+            return Token(TT.Error, None, Core.SourceInfo("NULL", -1, -1), "")
+        return self.ahead[extraAhead]
+
+    def get(self) -> Token:
+        val = self.peek()
+        if len(self.ahead) > 0:
+            self.behind.append(self.ahead.popleft())
+            self.consumed += 1
+            # Most tokens are neither a bracket nor from another file, and don't need the tracker at all
+            if self.consumed > self.tracked:
+                self.tracked = self.consumed
+                if id(val.ttype) in BracketFlagsById or val.location.source_name is not self.tracker.source:
+                    self.tracker.add(val)
+        # Getting a token again after putting it back doesn't record it twice
+        if self.recording is not None and self.currentIndex - self.recordingStart == len(self.recording):
+            self.recording.append(val)
+        self.currentIndex += 1
+        return val
+
+    def putBack(self, amount: int = 1):
+        for _ in range(amount):
+            if self.currentIndex > self.consumed:
+                self.currentIndex -= 1
+                continue
+            if len(self.behind) == 0:
+                raise Core.RuntimeError("Cannot put back more than " + str(StreamTokenList.HISTORY) + " tokens while streaming", self.peek().location)
+            self.ahead.appendleft(self.behind.pop())
+            self.consumed -= 1
+            self.currentIndex -= 1
+
+    # Nothing past the lookahead is known, so there's no index. Brackets are paired the same way it pairs them, by
+    # carrying on from what's open so far through as much lookahead as it takes to see where a group is closed
+    def brackets(self) -> BracketIndex:
+        raise Core.RuntimeError("Cannot index brackets while streaming", self.peek().location)
+
+    # The lookahead from the offset on, pulling more tokens into it as they're needed. Indexing into the middle of
+    # a deque isn't constant time, iterating over it is
+    def readAhead(self, offset: int) -> Iterator[Token]:
+        yield from islice(self.ahead, offset, None)
+        for token in self.source:
+            self.ahead.append(token)
+            yield token
+
+    # Where in the lookahead the bracket on top of the tracker is closed, or -1 if it never is. The tracker is left
+    # as it would be having got everything up to there
+    def closingAhead(self, tracker: BracketTracker, offset: int) -> int:
+        depth = len(tracker.kinds)
+        source = tracker.source
+        for token in self.readAhead(offset):
+            if token.location.source_name != source:
+                return -1
+            if id(token.ttype) in BracketFlagsById:
+                tracker.add(token)
+                # Popping stops at the first opener of the closer's kind, so stopping just below it means it was that one
+                if len(tracker.kinds) < depth:
+                    return offset if len(tracker.kinds) == depth - 1 else -1
+            offset += 1
+        return -1
+
+    # Gets the next however many tokens at once, once closingAhead has found them and run the tracker over them
+    def getAhead(self, count: int, tracker: BracketTracker):
+        taken = [self.ahead.popleft() for _ in range(count)]
+        self.behind.extend(taken)
+        if self.recording is not None:
+            alreadyRecorded = len(self.recording) - (self.currentIndex - self.recordingStart)
+            self.recording.extend(taken[alreadyRecorded:])
+        self.consumed += count
+        self.currentIndex += count
+        if self.consumed > self.tracked:
+            self.tracker = tracker
+            self.tracked = self.consumed
+
+    def skipGroup(self):
+        token = self.peek()
+        if BracketCodes.get(token.ttype, 1) & 1 == 0:
+            tracker = self.tracker.copy()
+            tracker.add(token)
+            closing = self.closingAhead(tracker, 1)
+            if closing > 0:
+                self.getAhead(closing + 1, tracker)
+                return
+        self.get()
+
+    def closeGroup(self, diagnostics: Core.Diagnostics) -> None | Core.Failed:
+        opening = self.behind[-1]
+        tracker = self.tracker.copy()
+        closing = self.closingAhead(tracker, 0)
+        if closing < 0:
+            return diagnostics.error(bracketMessage(opening), opening.location)
+        self.getAhead(closing + 1, tracker)
+        return None
+
+    def peekUnmatched(self, extraAhead: int = 0) -> bool:
+        token = self.peek(extraAhead)
+        code = BracketCodes.get(token.ttype)
+        if code is None:
+            return False
+        tracker = self.tracker.copy()
+        for offset in range(extraAhead):
+            tracker.add(self.ahead[offset])
+        if code & 1 == 1:
+            return token.location.source_name != tracker.source or tracker.opened[code >> 1] == 0
+        tracker.add(token)
+        return self.closingAhead(tracker, extraAhead + 1) < 0
+
+    def mark(self) -> int:
+        self.recording = []
+        self.recordingStart = self.currentIndex
+        return self.currentIndex
+
+    def since(self, start: int, leaveOff: int = 0) -> TokenRange:
+        recorded = self.recording if self.recording is not None else []
+        self.recording = None
+        return TokenRange(recorded, start - self.recordingStart, self.currentIndex - leaveOff - self.recordingStart)
+
+
+def bracketMessage(token: Token) -> str:
+    if BracketCodes[token.ttype] & 1 == 0:
+        return "Unclosed \"" + token.string + "\""
+    return "Unexpected \"" + token.string + "\" with nothing open to close"
+
+
+# Picks the token list that suits however the tokens were handed over
+def tokenListFor(tokens: List[Token] | TokenStore | TokenRange | Iterable[Token]) -> TokenList:
+    if isinstance(tokens, TokenRange):
+        return StoreTokenList(tokens) if isinstance(tokens.tokens, TokenStore) else TokenList(tokens)
+    if isinstance(tokens, TokenStore):
+        return StoreTokenList(tokens)
+    if isinstance(tokens, Sequence):
+        return TokenList(tokens)
+    return StreamTokenList(tokens)
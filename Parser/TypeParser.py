@@ -1,81 +1,287 @@
+import Core
 import Parser.AST as AST
+from dataclasses import fields
+from typing import Callable
 from Types import *
 from Scanner.Tokens import *
+from Parser.StructurePass import CollectedFunction, StructureModule
+from Parser.Types import Symbol, SymbolTable
 
-# TODO: DO!!!
-def getTypeOfBinaryOp(node: AST.BinaryOp) -> SylphType:
-    raise Exception()
-    return NullType()
-
-def getTypeOfNode(node: AST.Node) -> SylphType:
-    match node:
-        case AST.Literal:
-            # We assume the largest possible kind, and AST sweeps can fix it in post lmao
-            return {
-                LiteralType.IntType: IntType(True, 8),
-                LiteralType.FloatLit: FloatType(True),
-                LiteralType.BoolLit: BoolType(),
-                LiteralType.StrLit: StringType(),
-                LiteralType.NullLit: NullType()
-            }[node.lit.detail]
-        case AST.Identifier:
-            sym = node.frame.get(node.name)
-            if sym is not None:
+LITERAL_TYPES: Dict[LiteralType, SylphType] = {
+    LiteralType.IntLit: IntType(True, 8),
+    LiteralType.FloatLit: FloatType(True),
+    LiteralType.BoolLit: BoolType(),
+    LiteralType.StrLit: StringType(),
+    LiteralType.NullLit: NullType()
+}
+
+# Operators every primitive type has without a module defining them
+COMPARISONS = {"==", "!=", "<", ">", "<=", ">="}
+LOGICAL = {"and", "or", "&&", "||"}
+ARITHMETIC = {"+", "-", "*", "/"}
+BITWISE = {"|", "^", "&"}
+
+# The type of every node in a tree, worked out once. Nodes are found by id, so the table holds on to every
+# tree it's typed to make sure those ids stay theirs. Inference walks with its own stack rather than recursing,
+# so however deep an expression goes it can't hit the recursion limit. Variables carry the Symbol they were resolved
+# to, and module functions are looked up in the module of the symbol table it's given. A node that can't be typed
+# is reported to the diagnostics and FAILED handed back, and nothing above it is typed after that
+class TypeTable:
+
+    def __init__(self, symbols: SymbolTable | None = None, diagnostics: Core.Diagnostics | None = None):
+        self.types: Dict[int, SylphType] = {}
+        self.roots: List[AST.Node] = []
+        # What variables declared as x := value turned out to be, by the id of their Symbol
+        self.variables: Dict[int, SylphType] = {}
+        # The overload each call and infix operator resolved to, by the id of the call
+        self.calls: Dict[int, CollectedFunction] = {}
+        self.symbols = symbols
+        self.module = symbols.getModule() if symbols is not None else None
+        self.diagnostics = diagnostics if diagnostics is not None else Core.Diagnostics()
+
+    def get(self, node: AST.Node) -> SylphType | None:
+        return self.types.get(id(node))
+
+    def typeOf(self, node: AST.Node) -> SylphType | Core.Failed:
+        found = self.types.get(id(node))
+        if found is None:
+            if self.infer(node) is Core.FAILED:
+                return Core.FAILED
+            found = self.types[id(node)]
+        return found
+
+    # Children are typed before their parents, and in the order they're written, so by the time a node is worked out
+    # everything it needs is in the table, including the type of any variable it uses
+    def infer(self, root: AST.Node) -> None | Core.Failed:
+        self.roots.append(root)
+        types = self.types
+        stack: List[tuple[AST.Node, bool]] = [(root, False)]
+        while stack:
+            node, childrenTyped = stack.pop()
+            if id(node) in types:
+                continue
+            if childrenTyped:
+                computed = self.compute(node)
+                if computed is Core.FAILED:
+                    return Core.FAILED
+                types[id(node)] = computed
+                continue
+            stack.append((node, True))
+            for child in reversed(children(node, self.module)):
+                if not id(child) in types:
+                    stack.append((child, False))
+
+    def compute(self, node: AST.Node) -> SylphType | Core.Failed:
+        rule = TypeTable.rules.get(node.__class__)
+        if rule is None:
+            raise Core.RuntimeError("Cannot type check node " + node.__class__.__name__, Core.SourceInfo("INTERNAL_ERROR", -1, -1))
+        return rule(self, node)
+
+    def emptyType(self, node: AST.EmptyNode) -> SylphType:
+        return NullType()
+
+    def literalType(self, node: AST.Literal) -> SylphType:
+        # We assume the largest possible kind, and AST sweeps can fix it in post lmao
+        return LITERAL_TYPES[node.lit.detail]
+
+    # Variables were resolved when the body was parsed. Anything else is looked up in the table, for trees built by hand
+    def identifierType(self, node: AST.Identifier) -> SylphType | Core.Failed:
+        sym = node.symbol
+        if sym is None and self.symbols is not None:
+            sym = self.symbols.get(node.name)
+        if sym is not None:
+            if sym.type is not None:
                 return sym.type
-            raise Core.CompileError("Cannot type check undefined variable \"" + node.name + "\"", node.token.location)
-        case AST.Block:
-            if len(node.contents) > 0:
-                return getTypeOfNode(node.contents[-1])
-            return NullType()
-        case AST.If:
-            # TODO: Should change if ast so that there can be multiple conditions/bodies
-            # This prevents a recursive sum type issue
-            firstType = getTypeOfNode(node.body)
-            secondType = getTypeOfNode(node.elseNode)
-            if firstType == secondType:
-                return firstType
-            return SumType([firstType, secondType])
-        case AST.While:
-            # TODO when we get list types in this will be great
-            # ... we could probably do it now though
-            return NullType()
-        case AST.For:
-            # TODO: same as while
-            return NullType
-        case AST.FunctionCall:
-            if isinstance(node.function, AST.Identifier):
-                if node.function.name in node.frame.getModule().functions.keys():
-                    return node.frame.getModule().functions[node.function.name].signiture.returnType
-                raise Core.RuntimeError("Cannot type check a call to a non-callable identifier \"" + node.function.name + "\"", node.function.token.location)
-            funcType = getTypeOfNode(node.function)
-            if isinstance(funcType, FunctionPtr):
-                return funcType.returnType
-            # This shouldn't ever be the case so its OK that this is a little spooky
-            raise Core.RuntimeError("Cannot type chec a call to a non-callable type \"" + str(funcType) + "\"", Core.SourceInfo("INTERNAL_ERROR", -1, -1))
-        case AST.Index:
-            indexingType = getTypeOfNode(node.of)
-            match indexingType:
-                case PtrType(ptrOf):
-                    return ptrOf
-                case _:
-                    raise Core.RuntimeError("Cannot type check index on non-ptr type \"" + str(indexingType) + "\"", Core.SourceInfo("INTERNAL_ERROR", -1, -1))
-        case AST.Is:
-            return BoolType()
-        case AST.As:
+            inferred = self.variables.get(id(sym))
+            if inferred is None:
+                raise Core.RuntimeError("Cannot type check \"" + node.name + "\" before its definition", node.token.location)
+            return inferred
+        return self.diagnostics.error("Cannot type check undefined variable \"" + node.name + "\"", node.token.location)
+
+    def blockType(self, node: AST.Block) -> SylphType:
+        if len(node.contents) > 0:
+            return self.types[id(node.contents[-1])]
+        return NullType()
+
+    def ifType(self, node: AST.If) -> SylphType:
+        # TODO: Should change if ast so that there can be multiple conditions/bodies
+        # This prevents a recursive sum type issue. Sums of the same type twice are just that type
+        return SumType([self.types[id(node.body)], self.types[id(node.elseNode)]])
+
+    def loopType(self, node: AST.While | AST.For) -> SylphType:
+        # TODO when we get list types in this will be great
+        # ... we could probably do it now though
+        return NullType()
+
+    def callType(self, node: AST.FunctionCall) -> SylphType | Core.Failed:
+        types = self.types
+        argumentTypes = [types[id(argument)] for argument in node.arguments]
+        if isinstance(node.function, AST.Identifier) and self.module is not None:
+            if node.function.name in self.module.functions.keys():
+                func = resolveOverload(self.module.functions[node.function.name], argumentTypes, node.function.token, self.diagnostics)
+                if func is Core.FAILED:
+                    return Core.FAILED
+                self.calls[id(node)] = func
+                return func.signiture.returnType
+        if isinstance(node.function, CollectedFunction):
+            return node.function.signiture.returnType
+        funcType = node.function.type if isinstance(node.function, Symbol) else types[id(node.function)]
+        if isinstance(funcType, FunctionPtr):
+            return funcType.returnType
+        # This shouldn't ever be the case so its OK that this is a little spooky
+        raise Core.RuntimeError("Cannot type chec a call to a non-callable type \"" + str(funcType) + "\"", Core.SourceInfo("INTERNAL_ERROR", -1, -1))
+
+    # An overload from the module wins, otherwise it's one of the operators built in for primitive types
+    def binaryOpType(self, node: AST.BinaryOp) -> SylphType | Core.Failed:
+        operator = node.operator.string
+        argumentTypes = [self.types[id(node.left)], self.types[id(node.right)]]
+        functions = self.module.functions.get(operator) if self.module is not None else None
+        if functions is not None:
+            func = findOverload(functions, argumentTypes)
+            if func is not None:
+                self.calls[id(node)] = func
+                return func.signiture.returnType
+        builtin = builtinType(operator, node.left, node.right, argumentTypes[0], argumentTypes[1])
+        if builtin is not None:
+            return builtin
+        if functions is None:
+            return self.diagnostics.error("No infix operator \"" + operator + "\"", node.operator.location)
+        return noOverload(node.operator, argumentTypes, self.diagnostics)
+
+    def indexType(self, node: AST.Index) -> SylphType:
+        indexingType = self.types[id(node.of)]
+        match indexingType:
+            case PtrType(ptrOf):
+                return ptrOf
+            case _:
+                raise Core.RuntimeError("Cannot type check index on non-ptr type \"" + str(indexingType) + "\"", Core.SourceInfo("INTERNAL_ERROR", -1, -1))
+
+    def isType(self, node: AST.Is) -> SylphType:
+        return BoolType()
+
+    def asType(self, node: AST.As) -> SylphType:
+        return node.type
+
+    def referenceType(self, node: AST.Reference) -> SylphType:
+        return PtrType(self.types[id(node.of)], False, None)
+
+    def dereferenceType(self, node: AST.Dereference) -> SylphType:
+        derefType = self.types[id(node.of)]
+        match derefType:
+            case PtrType(of):
+                return of
+            case _:
+                raise Core.RuntimeError("Cannot dereference non-ptr type \"" + str(derefType) + "\"", Core.SourceInfo("INTERNAL_ERROR", -1, -1))
+
+    def returnType(self, node: AST.Return) -> SylphType:
+        return self.types[id(node.val)]
+
+    def assignType(self, node: AST.Assign) -> SylphType:
+        return self.types[id(node.left)]
+
+    def variableDefType(self, node: AST.VariableDef) -> SylphType:
+        if node.type is not None:
             return node.type
-        case AST.Reference:
-            return PtrType(getTypeOfNode(node.of), False, None)
-        case AST.Dereference:
-            derefType = getTypeOfNode(node.of)
-            match derefType:
-                case PtrType(of):
-                    return of
-                case _:
-                    raise Core.RuntimeError("Cannot dereference non-ptr type \"" + str(derefType) + "\"", Core.SourceInfo("INTERNAL_ERROR", -1, -1))
-        case AST.Return:
-            return getTypeOfNode(node.val)
-        case AST.Assign:
-            return getTypeOfNode(node.left)
-        case AST.BinaryOp:
-            return getTypeOfBinaryOp(node)
-        
\ No newline at end of file
+        inferred = self.types[id(node.value)]
+        if node.symbol is not None:
+            self.variables[id(node.symbol)] = inferred
+        return inferred
+
+    # How each class of node is typed, looked up by the node's class rather than trying each case in turn
+    rules: Dict[type, Callable[["TypeTable", AST.Node], SylphType | Core.Failed]] = {
+        AST.EmptyNode: emptyType,
+        AST.Literal: literalType,
+        AST.Identifier: identifierType,
+        AST.Block: blockType,
+        AST.If: ifType,
+        AST.While: loopType,
+        AST.For: loopType,
+        AST.FunctionCall: callType,
+        AST.BinaryOp: binaryOpType,
+        AST.Index: indexType,
+        AST.Is: isType,
+        AST.As: asType,
+        AST.Reference: referenceType,
+        AST.Dereference: dereferenceType,
+        AST.Return: returnType,
+        AST.Assign: assignType,
+        AST.VariableDef: variableDefType,
+    }
+
+# Every field of a node that's another node, apart from the name of a module function being called, which
+# isn't a variable and has no type of its own
+def children(node: AST.Node, module: StructureModule | None = None) -> List[AST.Node]:
+    found: List[AST.Node] = []
+    for name in childFields(node.__class__):
+        value = getattr(node, name)
+        if isinstance(value, AST.Node):
+            found.append(value)
+        elif isinstance(value, list):
+            found.extend([item for item in value if isinstance(item, AST.Node)])
+    if module is not None and isinstance(node, AST.FunctionCall) and isinstance(node.function, AST.Identifier) and node.function.name in module.functions.keys():
+        found.remove(node.function)
+    return found
+
+fieldsByClass: Dict[type, tuple[str, ...]] = {}
+
+def childFields(cls: type) -> tuple[str, ...]:
+    names = fieldsByClass.get(cls)
+    if names is None:
+        names = fieldsByClass[cls] = tuple([field.name for field in fields(cls)])
+    return names
+
+# What a builtin operator gives back for these operands, if it takes them. Arithmetic widens to the bigger of two
+# numbers, a float over any int, except that a literal takes the type of whatever it's used with
+def builtinType(operator: str, left: AST.Node, right: AST.Node, leftType: SylphType, rightType: SylphType) -> SylphType | None:
+    numeric = (IntType, FloatType)
+    if operator in COMPARISONS:
+        if isinstance(leftType, numeric) and isinstance(rightType, numeric):
+            return BoolType()
+        if operator in ("==", "!=") and leftType is rightType and isinstance(leftType, BaseType):
+            return BoolType()
+        return None
+    if operator in LOGICAL or operator in BITWISE:
+        if isinstance(leftType, BoolType) and isinstance(rightType, BoolType):
+            return BoolType()
+    if operator in ARITHMETIC or operator in BITWISE:
+        allowed = numeric if operator in ARITHMETIC else IntType
+        if not isinstance(leftType, allowed) or not isinstance(rightType, allowed):
+            return None
+        if isinstance(left, AST.Literal) and not isinstance(right, AST.Literal):
+            return rightType
+        if isinstance(right, AST.Literal) and not isinstance(left, AST.Literal):
+            return leftType
+        return widerOf(leftType, rightType)
+    return None
+
+def widerOf(first: IntType | FloatType, second: IntType | FloatType) -> IntType | FloatType:
+    if isinstance(first, FloatType) or isinstance(second, FloatType):
+        return FloatType(any([isinstance(option, FloatType) and option.double for option in (first, second)]))
+    return IntType(first.unsigned and second.unsigned, max(first.sizeBytes, second.sizeBytes))
+
+# Overloads are told apart by the kind of each argument, the same way StructureModule.verify does
+def findOverload(functions: List[CollectedFunction], argumentTypes: List[SylphType]) -> CollectedFunction | None:
+    key = tuple(map(type, argumentTypes))
+    for func in functions:
+        if func.signiture.argumentKey() == key:
+            return func
+    return None
+
+def resolveOverload(functions: List[CollectedFunction], argumentTypes: List[SylphType], name: Token, diagnostics: Core.Diagnostics) -> CollectedFunction | Core.Failed:
+    func = findOverload(functions, argumentTypes)
+    if func is not None:
+        return func
+    return noOverload(name, argumentTypes, diagnostics)
+
+def noOverload(name: Token, argumentTypes: List[SylphType], diagnostics: Core.Diagnostics) -> Core.Failed:
+    return diagnostics.error("No overload of \"" + name.string + "\" takes (" + ", ".join([str(argType) for argType in argumentTypes]) + ")", name.location)
+
+# Types a whole tree, or gives back the error that stopped it, the last one its table was told about
+def inferTypes(root: AST.Node, table: TypeTable | None = None) -> TypeTable | Core.CompileError:
+    table = table if table is not None else TypeTable()
+    if table.infer(root) is Core.FAILED:
+        return table.diagnostics.errors[-1]
+    return table
+
+def getTypeOfNode(node: AST.Node, table: TypeTable | None = None) -> SylphType | Core.Failed:
+    return (table if table is not None else TypeTable()).typeOf(node)
@@ -2,6 +2,7 @@ from Types import *
 from Scanner.Tokens import *
 from Parser.TokenList import TokenList
 from typing import Dict
+from contextlib import contextmanager
 
 @dataclass
 class FunctionSigniture:
@@ -10,16 +11,12 @@ class FunctionSigniture:
     argumentTypes: List[SylphType]
     returnType: SylphType
 
+    # Overloads are told apart by their arity and the kind of each argument, so two with the same key clash
+    def argumentKey(self) -> tuple:
+        return tuple(map(type, self.argumentTypes))
+
     def hasDifferentArgumentTypes(self, other) -> bool:
-        if len(self.argumentTypes) != len(other.argumentTypes):
-            print("Different number of arguments",)
-            return True
-        for i in range(len(self.argumentTypes)):
-            if self.argumentTypes[i].__class__ != other.argumentTypes[i].__class__:
-                print(self.argumentTypes[i].__class__,"vs",other.argumentTypes[i].__class__)
-                return True
-        print("Hmm, this looks similar to me")
-        return False
+        return self.argumentKey() != other.argumentKey()
 
     def getFnPtrType(self):
         return FunctionPtr(self.argumentTypes, self.returnType)
@@ -27,106 +24,151 @@ class FunctionSigniture:
 
 TypeDict = Dict[str, SylphType]
 
-@Core.orError
+# Gives back the first error as a value, for anything parsing a type on its own
 def parseType(types: TypeDict, tList: TokenList) -> SylphType | Core.CompileError:
+    diagnostics = Core.Diagnostics(1)
+    parsed = readType(types, tList, diagnostics)
+    return diagnostics.errors[0] if parsed is Core.FAILED else parsed
+
+# Errors are reported to the diagnostics and FAILED handed back, which every level passes straight up
+def readType(types: TypeDict, tList: TokenList, diagnostics: Core.Diagnostics) -> SylphType | Core.Failed:
+    FAILED = Core.FAILED
     # No sum, ptr or arrays allowed
-    def parseSingularType(types: TypeDict, tList: TokenList) -> SylphType:
+    def parseSingularType(types: TypeDict, tList: TokenList) -> SylphType | Core.Failed:
         if tList.peekType() == TT.OpenBracket:
             openBracketToken = tList.get()
             # Assume its a func ptr until you do or don't get ->
             parsedTypes: List[SylphType] = []
             while tList.peekType() != TT.CloseBracket:
-                if len(parsedTypes) > 0:
-                    tList.expect(TT.Comma)
-                parsedTypes.append(parseType(types, tList))
-                if isinstance(parsedTypes[-1], Core.CompileError):
-                    raise parsedTypes[-1]
+                if len(parsedTypes) > 0 and tList.require(TT.Comma, diagnostics) is FAILED:
+                    return FAILED
+                parsedTypes.append(readType(types, tList, diagnostics))
+                if parsedTypes[-1] is FAILED:
+                    return FAILED
                 
-            tList.expect(TT.CloseBracket)
+            if tList.require(TT.CloseBracket, diagnostics) is FAILED:
+                return FAILED
             if tList.peekStr() != "->":
                 if len(parsedTypes) == 1:
                     return parsedTypes[0]
                 else:
-                    raise Core.CompileError(
+                    return diagnostics.error(
                         "Expected ->, found " + tList.peekStr() + " (multiple types in bracket, did you want a function pointer?)", 
                         openBracketToken.location)
-            tList.get()
-            returnType = parseType(types, tList)
-            if isinstance(returnType, Core.CompileError):
-                raise returnType
+            tList.skip()
+            returnType = readType(types, tList, diagnostics)
+            if returnType is FAILED:
+                return FAILED
             return FunctionPtr(parsedTypes, returnType)
-        # Should be as simple as a type name
-        foundID, typeName = tList.match(TT.Identifier)
-        foundType = foundID
-        if foundID:
-            if not typeName.string in types.keys():
-                foundType = False
-            #else
-            return types[typeName.string]
-        if not foundType:
-            raise Core.CompileError("Expected a type, found \"" + tList.peek().string + "\"", tList.peek().location)
+        # Should be as simple as a type name, which is only made into a token to report it
+        if tList.peekType() == TT.Identifier:
+            typeName = tList.peekStr()
+            if not typeName in types.keys():
+                return diagnostics.error("Unknown type \"" + typeName + "\"", tList.get().location)
+            tList.skip()
+            return types[typeName]
+        return diagnostics.error("Expected a type, found \"" + tList.peek().string + "\"", tList.peek().location)
     # End def parseSingularType
     
-    def parseNonSumType(types: TypeDict, tList: TokenList) -> SylphType:
+    def parseNonSumType(types: TypeDict, tList: TokenList) -> SylphType | Core.Failed:
         builtType = parseSingularType(types, tList)
+        if builtType is FAILED:
+            return FAILED
 
         getting_additions = True
         while getting_additions:
-            match tList.peek():
-                case Token(TT.Keyword, Keywords.Ptr):
+            match tList.peekTypeSubtype():
+                case [TT.Keyword, Keywords.Ptr]:
                     builtType = PtrType(builtType, False, None)
-                    tList.get()
-                case Token(TT.OpenBrace):
-                    tList.get()
-                    iLiteral = tList.expect(TT.Literal)
+                    tList.skip()
+                case [TT.OpenBrace, _]:
+                    tList.skip()
+                    iLiteral = tList.want(TT.Literal, diagnostics)
+                    if iLiteral is FAILED:
+                        return FAILED
                     if iLiteral.detail != LiteralType.IntLit:
-                        raise Core.CompileError("Expected int literal for length of array, found " + iLiteral.string, iLiteral.location)
-                    tList.expect(TT.CloseBrace)
+                        return diagnostics.error("Expected int literal for length of array, found " + iLiteral.string, iLiteral.location)
+                    if tList.require(TT.CloseBrace, diagnostics) is FAILED:
+                        return FAILED
                     builtType = PtrType(builtType, True, int(iLiteral.string))
                 case _:
                     getting_additions = False
         return builtType
 
-    pType = parseNonSumType(types, tList)
-    isSumType = False
+    options = [parseNonSumType(types, tList)]
     lookingForSumType = True
 
-    while lookingForSumType:
+    while lookingForSumType and options[-1] is not FAILED:
         if tList.peekStr() == "or":
-            tList.get()
-            nextType = parseNonSumType(types, tList)
-            if isSumType:
-                pType.options.append(nextType)
-            else:
-                isSumType = True
-                pType = SumType([pType, nextType])
+            tList.skip()
+            options.append(parseNonSumType(types, tList))
         else:
             lookingForSumType = False
-    return pType
+    if options[-1] is FAILED:
+        return FAILED
+    # Types are immutable, so the sum is only made once every option is known
+    return options[0] if len(options) == 1 else SumType(options)
 
 
 @dataclass
 class Symbol:
     token: Token
-    type: SylphType
+    # None for a variable declared as x := value, a TypeTable works it out from the value
+    type: SylphType | None
     location: Core.CompileError
 
-class SymbolFrame:
-    
-    def __init__(self, parent):
-        self.parent = parent
-        self.symbols: Dict[str, Symbol] = {}
-        self.module = None if parent is None else parent.module
+# Every name in scope maps to a stack of what it means, innermost on top, so looking a name up is one dict
+# lookup however deeply nested the scope is. Popping a scope only touches the names that scope declared.
+# Only the innermost scope is ever live, so names need looking up while their scope is still pushed, which is
+# why function bodies keep the Symbol each of their identifiers resolved to
+class SymbolTable:
+
+    def __init__(self, module=None):
+        self.module = module
+        self.symbols: Dict[str, List[tuple[int, Symbol]]] = {}
+        # The names each scope declared, global scope first
+        self.declared: List[List[str]] = [[]]
 
     def getModule(self):
         return self.module
 
+    def depth(self) -> int:
+        return len(self.declared) - 1
+
     def get(self, name: str) -> Symbol | None:
-        if name in self.symbols.keys():
-            return self.symbols[name]
-        elif self.parent is not None:
-            return self.parent.get(name)
+        entries = self.symbols.get(name)
+        if entries:
+            return entries[-1][1]
         return None
-    
+
     def add(self, symbol: Symbol):
-        self.symbols[symbol.token.string] = symbol
+        name = symbol.token.string
+        entries = self.symbols.setdefault(name, [])
+        depth = self.depth()
+        # Declaring the same name twice in one scope replaces it, just like it used to
+        if entries and entries[-1][0] == depth:
+            entries[-1] = (depth, symbol)
+        else:
+            entries.append((depth, symbol))
+            self.declared[-1].append(name)
+
+    def pushScope(self):
+        self.declared.append([])
+
+    def popScope(self):
+        if len(self.declared) == 1:
+            raise Core.RuntimeError("Cannot pop the global scope", Core.SourceInfo("INTERNAL_ERROR", -1, -1))
+        for name in self.declared.pop():
+            entries = self.symbols[name]
+            entries.pop()
+            if not entries:
+                del self.symbols[name]
+
+    # with table.scope(): ... for a scope that gets popped however the block is left
+    @contextmanager
+    def scope(self):
+        self.pushScope()
+        try:
+            yield self
+        finally:
+            self.popScope()
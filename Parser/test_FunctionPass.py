@@ -0,0 +1,144 @@
+import pytest
+from pathlib import Path
+from typing import List
+import Core
+import Parser.AST as AST
+from Types import *
+from Scanner.Scanner import Scanner
+from Parser.StructurePass import StructurePass
+from Parser.FunctionPass import FunctionPass, ParsedFunction
+from Parser.Types import SymbolTable
+from Parser.TypeParser import TypeTable
+from Benchmarks.Common import everyNode
+
+# Every scope is popped by the time a body has been parsed, so the variables in it have to come back already
+# resolved, whether the body was parsed here or in a worker
+
+SOURCE = """
+func f(a: i32, b: bool) -> i32 {
+    x: i32 = a
+    {
+        a: bool = b
+        a
+    }
+    for i: i32 = 0; b; i = x do x = i
+    g()
+    a
+}
+func g() -> i32 = 1
+"""
+
+def parsedFunctions(tmp_path, workers: int) -> List[ParsedFunction]:
+    (tmp_path / "source.syl").write_text(SOURCE)
+    _, tokens = Scanner.scan("source.syl")
+    success, module = StructurePass(tokens)
+    assert success, module
+    success, parsed = FunctionPass(module, workers)
+    assert success, parsed
+    return parsed
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_identifiers_keep_their_symbols(tmp_path, monkeypatch, workers: int):
+    monkeypatch.chdir(tmp_path)
+    identifiers = [node for node in everyNode(parsedFunctions(tmp_path, workers)[0].body) if isinstance(node, AST.Identifier)]
+    # Where each variable is used, and where what it resolved to was declared
+    resolved = sorted([(node.token.location.line_number, node.name) + ((node.symbol.token.location.line_number, node.symbol.type) if node.symbol else (None, None)) for node in identifiers])
+    assert resolved == [
+        (2, "a", 1, IntType(False, 4)),
+        (4, "b", 1, BoolType()),
+        (5, "a", 4, BoolType()),
+        (7, "b", 1, BoolType()),
+        (7, "i", 7, IntType(False, 4)),
+        (7, "i", 7, IntType(False, 4)),
+        (7, "x", 2, IntType(False, 4)),
+        (7, "x", 2, IntType(False, 4)),
+        (8, "g", None, None),
+        (9, "a", 1, IntType(False, 4)),
+    ]
+
+# The function's table only has the module in it, which is all a TypeTable needs once variables are resolved
+@pytest.mark.parametrize("workers", [1, 2])
+def test_bodies_type_with_their_table(tmp_path, monkeypatch, workers: int):
+    monkeypatch.chdir(tmp_path)
+    f, g = parsedFunctions(tmp_path, workers)
+    assert TypeTable(f.symbols).typeOf(f.body) == IntType(False, 4)
+    # Integer literals are typed as the widest kind for now
+    assert TypeTable(g.symbols).typeOf(g.body) == IntType(True, 8)
+
+def test_global_scope_cannot_be_popped():
+    with pytest.raises(Core.RuntimeError):
+        SymbolTable().popScope()
+
+LIBRARY = """
+func main() -> i32 {
+    x := pick(1)
+    y := x
+    y
+}
+func pick(a: i32) -> i32 = a
+func pick(a: bool) -> i32 = broken
+func pick(a: i32, b: i32) -> i32 = a
+func unused() -> i32 = alsoBroken
+"""
+
+# Only the overload a call resolves to is reached, and only what's reached gets type checked
+@pytest.mark.parametrize("workers", [1, 2])
+def test_entry_points_reach_resolved_overloads(tmp_path, monkeypatch, workers: int):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "source.syl").write_text(LIBRARY)
+    _, tokens = Scanner.scan("source.syl")
+    success, module = StructurePass(tokens)
+    assert success, module
+    success, parsed = FunctionPass(module, workers, ["main"])
+    assert success, parsed
+    assert [(function.function.name.string, len(function.function.argTokens)) for function in parsed] == [("main", 0), ("pick", 1)]
+    main = parsed[0]
+    assert main.types.typeOf(main.body) == IntType(False, 4)
+
+# A body that doesn't type check still parses, the errors are left in its table
+def test_reached_bodies_are_type_checked(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "source.syl").write_text(LIBRARY.replace("pick(1)", "pick(true)"))
+    _, tokens = Scanner.scan("source.syl")
+    success, module = StructurePass(tokens)
+    assert success, module
+    success, parsed = FunctionPass(module, 1, ["main"])
+    assert success, parsed
+    assert [error.message for function in parsed for error in function.types.diagnostics.errors] == ["Cannot type check undefined variable \"broken\""]
+
+# Starting from every function gives exactly what parsing everything does, and starting from any one of them
+# gives part of it, however much of what it reaches can be typed
+@pytest.mark.parametrize("filename", ["simple.syl", "test.syl"])
+def test_lazy_parses_match_eager(monkeypatch, filename: str):
+    monkeypatch.chdir(Path(__file__).parent.parent)
+    _, tokens = Scanner.scan(filename)
+    success, module = StructurePass(tokens)
+    assert success, module
+    eager = outcome(FunctionPass(module))
+    names = sorted({func.name.string for funcs in module.functions.values() for func in funcs if not func.external})
+    assert outcome(FunctionPass(module, 1, names)) == eager
+    for name in names:
+        lazy = outcome(FunctionPass(module, 1, [name]))
+        # Unless it never reached the body that doesn't parse
+        assert lazy[0] if lazy[0] != eager[0] else all([item in eager[1] for item in lazy[1]])
+
+def outcome(result: tuple) -> tuple[bool, list]:
+    success, value = result
+    if success:
+        return True, [(function.function.name.location, shape(function.body)) for function in value]
+    return False, [(error.location, error.message) for error in value]
+
+def shape(node: AST.Node) -> List[str]:
+    return [child.__class__.__name__ for child in everyNode(node)]
+
+# The structure pass leaves brackets inside bodies alone, so they're reported here, the same way whichever kind
+# of tokens the module was structured from
+def test_brackets_inside_bodies_are_reported(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "source.syl").write_text("func f(a: i32) -> i32 {\n    x := (a + 1\n    return x\n}\nfunc g() {\n    y ]\n}\n")
+    for tokens in [Scanner.scan("source.syl")[1], Scanner.scan("source.syl", compact=True)[1], Scanner.stream("source.syl", [])]:
+        success, module = StructurePass(tokens)
+        assert success, module
+        success, errors = FunctionPass(module)
+        assert not success
+        assert [(error.location.line_number, error.message) for error in errors] == [(2, "Expected TokenType.CloseBracket found return"), (5, "Expected an expression, found \"]\"")]
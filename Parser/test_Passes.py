@@ -0,0 +1,85 @@
+import Parser.AST as AST
+from Types import *
+from Scanner.Scanner import Scanner
+from Parser.StructurePass import StructurePass
+from Parser.FunctionPass import FunctionPass
+from Parser.TypeParser import TypeTable
+from Parser.Passes import PassManager, TypeInference, ConstantDetection, LValueCheck, compilePasses, wholeArrays
+from Benchmarks.Common import everyNode
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+
+# The fused walk over bodies that came out of the function pass, one manager running over each of them in turn
+
+def parseAll(filename: str) -> list:
+    _, tokens = Scanner.scan(filename)
+    success, module = StructurePass(tokens)
+    assert success, module
+    success, parsed = FunctionPass(module)
+    assert success, parsed
+    return parsed
+
+def test_fused_matches_type_table(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    parsed = parseAll(ProgramGenerator(ProgramShape(functions=40, overloads=2, longLines=2, longLineTerms=50, typed=True)).write(str(tmp_path)))
+    symbols = parsed[0].symbols
+    types, constants, lvalues = TypeInference(symbols), ConstantDetection(symbols.getModule()), LValueCheck()
+    manager = PassManager([types, constants, lvalues], symbols.getModule())
+    onDemand = TypeTable(symbols)
+    for function in parsed:
+        manager.run(function.body)
+        onDemand.infer(function.body)
+    assert manager.errors() == []
+    assert types.table.types == onDemand.types
+
+# A pass that fails on one body still runs over the next one
+def test_failed_pass_runs_on_the_next_tree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "source.syl").write_text("func bad() -> i32 = missing\nfunc good(a: i32) -> i32 {\n    b: i32 = a\n    b\n}\n")
+    bad, good = parseAll("source.syl")
+    types, constants = TypeInference(good.symbols), ConstantDetection(good.symbols.getModule())
+    manager = PassManager([types, constants], good.symbols.getModule())
+    manager.run(bad.body)
+    manager.run(good.body)
+    assert [error.message for error in types.errors] == ["Cannot type check undefined variable \"missing\""]
+    assert all([types.table.get(node) is not None for node in everyNode(good.body)])
+
+SOURCE = """
+func main() -> i32 {
+    x := pick(1)
+    ref (x + 1)
+    x * 2
+}
+func pick(a: i32) -> i32 = a
+func pick(a: bool) -> i32 = broken
+"""
+
+# The function pass runs the analyses over each body as it's parsed, and types lazily reached bodies with their table
+def test_function_pass_runs_analyses(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "source.syl").write_text(SOURCE)
+    _, tokens = Scanner.scan("source.syl")
+    success, module = StructurePass(tokens)
+    assert success, module
+    for entryPoints, reached in [(None, 3), (["main"], 2)]:
+        manager = compilePasses(module)
+        success, parsed = FunctionPass(module, 1, entryPoints, manager)
+        assert success, parsed
+        assert len(parsed) == reached and manager.walks == reached
+        types = manager.passes[0]
+        assert all([function.types is types.table for function in parsed])
+        assert types.table.get(parsed[0].body) == IntType(False, 4)
+        messages = ["Cannot take a reference to this expression"] + (["Cannot type check undefined variable \"broken\""] if entryPoints is None else [])
+        assert sorted([error.message for error in manager.errors()]) == sorted(messages)
+
+# An array whose elements are referenced has to keep them whole, one only ever indexed doesn't
+def test_element_references_find_arrays(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "source.syl").write_text("func f(a: (i32 or float)[4], b: (u8 or bool)[4]) -> i32 {\n    x := b[0]\n    ref a[1]\n}\n")
+    _, tokens = Scanner.scan("source.syl")
+    success, module = StructurePass(tokens)
+    assert success, module
+    manager = compilePasses(module)
+    success, parsed = FunctionPass(module, 1, None, manager)
+    assert success, parsed
+    assert manager.errors() == []
+    assert wholeArrays(manager) == {PtrType(SumType([IntType(False, 4), FloatType(False)]), True, 4)}
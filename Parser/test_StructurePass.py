@@ -0,0 +1,100 @@
+import pytest
+from Scanner.Scanner import Scanner
+from Parser.StructurePass import StructurePass
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+
+# A module structured from a token list, from a TokenStore, and from a stream of tokens has to come out the same,
+# with the same functions and bodies when it parses and the same errors when it doesn't
+
+def summary(result: tuple) -> tuple:
+    success, module = result
+    if not success:
+        return False, [str(error) for error in module]
+    functions = {}
+    for name, funcs in module.functions.items():
+        functions[name] = [(str(func.signiture), [token.string for token in func.argTokens], [(token.string, token.location) for token in func.definition]) for func in funcs]
+    return True, sorted(module.types.keys()), functions
+
+def structureAll(filename: str) -> tuple[tuple, tuple, tuple]:
+    _, tokenList = Scanner.scan(filename)
+    _, tokenStore = Scanner.scan(filename, compact=True)
+    errors = []
+    streamed = StructurePass(Scanner.stream(filename, errors))
+    assert errors == []
+    return summary(StructurePass(tokenList)), summary(StructurePass(tokenStore)), summary(streamed)
+
+def assertAgree(filename: str) -> tuple:
+    listed, stored, streamed = structureAll(filename)
+    assert listed == stored
+    assert listed == streamed
+    return listed
+
+@pytest.mark.parametrize("shape", [
+    ProgramShape(functions=30),
+    ProgramShape(functions=20, overloads=3, files=4),
+    ProgramShape(functions=10, longLines=2, longLineTerms=50),
+])
+def test_generated_programs_agree(tmp_path, monkeypatch, shape: ProgramShape):
+    monkeypatch.chdir(tmp_path)
+    root = ProgramGenerator(shape).write(str(tmp_path))
+    assert assertAgree(root)[0]
+
+@pytest.mark.parametrize("text", [
+    "func f() -> i32 {\n    return 1\n",
+    "using A = \nfunc f() = 1\n",
+    "func (a: i32) = a\nfunc g() = 2\n",
+    "@infix\nusing A = i32\n",
+    "stray tokens\nfunc f() = 1\n",
+    "func f() -> i32 {\n    return 1\n}\n}\nfunc g() = 2\n",
+    "func f(a: i32 -> i32 = a\nfunc g() = 2\n",
+    "func f() {\n    (\n}\n) ]\nusing A = ( [ ] \nfunc g() {\n}\n",
+    "using A = i32\n{ func f() = 1\n",
+])
+def test_malformed_programs_agree(tmp_path, monkeypatch, text: str):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "source.syl").write_text(text)
+    assert not assertAgree("source.syl")[0]
+
+# Brackets inside a body are the function pass's to report, however they're handed to the structure pass. They're
+# still paired up the same way everywhere, a closer takes whatever's open above its own kind with it
+@pytest.mark.parametrize("text", [
+    "func f(a: i32) -> i32 {\n    x := (a + 1\n    return x\n}\nfunc g() {\n    y ]\n}\n",
+    "func f() {\n    [ {\n    ]\n}\nfunc g() {\n    y ]\n}\n",
+])
+def test_brackets_inside_bodies_agree(tmp_path, monkeypatch, text: str):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "source.syl").write_text(text)
+    success, types, functions = assertAgree("source.syl")
+    assert success
+    assert [token for token, _ in functions["g"][0][2]] == ["y", "]"]
+
+# Overloads are told apart by the kind of each argument, so two that only differ in the size of an integer clash
+@pytest.mark.parametrize("text, clashes", [
+    ("func f(a: i32) = a\nfunc g(a: i32) = a\n", 0),
+    ("func f(a: i32) = a\nfunc f(a: bool) = a\nfunc f(a: i32, b: i32) = a\n", 0),
+    ("func f(a: i32) = a\nfunc f(a: i64) = a\n", 1),
+    ("func f(a: i32) -> i32 = a\nfunc f(a: bool) = a\nfunc f(a: u8) -> bool = true\nfunc f(a: i8) = a\n", 2),
+])
+def test_verify_finds_clashing_overloads(tmp_path, monkeypatch, text: str, clashes: int):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "source.syl").write_text(text)
+    _, tokens = Scanner.scan("source.syl")
+    success, module = StructurePass(tokens)
+    assert success, module
+    success, errors = module.verify()
+    assert success == (clashes == 0)
+    assert len(errors) == clashes
+
+# A one line body runs to the end of its line, and a store finds that from where tokens start rather than their
+# locations. Anything from another file, like the end of file token after an included file's last number, is still
+# compared by line number the way a list compares it
+@pytest.mark.parametrize("text", [
+    "func f() = 1 + 2 # comment\nfunc g() = 3\n",
+    "func f() = (1,\n2)\nfunc g() = 3",
+    "include \"included.syl\" func g() = 1\n",
+])
+def test_one_line_bodies_agree(tmp_path, monkeypatch, text: str):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "included.syl").write_text("func h() = 1 + 2")
+    (tmp_path / "source.syl").write_text(text)
+    assertAgree("source.syl")
@@ -0,0 +1,69 @@
+import pytest
+import Core
+import Parser.AST as AST
+from Types import *
+from Scanner.Scanner import Scanner
+from Parser.StructurePass import StructurePass
+from Parser.FunctionPass import FunctionPass
+from Parser.TypeParser import TypeTable, inferTypes
+from Benchmarks.Common import everyNode
+from Benchmarks.Generator import ProgramShape, ProgramGenerator
+
+# TypeTable over bodies that actually came out of the function pass, rather than trees built by hand
+
+def parseAll(filename: str, workers: int = 1) -> list:
+    _, tokens = Scanner.scan(filename)
+    success, module = StructurePass(tokens)
+    assert success, module
+    success, parsed = FunctionPass(module, workers)
+    assert success, parsed
+    return parsed
+
+def parseText(tmp_path, text: str) -> list:
+    (tmp_path / "source.syl").write_text(text)
+    return parseAll("source.syl")
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_generated_bodies_type(tmp_path, monkeypatch, workers: int):
+    monkeypatch.chdir(tmp_path)
+    root = ProgramGenerator(ProgramShape(functions=40, overloads=2, longLines=2, longLineTerms=50, typed=True)).write(str(tmp_path))
+    parsed = parseAll(root, workers)
+    table = TypeTable(parsed[0].symbols)
+    for function in parsed:
+        assert inferTypes(function.body, table) is table
+        assert all([table.get(node) is not None for node in everyNode(function.body)])
+
+def test_variables_type_as_declared(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    f, add = parseText(tmp_path, "func f(a: i32, b: bool) -> i32 {\n    c: double = a\n    { a: bool = b }\n    a + a\n    c\n}\n@infix\nfunc +(a: i32, b: i32) -> float = a\n")
+    table = TypeTable(f.symbols)
+    assert table.typeOf(f.body) == FloatType(True)
+    identifiers = [node for node in everyNode(f.body) if isinstance(node, AST.Identifier)]
+    assert sorted([(node.name, str(table.get(node))) for node in identifiers]) == sorted([
+        ("a", str(IntType(False, 4))), ("b", str(BoolType())), ("a", str(IntType(False, 4))), ("a", str(IntType(False, 4))), ("c", str(FloatType(True))),
+    ])
+    additions = [node for node in everyNode(f.body) if isinstance(node, AST.BinaryOp)]
+    assert [table.get(node) for node in additions] == [FloatType(False)]
+
+def test_undefined_variables_are_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    f, = parseText(tmp_path, "func f() -> i32 {\n    { x: i32 = 1 }\n    x\n}\n")
+    error = inferTypes(f.body, TypeTable(f.symbols))
+    assert isinstance(error, Core.CompileError)
+    assert "undefined variable \"x\"" in error.message
+
+# Primitives have their operators built in, a module's own overload of one still wins
+def test_builtin_operators(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    f, add = parseText(tmp_path, "func f(a: float, b: u8, c: i32, d: bool) -> float {\n    a * 2\n    b * c\n    b < c\n    d and b == 1\n    a + a\n    c + c\n}\n@infix\nfunc +(a: i32, b: i32) -> bool = true\n")
+    table = TypeTable(f.symbols)
+    assert table.typeOf(f.body) == BoolType()
+    operations = [node for node in everyNode(f.body) if isinstance(node, AST.BinaryOp)]
+    assert sorted([(node.operator.location.line_number, node.operator.string, str(table.get(node))) for node in operations]) == sorted([
+        (1, "*", str(FloatType(False))), (2, "*", str(IntType(False, 4))), (3, "<", str(BoolType())),
+        (4, "and", str(BoolType())), (4, "==", str(BoolType())), (5, "+", str(FloatType(False))), (6, "+", str(BoolType())),
+    ])
+    assert [id(func) for func in table.calls.values()] == [id(add.function)]
+    g, = parseText(tmp_path, "func g(a: bool, b: i32) -> i32 = a * b\n")
+    error = inferTypes(g.body, TypeTable(g.symbols))
+    assert isinstance(error, Core.CompileError) and error.message == "No infix operator \"*\""
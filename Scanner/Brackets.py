@@ -0,0 +1,108 @@
+from array import array
+from itertools import groupby, accumulate, compress, repeat
+from operator import attrgetter
+from typing import List
+from Scanner.Tokens import *
+
+# Bracket token types come in pairs, an opener's value is even and its closer's is one more
+BracketCodes = {ttype: ttype.value for ttype in [TT.OpenBracket, TT.CloseBracket, TT.OpenBrace, TT.CloseBrace, TT.OpenCurly, TT.CloseCurly]}
+# Hashing an enum member runs Python, looking one up by identity doesn't. One more than the code, so every
+# bracket is truthy and anything else can be 0
+BracketFlagsById = {id(ttype): code + 1 for ttype, code in BracketCodes.items()}
+
+# Where every bracket in a stream of tokens is closed, worked out in one pass so nothing has to count its way
+# to the end of a group again. Brackets only pair up within a run of tokens from the same file.
+# A closer with nothing of its kind open is unmatched. One whose opener is further down than the top of the
+# stack still closes it, and whatever was opened since then is left unmatched. Only the partners are kept, whoever
+# runs into a bracket without one reports it
+class BracketIndex:
+
+    def __init__(self, count: int):
+        # The index of each bracket's partner, -1 for anything that isn't a bracket or doesn't have one
+        self.partners = array("i", [-1]) * count
+
+    def __len__(self) -> int:
+        return len(self.partners)
+
+    def partner(self, index: int) -> int:
+        return self.partners[index]
+
+    # Takes the index of every bracket in order along with its type's value, and the index each new file's tokens
+    # start at. They're plain lists of ints rather than pairs, so nothing here adds to what the collector tracks
+    @staticmethod
+    def build(count: int, positions: List[int], codes: List[int], fileStarts: List[int]) -> "BracketIndex":
+        index = BracketIndex(count)
+        partners = index.partners
+        stack: List[int] = []
+        kinds: List[int] = []
+        # How many of each kind are on the stack, so a closer knows whether to look for its opener at all
+        opened = [0, 0, 0]
+        nextFiles = iter(fileStarts)
+        nextFile = next(nextFiles, count)
+
+        for position, code in zip(positions, codes):
+            while position >= nextFile:
+                stack.clear()
+                kinds.clear()
+                opened = [0, 0, 0]
+                nextFile = next(nextFiles, count)
+            kind = code >> 1
+            if code & 1 == 0:
+                stack.append(position)
+                kinds.append(kind)
+                opened[kind] += 1
+            elif opened[kind] > 0:
+                while True:
+                    opening = stack.pop()
+                    openKind = kinds.pop()
+                    opened[openKind] -= 1
+                    if openKind == kind:
+                        break
+                partners[opening] = position
+                partners[position] = opening
+        return index
+
+    # Everything per token is done through map and groupby, so there's no step of Python per token
+    @staticmethod
+    def ofTokens(tokens: List[Token]) -> "BracketIndex":
+        flags = list(map(BracketFlagsById.get, map(id, map(attrgetter("ttype"), tokens)), repeat(0)))
+        positions = list(compress(range(len(flags)), flags))
+        codes = [flags[position] - 1 for position in positions]
+        fileStarts = list(accumulate([len(list(run)) for _, run in groupby(map(attrgetter("location.source_name"), tokens))]))[:-1]
+        return BracketIndex.build(len(tokens), positions, codes, fileStarts)
+
+# The same matching as BracketIndex.build, a token at a time, for tokens that are only seen as they stream past.
+# Only the kinds of what's still open are kept, which is all it takes to tell whether a bracket gets closed
+class BracketTracker:
+
+    def __init__(self):
+        self.kinds: List[int] = []
+        self.opened = [0, 0, 0]
+        self.source: str | None = None
+
+    def copy(self) -> "BracketTracker":
+        tracker = BracketTracker()
+        tracker.kinds = list(self.kinds)
+        tracker.opened = list(self.opened)
+        tracker.source = self.source
+        return tracker
+
+    def add(self, token: Token):
+        source = token.location.source_name
+        if source != self.source:
+            self.source = source
+            self.kinds = []
+            self.opened = [0, 0, 0]
+        flag = BracketFlagsById.get(id(token.ttype))
+        if not flag:
+            return
+        kind = (flag - 1) >> 1
+        if (flag - 1) & 1 == 0:
+            self.kinds.append(kind)
+            self.opened[kind] += 1
+        elif self.opened[kind] > 0:
+            while True:
+                openKind = self.kinds.pop()
+                self.opened[openKind] -= 1
+                if openKind == kind:
+                    break
@@ -0,0 +1,362 @@
+import re
+import os
+import gc
+from typing import List, Set, Iterator
+from dataclasses import dataclass
+import Core
+from Scanner.Tokens import *
+from Scanner.TokenStore import TokenStore, SubtypeCodes
+from Scanner.Source import SourceFile
+
+# The whole file is lexed with one compiled pattern rather than a character at a time, straight off the file's bytes.
+# Spaces and tabs are swallowed in front of each match, newlines (and the indentation after them) are matched as one run.
+# Order matters: floats before ints, and terminated strings before unterminated ones. An error is one whole
+# character, however many bytes that is. End swallows spaces at the very end of a file with no newline after them,
+# which would otherwise be given back and come out as an error
+tokenPattern = re.compile(rb"""[ \t]*(?:
+    (?P<Newline>\r?\n[ \t\r\n]*)
+  | (?P<Word>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<Single>[()\[\]{}.,:;])
+  | (?P<Operator>[+\-*/!<>=&|^~]+)
+  | (?P<Float>[0-9]+\.[0-9]*)[fd]?
+  | (?P<Int>[0-9]+)
+  | (?P<String>"[^"\r\n]*")
+  | (?P<Comment>\#[^\n]*)
+  | (?P<Tag>@[A-Za-z0-9_]*)
+  | (?P<BadString>"[^"\r\n]*)
+  | (?P<End>\Z)
+  | (?P<Error>[\x00-\x7f]|[\xc0-\xff][\x80-\xbf]*|[\x80-\xbf])
+)""", re.VERBOSE)
+
+@dataclass
+class Include:
+    path: str
+    location: Core.SourceInfo
+    # Where the including file picks back up, and whether there was anything left in it
+    resume: Core.SourceInfo
+    resumeOffset: int
+    endsFile: bool
+
+# The reader engine emits an EOF token when a number runs into the end of a file. Its location
+# depends on the file that included this one, so only the stitching in scan can fill it in
+class EndOfFile:
+    pass
+
+LexItem = Include | EndOfFile | Core.CompileError
+
+# Bump whenever the tokens or items lexSource produces change, so cached lexes from older versions are ignored
+SCANNER_VERSION = 2
+
+# Everything lexing one file on its own gives: its tokens, and every include, end of file and error
+# tagged with how many tokens came before it. Nothing in here depends on who included the file
+class LexedFile:
+    def __init__(self, store: TokenStore, events: List[tuple[int, LexItem]]):
+        self.store = store
+        self.events = events
+
+# Roughly how many tokens lexSource hands over at a time
+BATCH_SIZE = 256
+
+# The lexer classifies everything as (type, subtype, type code, subtype code), the codes being what a TokenStore keeps
+def codesOf(ttype: TT, detail: TokenSubtype = None) -> tuple[TT, TokenSubtype, int, int]:
+    return ttype, detail, ttype.value, SubtypeCodes[detail]
+
+WordCodes = {word.encode(): codesOf(ttype, detail) for word, (ttype, detail) in WordMap.items()}
+SingleCodes = {char.encode(): codesOf(ttype) for char, ttype in TokenTypeMap.items()}
+TagCodes = {name.encode(): codesOf(TT.Tag, tag) for name, tag in TagTypeMap.items()}
+IdentifierCodes = codesOf(TT.Identifier, IdentifierType.StandardIdentifier)
+OperatorCodes = codesOf(TT.Identifier, IdentifierType.OperatingIdentifier)
+IntCodes = codesOf(TT.Literal, LiteralType.IntLit)
+FloatCodes = codesOf(TT.Literal, LiteralType.FloatLit)
+StringCodes = codesOf(TT.Literal, LiteralType.StrLit)
+ErrorCodes = codesOf(TT.Error)
+
+class FastScanner:
+
+    # Lexes a single buffer, never following includes itself. Without a store, tokens come out in batches
+    # so the per token cost stays in this loop. With one they're written straight into it instead.
+    # Lexing can also start part way through, from the start of a line where no include is waiting for its file name
+    @staticmethod
+    def lexSource(source: SourceFile, store: TokenStore | None = None, fileId: int = 0, start: int = 0, startLine: int = 0) -> Iterator[List[Token] | LexItem]:
+        # Global and enum lookups are surprisingly slow, so everything the loop needs is local
+        SI = Core.SourceInfo
+        text = source.buffer
+        filename = source.filename
+        # Token strings are decoded once per distinct string, which also means repeated identifiers share one str
+        strings: dict[bytes, str] = {}
+        words = WordCodes
+        singles = SingleCodes
+        identifier = IdentifierCodes
+        operator = OperatorCodes
+        end = len(text)
+        pos = start
+        line = startLine
+        lineStart = start
+        extraBytes = 0
+        includeLocation: Core.SourceInfo | None = None
+        batch: List[Token] = []
+        append = batch.append
+        if store is not None:
+            ttypes = store.ttypes.append
+            details = store.details.append
+            fileIds = store.fileIds.append
+            starts = store.starts.append
+            lengths = store.lengths.append
+
+        while pos < end:
+            panicFrom = -1
+            for m in tokenPattern.finditer(text, pos):
+                kind = m.lastgroup
+                if kind == "Newline":
+                    newLines = m.group(kind)
+                    line += newLines.count(b"\n")
+                    lineStart = m.start(kind) + newLines.rfind(b"\n") + 1
+                    if len(batch) >= BATCH_SIZE:
+                        yield batch
+                        batch = []
+                        append = batch.append
+                    continue
+                if kind == "Comment" or kind == "End":
+                    continue
+                string = m.group(kind)
+                start = m.start(kind)
+                stop = start + len(string)
+
+                if includeLocation is not None:
+                    if kind == "String":
+                        if batch:
+                            yield batch
+                            batch = []
+                            append = batch.append
+                        yield Include(string[1:-1].decode("utf-8", "replace"), SI(filename, line, start - lineStart), SI(filename, line, stop - lineStart), stop, stop == end)
+                        includeLocation = None
+                        continue
+                    if kind != "BadString":
+                        if batch:
+                            yield batch
+                            batch = []
+                            append = batch.append
+                        yield Core.CompileError("Expected a file name string after include, found " + string.decode("utf-8", "replace"), SI(filename, line, start - lineStart))
+                        includeLocation = None
+                        panicFrom = m.end()
+                        break
+                    includeLocation = None
+
+                if kind == "Word":
+                    if string == b"include":
+                        includeLocation = SI(filename, line, start - lineStart)
+                        continue
+                    codes = words.get(string, identifier)
+                elif kind == "Single":
+                    codes = singles[string]
+                elif kind == "Operator":
+                    codes = operator
+                elif kind == "Int":
+                    codes = IntCodes
+                elif kind == "Float":
+                    codes = FloatCodes
+                elif kind == "String" or kind == "Error":
+                    codes = StringCodes if kind == "String" else ErrorCodes
+                    # Columns count characters, so the rest of the line shifts back by however many extra bytes were here
+                    if not string.isascii():
+                        extraBytes = len(string) - len(string.decode("utf-8", "replace"))
+                else:
+                    if kind == "Tag":
+                        name = string[1:].decode("utf-8", "replace")
+                        codes = TagCodes.get(string[1:])
+                        if len(name) > 0:
+                            message = "Unknown tag \"@" + name + "\""
+                        elif m.end() == end:
+                            message = "Unexpected end of file while parsing tag"
+                        else:
+                            message = "Expected a tag name after @"
+                    else:
+                        codes = None
+                        string = string.decode("utf-8", "replace")
+                        # The reader reads a newline ending the last line as the end of the file
+                        if m.end() < end and text.find(b"\n", m.end()) == end - 1:
+                            message = "Unexpected end of file while parsing string " + string + "\n\""
+                        elif m.end() < end:
+                            message = "Unexpected end of line while parsing string " + string + "\n\""
+                        elif len(string) == 1:
+                            message = "Unexpected end of file while parsing string"
+                        else:
+                            message = "Unexpected end of file while parsing string " + string + "\""
+                    if codes is None:
+                        if batch:
+                            yield batch
+                            batch = []
+                            append = batch.append
+                        yield Core.CompileError(message, SI(filename, line, start - lineStart))
+                        panicFrom = m.end()
+                        break
+
+                if store is None:
+                    decoded = strings.get(string)
+                    if decoded is None:
+                        decoded = strings[string] = string.decode("utf-8", "replace")
+                    append(Token(codes[0], codes[1], SI(filename, line, start - lineStart), decoded))
+                else:
+                    ttypes(codes[2])
+                    details(codes[3])
+                    fileIds(fileId)
+                    starts(start)
+                    lengths(len(string))
+
+                if extraBytes:
+                    lineStart += extraBytes
+                    extraBytes = 0
+
+                if stop == end and (kind == "Int" or kind == "Float"):
+                    if batch:
+                        yield batch
+                        batch = []
+                        append = batch.append
+                    yield EndOfFile()
+
+            if panicFrom < 0:
+                break
+            # Panic and move to the next line
+            nextLine = text.find(b"\n", panicFrom)
+            if nextLine < 0:
+                pos = end
+            else:
+                pos = nextLine + 1
+                line += 1
+                lineStart = pos
+
+        if batch:
+            yield batch
+        if includeLocation is not None:
+            yield Core.CompileError("Expected a file name string after include, found end of file", includeLocation)
+
+    @staticmethod
+    def openFile(filename: str, location: Core.SourceInfo, store: TokenStore | None = None) -> tuple[Iterator[List[Token] | LexItem], int]:
+        if not os.path.exists(filename):
+            raise Core.CompileError("Cannot find file '" + filename + "'", location)
+        source = SourceFile.load(filename, store is None)
+        fileId = store.addFile(source) if store is not None else 0
+        return FastScanner.lexSource(source, store, fileId), fileId
+
+    @staticmethod
+    def lexEvents(source: SourceFile) -> LexedFile:
+        store = TokenStore()
+        store.addFile(source)
+        events: List[tuple[int, LexItem]] = []
+        for item in FastScanner.lexSource(source, store, 0):
+            # Compact lexing puts tokens straight into the store, so there are never any batches here
+            if item.__class__ is not list:
+                events.append((len(store), item))
+        # Only the token arrays are kept, whoever uses them has the source already
+        store.sources = []
+        return LexedFile(store, events)
+
+    # Lexes like lexSource would into the given store, but copying tokens out of an earlier lex
+    @staticmethod
+    def replay(lexedFile: LexedFile, store: TokenStore, fileId: int) -> Iterator[LexItem]:
+        copied = 0
+        for count, item in lexedFile.events:
+            store.extendFrom(lexedFile.store, copied, count, fileId)
+            copied = count
+            yield item
+        store.extendFrom(lexedFile.store, copied, len(lexedFile.store), fileId)
+
+    # Produces the same stream as the reader engine: an included file is spliced in where it is included,
+    # and every file is only lexed the first time it is seen. Compact scans give back a TokenStore
+    @staticmethod
+    def scan(filename: str, compact: bool = False, opener = None) -> tuple[bool, List[Token] | TokenStore | List[Core.CompileError]]:
+        # Tokens never form reference cycles, but left running the cyclic collector keeps walking
+        # every token made so far. That was about half of the time spent scanning
+        gcWasEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            if opener is not None:
+                return FastScanner.stitchReplayed(filename, opener, compact)
+            return FastScanner.stitch(filename, compact)
+        finally:
+            if gcWasEnabled:
+                gc.enable()
+
+    @staticmethod
+    def stitch(filename: str, compact: bool = False) -> tuple[bool, List[Token] | TokenStore | List[Core.CompileError]]:
+        tokens: List[Token] = []
+        store = TokenStore() if compact else None
+        errors: List[Core.CompileError] = []
+        for batch in FastScanner.batches(filename, errors, store):
+            tokens.extend(batch)
+
+        if len(errors) > 0:
+            return False, errors
+        return True, store if compact else tokens
+
+    # For files lexed ahead of time, by the parallel scanner or out of the token cache. Replays
+    # only ever fill a store, so a list of tokens is made from that afterwards
+    @staticmethod
+    def stitchReplayed(filename: str, opener, compact: bool = False) -> tuple[bool, List[Token] | TokenStore | List[Core.CompileError]]:
+        store = TokenStore()
+        errors: List[Core.CompileError] = []
+        for _ in FastScanner.batches(filename, errors, store, opener):
+            pass
+
+        if len(errors) > 0:
+            return False, errors
+        return True, store if compact else store.tokens()
+
+    # Yields tokens one at a time as the files are lexed, with errors added to the list given.
+    # Nothing holds onto the tokens once they've been handed over
+    @staticmethod
+    def stream(filename: str, errors: List[Core.CompileError]) -> Iterator[Token]:
+        for batch in FastScanner.batches(filename, errors):
+            yield from batch
+
+    @staticmethod
+    def batches(filename: str, errors: List[Core.CompileError], store: TokenStore | None = None, opener = None) -> Iterator[List[Token]]:
+        # The parallel scanner and token cache swap in openers that replay files lexed elsewhere
+        if opener is None:
+            opener = FastScanner.openFile
+        lexedFiles: Set[str] = set()
+        # Each frame is [source, file id, where to resume once its include is done, and that as an offset]
+        stack: List[list] = []
+        nullFileId: int | None = None
+
+        try:
+            source, fileId = opener(filename, Core.SourceInfo("NullFile", 0, 0), store)
+            stack.append([source, fileId, None, 0])
+            lexedFiles.add(filename)
+        except Core.CompileError as cError:
+            errors.append(cError)
+
+        while len(stack) > 0 and len(errors) < Core.MAX_ERRORS:
+            frame = stack[-1]
+            for item in frame[0]:
+                if item.__class__ is list:
+                    yield item
+                elif item.__class__ is Include:
+                    frame[2] = item.resume
+                    frame[3] = item.resumeOffset
+                    if item.endsFile:
+                        stack.pop()
+                    if not item.path in lexedFiles:
+                        try:
+                            source, fileId = opener(item.path, item.resume, store)
+                            stack.append([source, fileId, None, 0])
+                            lexedFiles.add(item.path)
+                        except Core.CompileError as cError:
+                            errors.append(cError)
+                    break
+                elif item.__class__ is EndOfFile:
+                    parent = stack[-2] if len(stack) > 1 else None
+                    if store is None:
+                        yield [Token(TT.EOF, None, parent[2] if parent is not None else Core.SourceInfo("NullFile", 0, 0), "")]
+                    elif parent is not None:
+                        store.append(TT.EOF, None, parent[1], parent[3], 0)
+                    else:
+                        if nullFileId is None:
+                            nullFileId = store.addFile(SourceFile("NullFile", b""))
+                        store.append(TT.EOF, None, nullFileId, 0, 0)
+                else:
+                    errors.append(item)
+                    if len(errors) >= Core.MAX_ERRORS:
+                        break
+            else:
+                stack.pop()
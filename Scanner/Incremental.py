@@ -0,0 +1,216 @@
+import re
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import List
+import Core
+from Scanner.Tokens import *
+from Scanner.Source import SourceFile
+from Scanner.FastScanner import FastScanner, tokenPattern, Include, EndOfFile, LexItem
+
+# After a newline, a carriage return on its own or spaces running into the end of the file are swallowed as
+# whitespace, but lexed from the start of the line they're errors. Lines that start like that aren't safe to restart from
+unsafeLinePattern = re.compile(rb"[ \t]*(?:\r(?!\n)|\Z)")
+leadingSpacePattern = re.compile(rb"[ \t\r]*")
+
+# Lines and columns are counted like SourceInfo, from 0 and in characters. The end is exclusive
+@dataclass
+class TextEdit:
+    startLine: int
+    startColumn: int
+    endLine: int
+    endColumn: int
+    text: str
+
+# Tokens [start, oldEnd) of the stream before the edit were replaced by [start, newEnd) of the one after it.
+# Everything past the range is the same tokens as before, moved down however many lines the edit added
+@dataclass
+class Relex:
+    tokens: List[Token]
+    start: int
+    oldEnd: int
+    newEnd: int
+
+# Keeps one file's tokens up to date as it's edited, for editors. Includes aren't followed, they're only
+# kept as items like the errors are. Strings and comments never run past the end of a line, so lexing can
+# restart from any line start, as long as an include isn't still waiting for its file name there. After an edit
+# only the lines from the edit up to where the tokens are the same as before again are lexed
+class IncrementalScanner:
+
+    def __init__(self, filename: str, text: str | None = None):
+        if text is None:
+            # Edits make new buffers, so there's no point holding the file open
+            loaded = SourceFile.load(filename)
+            self.source = SourceFile(filename, bytes(loaded.buffer))
+            loaded.close()
+        else:
+            self.source = SourceFile.fromText(filename, text)
+        self.tokens: List[Token] = []
+        # Includes, errors and end of file markers, with how many tokens came before them
+        self.items: List[tuple[int, LexItem]] = []
+        for item in FastScanner.lexSource(self.source):
+            if item.__class__ is list:
+                self.tokens.extend(item)
+            else:
+                self.items.append((len(self.tokens), item))
+
+    def errors(self) -> List[Core.CompileError]:
+        return [item for _, item in self.items if isinstance(item, Core.CompileError)]
+
+    def includes(self) -> List[Include]:
+        return [item for _, item in self.items if item.__class__ is Include]
+
+    @staticmethod
+    def itemLine(item: LexItem) -> int:
+        if item.__class__ is EndOfFile:
+            return 1 << 62
+        return item.location.line_number
+
+    # Whatever was lexed last before the start of this line, as (line, whether it was the word include)
+    @staticmethod
+    def lastLexeme(source: SourceFile, line: int) -> tuple[int, bool] | None:
+        lineStarts = source.getLineStarts()
+        for previous in range(line - 1, -1, -1):
+            last = None
+            start = lineStarts[previous]
+            if previous > 0:
+                # Swallowed by the newline before it, as far as the lexer is concerned
+                start = leadingSpacePattern.match(source.buffer, start).end()
+            for m in tokenPattern.finditer(source.buffer, start, lineStarts[previous + 1]):
+                if m.lastgroup != "Newline" and m.lastgroup != "Comment":
+                    last = m
+            if last is not None:
+                return previous, last.lastgroup == "Word" and last.group("Word") == b"include"
+        return None
+
+    # Lexing from the start of this line gives the same as lexing from the start of the file would. Only ever wrong by saying no
+    @staticmethod
+    def startsClean(source: SourceFile, line: int) -> bool:
+        if line > 0 and unsafeLinePattern.match(source.buffer, source.getLineStarts()[line]):
+            return False
+        last = IncrementalScanner.lastLexeme(source, line)
+        return last is None or not last[1]
+
+    # A line at or before this one where lexing can start from
+    @staticmethod
+    def restartLine(source: SourceFile, line: int) -> int:
+        while line > 0:
+            if unsafeLinePattern.match(source.buffer, source.getLineStarts()[line]):
+                line -= 1
+                continue
+            last = IncrementalScanner.lastLexeme(source, line)
+            if last is None or not last[1]:
+                break
+            line = last[0]
+        return line
+
+    @staticmethod
+    def byteOffset(source: SourceFile, line: int, column: int) -> int:
+        lineStarts = source.getLineStarts()
+        if line >= len(lineStarts):
+            return len(source)
+        lineStart = lineStarts[line]
+        lineEnd = lineStarts[line + 1] if line + 1 < len(lineStarts) else len(source)
+        return lineStart + len(source.string(lineStart, lineEnd)[:column].encode("utf-8"))
+
+    @staticmethod
+    def shiftItem(item: LexItem, lines: int, offset: int) -> LexItem:
+        SI = Core.SourceInfo
+        if item.__class__ is Include:
+            return Include(
+                item.path,
+                SI(item.location.source_name, item.location.line_number + lines, item.location.column_number),
+                SI(item.resume.source_name, item.resume.line_number + lines, item.resume.column_number),
+                item.resumeOffset + offset, item.endsFile
+            )
+        if item.__class__ is EndOfFile:
+            return item
+        return item.__class__(item.message, SI(item.location.source_name, item.location.line_number + lines, item.location.column_number))
+
+    def edit(self, edit: TextEdit) -> Relex:
+        old = self.source
+        oldStarts = old.getLineStarts()
+        start = IncrementalScanner.byteOffset(old, edit.startLine, edit.startColumn)
+        end = IncrementalScanner.byteOffset(old, edit.endLine, edit.endColumn)
+        replacement = edit.text.encode("utf-8")
+        byteDelta = len(replacement) - (end - start)
+        startLine = bisect_left(oldStarts, start + 1) - 1
+        endLine = bisect_left(oldStarts, end + 1) - 1
+
+        # Line starts before the edit stay put and the ones after it just move, only the edited lines are looked for
+        newStarts = oldStarts[:startLine + 1]
+        newLine = replacement.find(b"\n")
+        while newLine >= 0:
+            newStarts.append(start + newLine + 1)
+            newLine = replacement.find(b"\n", newLine + 1)
+        newStarts.extend(array("I", [lineStart + byteDelta for lineStart in oldStarts[endLine + 1:]]))
+        new = SourceFile(old.filename, old.buffer[:start] + replacement + old.buffer[end:])
+        new.lineStarts = newStarts
+        lineDelta = len(newStarts) - len(oldStarts)
+        lastEditedLine = startLine + replacement.count(b"\n")
+
+        restart = IncrementalScanner.restartLine(new, startLine)
+        first = bisect_left(self.tokens, restart, key=lambda token: token.location.line_number)
+        lexed: List[Token] = []
+        lexedItems: List[tuple[int, LexItem]] = []
+        # Where in the old tokens they start matching the new ones again, if they ever do
+        resync: int | None = None
+        lastLine = -1
+        for item in FastScanner.lexSource(new, None, 0, newStarts[restart], restart):
+            if item.__class__ is not list:
+                lexedItems.append((first + len(lexed), item))
+                continue
+            for token in item:
+                line = token.location.line_number
+                if line != lastLine and line > lastEditedLine:
+                    lastLine = line
+                    resync = self.resyncAt(token, lineDelta, new, old)
+                    if resync is not None:
+                        break
+                lastLine = line
+                lexed.append(token)
+            if resync is not None:
+                break
+
+        # Swap the lexed part in, and move everything after it down
+        SI = Core.SourceInfo
+        items = [(index, item) for index, item in self.items if IncrementalScanner.itemLine(item) < restart]
+        if resync is None:
+            # Lexed right to the end, so nothing old is left to keep
+            items.extend(lexedItems)
+            resync = len(self.tokens)
+        else:
+            # The cut is at the start of the line, anything found on it already is kept from before the edit
+            resyncLine = self.tokens[resync].location.line_number
+            items.extend([(index, item) for index, item in lexedItems if IncrementalScanner.itemLine(item) < resyncLine + lineDelta])
+            tokenDelta = len(lexed) - (resync - first)
+            for index, item in self.items:
+                if index >= resync and IncrementalScanner.itemLine(item) >= resyncLine:
+                    items.append((index + tokenDelta, IncrementalScanner.shiftItem(item, lineDelta, byteDelta)))
+        self.items = items
+
+        self.tokens[first:resync] = lexed
+        if lineDelta != 0:
+            filename = new.filename
+            for token in self.tokens[first + len(lexed):]:
+                location = token.location
+                token.location = SI(filename, location.line_number + lineDelta, location.column_number)
+        self.source = new
+        return Relex(self.tokens, first, resync, first + len(lexed))
+
+    # If the old stream has this same token at the start of the same line (once moved by the edit), with the
+    # lexer in the same state at both, everything from there on is unchanged
+    def resyncAt(self, token: Token, lineDelta: int, new: SourceFile, old: SourceFile) -> int | None:
+        line = token.location.line_number
+        oldLine = line - lineDelta
+        index = bisect_left(self.tokens, oldLine, key=lambda oldToken: oldToken.location.line_number)
+        if index >= len(self.tokens):
+            return None
+        candidate = self.tokens[index]
+        if candidate.location.line_number != oldLine or candidate.location.column_number != token.location.column_number:
+            return None
+        if candidate.ttype != token.ttype or candidate.detail != token.detail or candidate.string != token.string:
+            return None
+        if not IncrementalScanner.startsClean(new, line) or not IncrementalScanner.startsClean(old, oldLine):
+            return None
+        return index
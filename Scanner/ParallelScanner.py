@@ -0,0 +1,91 @@
+import os
+import gc
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import List, Dict
+import Core
+from Scanner.Tokens import *
+from Scanner.TokenStore import TokenStore
+from Scanner.Source import SourceFile
+from Scanner.FastScanner import FastScanner, Include, LexedFile
+from Scanner.TokenCache import TokenCache
+
+# Runs in a worker process. Files are lexed on their own, the includes in them are only recorded
+def lexFile(filename: str) -> LexedFile:
+    gc.disable()
+    source = SourceFile.load(filename)
+    lexed = FastScanner.lexEvents(source)
+    source.close()
+    return lexed
+
+# Lexes every file in the include graph across a process pool, then stitches them together with the
+# same stack walk as FastScanner so the order, the include-once rule and the error locations all match
+class ParallelScanner:
+
+    @staticmethod
+    def scan(filename: str, workers: int, compact: bool = False, cache: TokenCache | None = None) -> tuple[bool, List[Token] | TokenStore | List[Core.CompileError]]:
+        lexed = ParallelScanner.lexGraph(filename, workers, cache)
+        return FastScanner.scan(filename, compact, ParallelScanner.replayer(lexed))
+
+    # Breadth first over the include graph, every file is sent off as soon as something includes it.
+    # Files the cache already has are never sent off at all
+    @staticmethod
+    def lexGraph(filename: str, workers: int, cache: TokenCache | None = None) -> Dict[str, LexedFile | BaseException]:
+        lexed: Dict[str, LexedFile | BaseException] = {}
+        if not os.path.exists(filename):
+            return lexed
+
+        found = [filename]
+        submitted = set(found)
+
+        def takeIncludes(result: LexedFile):
+            for _, item in result.events:
+                if item.__class__ is Include and not item.path in submitted and os.path.exists(item.path):
+                    submitted.add(item.path)
+                    found.append(item.path)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending: Dict[Future, tuple[str, str | None]] = {}
+            while len(found) > 0 or len(pending) > 0:
+                while len(found) > 0:
+                    path = found.pop(0)
+                    cacheName = None
+                    if cache is not None:
+                        source = SourceFile.load(path)
+                        cacheName = TokenCache.key(path, source)
+                        cached = cache.get(cacheName, len(source))
+                        source.close()
+                        if cached is not None:
+                            lexed[path] = cached
+                            takeIncludes(cached)
+                            continue
+                    pending[pool.submit(lexFile, path)] = (path, cacheName)
+                if len(pending) == 0:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, cacheName = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as error:
+                        # Kept for the stitcher, so it only surfaces if the file is really reached
+                        lexed[path] = error
+                        continue
+                    lexed[path] = result
+                    if cacheName is not None:
+                        cache.put(cacheName, result)
+                    takeIncludes(result)
+        return lexed
+
+    # An opener for FastScanner.batches that hands back what the workers made rather than lexing again
+    @staticmethod
+    def replayer(lexed: Dict[str, LexedFile | BaseException]):
+        def openFile(filename: str, location: Core.SourceInfo, store: TokenStore):
+            result = lexed.get(filename)
+            if result is None:
+                raise Core.CompileError("Cannot find file '" + filename + "'", location)
+            if isinstance(result, BaseException):
+                raise result
+            fileId = store.addFile(SourceFile.load(filename, False))
+            return FastScanner.replay(result, store, fileId), fileId
+        return openFile
@@ -1,9 +1,15 @@
-from typing import List, Set
+from typing import List, Set, Iterator
 from dataclasses import dataclass
 import os
+import re
 import Core
 from enum import Enum
 from Scanner.Tokens import *
+from Scanner.FastScanner import FastScanner
+from Scanner.ParallelScanner import ParallelScanner
+from Scanner.TokenCache import TokenCache
+from Scanner.TokenStore import TokenStore
+from Scanner.Source import SourceFile
 
 @dataclass
 class File:
@@ -12,26 +18,42 @@ class File:
     lineNumber: int = 0
     charNumber: int = 0
 
+wordPattern = re.compile("[" + re.escape("".join(charset.alphanumeric)) + "]*")
+
+class ScanEngine(Enum):
+    # The original character at a time reader, kept around to check the fast engine against
+    Reader = 0
+    Fast = 1
+
 class ReadResult(Enum):
     Read = 0
     EndOfLine = 1
     EndOfFile = 2
 
 class Reader:
-    @Core.orErrorMethod
-    def openFile(self, filename: str) -> None | Core.CompileError:
+    def openFile(self, filename: str, diagnostics: Core.Diagnostics) -> None | Core.Failed:
         if not (filename in self.lexedFiles):
             if not os.path.exists(filename):
-                raise Core.CompileError("Cannot find file '" + filename + "'", self.getSourceInfo())
-            io = open(filename, "r")
-            self.files.append(File(io.readlines(), filename))
+                return diagnostics.error("Cannot find file '" + filename + "'", self.getSourceInfo())
+            source = SourceFile.load(filename)
+            lines = Reader.splitLines(source.text())
+            source.close()
+            # An empty file has nothing to read, so it's never pushed
+            if len(lines) > 0:
+                self.files.append(File(lines, filename))
             self.lexedFiles.add(filename)
         return None
 
-    def __init__(self, firstFilename: str):
+    # Lines keep their newline, and \r\n counts as one. A lone \r isn't a newline, like in the fast engine
+    @staticmethod
+    def splitLines(text: str) -> List[str]:
+        lines = text.replace("\r\n", "\n").split("\n")
+        return [line + "\n" for line in lines[:-1]] + ([lines[-1]] if len(lines[-1]) > 0 else [])
+
+    def __init__(self, firstFilename: str, diagnostics: Core.Diagnostics):
         self.lexedFiles: Set[str] = set()
         self.files: List[File] = []
-        self.openFile(firstFilename)
+        self.openFile(firstFilename, diagnostics)
 
     def reading(self) -> bool:
         return len(self.files) > 0
@@ -44,9 +66,13 @@ class Reader:
     
     def get(self) -> tuple[str, ReadResult]:
         value = self.peek()
+        return value, self.skipTo(self.files[-1].charNumber + 1)
+
+    # Moves along the current line, wrapping onto the next line or file if that was the end of it
+    def skipTo(self, charNumber: int) -> ReadResult:
         result: ReadResult = ReadResult.Read
         currFile = self.files[-1]
-        currFile.charNumber += 1
+        currFile.charNumber = charNumber
         if currFile.charNumber == len(currFile.contents[currFile.lineNumber]):
             currFile.charNumber = 0
             currFile.lineNumber += 1
@@ -54,8 +80,15 @@ class Reader:
             if currFile.lineNumber == len(currFile.contents):
                 self.files.pop()
                 result = ReadResult.EndOfFile
+        return result
 
-        return value, result
+    # Reads the longest run of identifier characters in one go
+    def readWord(self) -> tuple[str, ReadResult]:
+        currFile = self.files[-1]
+        line = currFile.contents[currFile.lineNumber]
+        end = wordPattern.match(line, currFile.charNumber).end()
+        word = line[currFile.charNumber : end]
+        return word, self.skipTo(end)
 
     def match(self, word: str) -> tuple[bool, Core.SourceInfo]:
         currFile = self.files[-1]
@@ -71,20 +104,38 @@ class Reader:
         
         return False, si
 
+    # The file and line being read, for panicking to the end of that line later
+    def lineMark(self) -> tuple[File, int]:
+        return self.files[-1], self.files[-1].lineNumber
+
+    def onLine(self, mark: tuple[File, int]) -> bool:
+        return len(self.files) > 0 and self.files[-1] is mark[0] and mark[0].lineNumber == mark[1]
+
+    # Skips the rest of the marked line, unless reading has already moved past it
+    def skipLine(self, mark: tuple[File, int]):
+        while self.onLine(mark):
+            self.get()
+
     def getSourceInfo(self) -> Core.SourceInfo:
         currFile = self.files[-1] if len(self.files) > 0 else File([], "NullFile")
         return Core.SourceInfo(currFile.filename, currFile.lineNumber, currFile.charNumber)
     
+    # A lone \r is only whitespace in the blank run after a newline, which is where the fast engine swallows it
     def removeWhitespace(self):
         removing = True
+        afterNewline = False
         while removing and len(self.files) > 0:
-            while self.peek() in charset.whitespace:
-                self.get()
-            if self.peek() == charset.commentChar:
+            while len(self.files) > 0 and (self.peek() in charset.whitespace or (afterNewline and self.peek() == "\r")):
+                char, result = self.get()
+                afterNewline = (afterNewline or char == "\n") and result != ReadResult.EndOfFile
+            if len(self.files) == 0:
+                removing = False
+            elif self.peek() == charset.commentChar:
                 result = ReadResult.Read
                 # Keep removing until the end of the line
                 while result == ReadResult.Read:
                     _, result = self.get()
+                afterNewline = result == ReadResult.EndOfLine
             # Not whitespace nor comment, its real
             else:
                 removing = False
@@ -92,9 +143,9 @@ class Reader:
 class Scanner:
 
     # TODO: We don't handle binary and hex literals yet
+    # Like the parser, these report errors to the diagnostics and give back FAILED rather than raising them
     @staticmethod
-    @Core.orErrorMethod
-    def tokeniseNumber(reader: Reader) -> List[Token] | Core.CompileError:
+    def tokeniseNumber(reader: Reader) -> List[Token]:
         innerString = ""
         parsingOneNumber = True
         had_dot = False
@@ -124,23 +175,22 @@ class Scanner:
     
     # TODO: We don't handle escape characters yet
     @staticmethod
-    @Core.orErrorMethod
-    def tokeniseString(reader: Reader) -> List[Token] | Core.CompileError:
+    def tokeniseString(reader: Reader, diagnostics: Core.Diagnostics) -> List[Token] | Core.Failed:
         si = reader.getSourceInfo()
         innerString = "\""
         # Burn the first "
         _, outcome = reader.get()
         if outcome == ReadResult.EndOfLine:
-            raise Core.CompileError("Unexpected end of line while parsing string", si)
+            return diagnostics.error("Unexpected end of line while parsing string", si)
         if outcome == ReadResult.EndOfFile:
-            raise Core.CompileError("Unexpected end of file while parsing string", si)
+            return diagnostics.error("Unexpected end of file while parsing string", si)
         while reader.peek() != "\"":
             nextChar, outcome = reader.get()
             innerString += nextChar
             if outcome == ReadResult.EndOfLine:
-                raise Core.CompileError("Unexpected end of line while parsing string " + innerString + '"', si)
+                return diagnostics.error("Unexpected end of line while parsing string " + innerString + '"', si)
             if outcome == ReadResult.EndOfFile:
-                raise Core.CompileError("Unexpected end of file while parsing string " + innerString + '"', si)
+                return diagnostics.error("Unexpected end of file while parsing string " + innerString + '"', si)
         # Burn that last "
         reader.get()
         innerString += "\""
@@ -149,25 +199,23 @@ class Scanner:
         )]
     
     @staticmethod
-    @Core.orErrorMethod
-    def tokeniseTag(reader: Reader) -> List[Token] | Core.CompileError:
+    def tokeniseTag(reader: Reader, diagnostics: Core.Diagnostics) -> List[Token] | Core.Failed:
         si = reader.getSourceInfo()
         _, outcome = reader.get()
         if outcome == ReadResult.EndOfLine:
-            raise Core.CompileError("Unexpected end of line while parsing tag", si)
+            return diagnostics.error("Unexpected end of line while parsing tag", si)
         if outcome == ReadResult.EndOfFile:
-            raise Core.CompileError("Unexpected end of file while parsing tag", si)
+            return diagnostics.error("Unexpected end of file while parsing tag", si)
         
-        for possibleTag in TagTypeMap.keys():
-            matched, _ = reader.match(possibleTag)
-            if matched:
-                return [Token(
-                    TT.Tag, TagTypeMap[possibleTag], si, "@" + possibleTag
-                )]
+        tagName, _ = reader.readWord()
+        if not tagName in TagTypeMap:
+            return diagnostics.error("Unknown tag \"@" + tagName + "\"" if len(tagName) > 0 else "Expected a tag name after @", si)
+        return [Token(
+            TT.Tag, TagTypeMap[tagName], si, "@" + tagName
+        )]
 
     @staticmethod
-    @Core.orErrorMethod
-    def processToken(reader: Reader) -> List[Token] | Core.CompileError:
+    def processToken(reader: Reader, diagnostics: Core.Diagnostics) -> List[Token] | Core.Failed:
         si = reader.getSourceInfo()
 
         # Single character special tokens
@@ -176,9 +224,9 @@ class Scanner:
 
         match reader.peek():
             case "\"":
-                return Scanner.tokeniseString(reader)
+                return Scanner.tokeniseString(reader, diagnostics)
             case "@":
-                return Scanner.tokeniseTag(reader)
+                return Scanner.tokeniseTag(reader, diagnostics)
             case x if x in TokenTypeMap.keys():
                 reader.get()
                 return [Token(
@@ -187,28 +235,16 @@ class Scanner:
             case digit if digit in charset.digits:
                 return Scanner.tokeniseNumber(reader)
             case alphanum if alphanum in charset.alphanumeric:
-                for keyword in KeywordMap.keys():
-                    isKeyword, si = reader.match(keyword)
-                    if isKeyword:
-                        return [Token(
-                            TT.Keyword, KeywordMap[keyword], si, keyword
-                        )]
-                
                 # Identifiers can't start with numbers, but we already checked for digits higher up!
-                identifierString = ""
-                sameLine = True
-                while reader.peek() in charset.alphanumeric and sameLine:
-                    nextChar, outcome = reader.get()
-                    identifierString += nextChar
-                    if outcome != ReadResult.Read:
-                        sameLine = False
+                identifierString, _ = reader.readWord()
+                ttype, detail = WordMap.get(identifierString, (TT.Identifier, IdentifierType.StandardIdentifier))
                 return [Token(
-                    TT.Identifier, IdentifierType.StandardIdentifier, si, identifierString
+                    ttype, detail, si, identifierString
                 )]
             case op if op in charset.operating:
                 identifierString = ""
                 sameLine = True
-                while reader.peek() in charset.operating and sameLine:
+                while sameLine and reader.peek() in charset.operating:
                     nextChar, outcome = reader.get()
                     identifierString += nextChar
                     if outcome != ReadResult.Read:
@@ -225,38 +261,76 @@ class Scanner:
     # TODO: meta not yet implemented properly- doesn't stop and start reading python
     # May change so rather than "meta" being a keyword token, the whole thing is stored
     # as a meta token, with the python being where the subtype normally is
+    # A compact scan gives back a TokenStore rather than a list of tokens. Only the fast engine can do that,
+    # the reader engine always gives back a list. Given a cache, files that haven't changed since they were
+    # last scanned aren't lexed again
+    @staticmethod
+    def scan(filename: str, engine: ScanEngine = ScanEngine.Fast, compact: bool = False, workers: int = 1, cache: TokenCache | None = None) -> tuple[bool, List[Token] | TokenStore | List[Core.CompileError]]:
+        if engine == ScanEngine.Fast:
+            # With more than one worker the files in the include graph are lexed in parallel
+            if workers > 1:
+                return ParallelScanner.scan(filename, workers, compact, cache)
+            if cache is not None:
+                return FastScanner.scan(filename, compact, cache.opener())
+            return FastScanner.scan(filename, compact)
+        return Scanner.scanWithReader(filename)
+
+    # Streaming mode, tokens are handed out as they're lexed and errors land in the given list.
+    # The reader engine has no streaming of its own so it just scans everything up front
+    @staticmethod
+    def stream(filename: str, errors: List[Core.CompileError], engine: ScanEngine = ScanEngine.Fast) -> Iterator[Token]:
+        if engine == ScanEngine.Fast:
+            return FastScanner.stream(filename, errors)
+        success, result = Scanner.scanWithReader(filename)
+        if not success:
+            errors.extend(result)
+            return iter([])
+        return iter(result)
+
+    # Whatever comes after an include instead of a file name is reported as it's written, even if it isn't a
+    # token, so it's read with diagnostics of its own. The rest of the line is skipped like after any error
+    @staticmethod
+    def notFileName(reader: Reader, diagnostics: Core.Diagnostics):
+        mark = reader.lineMark()
+        si = reader.getSourceInfo()
+        line = mark[0].contents[mark[1]]
+        Scanner.processToken(reader, Core.Diagnostics())
+        stop = mark[0].charNumber if reader.onLine(mark) else len(line)
+        diagnostics.error("Expected a file name string after include, found " + line[si.column_number : stop], si)
+        reader.skipLine(mark)
+
     @staticmethod
-    def scan(filename: str) -> tuple[bool, List[Token] | List[Core.CompileError]]:
+    def scanWithReader(filename: str) -> tuple[bool, List[Token] | List[Core.CompileError]]:
         tokens: List[Token] = []
-        errors: List[Core.CompileError] = []
-        reader: Reader = Reader(filename)
+        diagnostics = Core.Diagnostics()
+        reader: Reader = Reader(filename, diagnostics)
 
-        while reader.reading() and len(errors) < Core.MAX_ERRORS:
+        while reader.reading() and not diagnostics.full():
             reader.removeWhitespace()
             if not reader.reading():
                 continue
-            output = Scanner.processToken(reader)
-            if isinstance(output, Core.CompileError):
-                errors.append(output)
-                # Panic and move to the next line/file
-                _, outcome = reader.get()
-                while outcome == ReadResult.Read and reader.reading():
-                    _, outcome = reader.get()
+            mark = reader.lineMark()
+            output = Scanner.processToken(reader, diagnostics)
+            if output is Core.FAILED:
+                # Panic and move to the next line/file. A bad string has already read up to the end of its line
+                reader.skipLine(mark)
             else:
                 if len(output) == 1 and output[0].string == "include":
                     reader.removeWhitespace()
-                    iFile = Scanner.tokeniseString(reader)
-                    if isinstance(iFile, Core.CompileError):
-                        errors.append(iFile)
-                    else:
+                    if not reader.reading():
+                        diagnostics.error("Expected a file name string after include, found end of file", output[0].location)
+                        continue
+                    if reader.peek() != "\"":
+                        Scanner.notFileName(reader, diagnostics)
+                        continue
+                    iFile = Scanner.tokeniseString(reader, diagnostics)
+                    if iFile is not Core.FAILED:
                         filepath = iFile[0].string[1:-1]
-                        fileError = reader.openFile(filepath)
-                        if fileError is not None:
-                            errors.append(fileError)
+                        reader.openFile(filepath, diagnostics)
                 else:
                     for t in output:
                         tokens.append(t)
 
-        if len(errors) > 0:
-            return False, errors
+        if len(diagnostics) > 0:
+            return False, diagnostics.errors
         return True, tokens
@@ -0,0 +1,78 @@
+import mmap
+import re
+from array import array
+from bisect import bisect_right
+from typing import Set
+import Core
+
+nonAsciiPattern = re.compile(rb"[\x80-\xff]")
+
+# One source file as a single buffer, memory mapped where possible. Offsets are byte offsets into it,
+# and line/column come from an index of where each line starts rather than from per-line strings
+class SourceFile:
+
+    def __init__(self, filename: str, buffer: bytes | mmap.mmap):
+        self.filename = filename
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        # Both worked out the first time a location is asked for
+        self.lineStarts: array | None = None
+        self.nonAsciiLines: Set[int] | None = None
+
+    # A map keeps a file descriptor open for as long as it's around, and the file being cut short underneath it
+    # kills the compiler with SIGBUS. So only sources that are done with once they're lexed get mapped, anything
+    # kept around afterwards (like the sources of a TokenStore) reads the file in instead
+    @staticmethod
+    def load(filename: str, mapped: bool = True) -> "SourceFile":
+        with open(filename, "rb") as io:
+            if not mapped:
+                return SourceFile(filename, io.read())
+            try:
+                buffer = mmap.mmap(io.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Empty files can't be mapped, and neither can some special files
+                buffer = io.read()
+        return SourceFile(filename, buffer)
+
+    @staticmethod
+    def fromText(filename: str, text: str) -> "SourceFile":
+        return SourceFile(filename, text.encode("utf-8"))
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    # Zero copy, for when the bytes are all that's wanted
+    def slice(self, start: int, end: int) -> memoryview:
+        return self.view[start:end]
+
+    def string(self, start: int, end: int) -> str:
+        return str(self.view[start:end], "utf-8", "replace")
+
+    def text(self) -> str:
+        return self.string(0, len(self.buffer))
+
+    def getLineStarts(self) -> array:
+        if self.lineStarts is None:
+            lineStarts = array("I", [0])
+            newLine = self.buffer.find(b"\n")
+            while newLine >= 0:
+                lineStarts.append(newLine + 1)
+                newLine = self.buffer.find(b"\n", newLine + 1)
+            self.lineStarts = lineStarts
+        return self.lineStarts
+
+    def locate(self, offset: int) -> Core.SourceInfo:
+        lineStarts = self.getLineStarts()
+        line = bisect_right(lineStarts, offset) - 1
+        column = offset - lineStarts[line]
+        # Columns count characters like they always have, so lines with multi-byte characters need decoding
+        if self.nonAsciiLines is None:
+            self.nonAsciiLines = set([bisect_right(lineStarts, m.start()) - 1 for m in nonAsciiPattern.finditer(self.buffer)])
+        if line in self.nonAsciiLines:
+            column = len(self.string(lineStarts[line], offset))
+        return Core.SourceInfo(self.filename, line, column)
+
+    def close(self):
+        self.view.release()
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
@@ -0,0 +1,194 @@
+import os
+import marshal
+import hashlib
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List
+import Core
+from Scanner.TokenStore import TokenStore
+from Scanner.Source import SourceFile
+from Scanner.FastScanner import FastScanner, LexedFile, Include, EndOfFile, LexItem, SCANNER_VERSION
+
+# Bump whenever the way entries are written changes
+CACHE_VERSION = 1
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    # Source that didn't need lexing because it was found in the cache
+    bytesSaved: int = 0
+    bytesWritten: int = 0
+    evictions: int = 0
+
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        hitRate = 100 * self.hits / lookups if lookups > 0 else 0
+        return "Token cache: %d hits, %d misses (%.0f%% hit rate), %d source bytes not lexed, %d bytes written, %d evicted" % (
+            self.hits, self.misses, hitRate, self.bytesSaved, self.bytesWritten, self.evictions
+        )
+
+def encodeLocation(location: Core.SourceInfo) -> tuple:
+    return (location.source_name, location.line_number, location.column_number)
+
+def decodeLocation(encoded: tuple) -> Core.SourceInfo:
+    return Core.SourceInfo(*encoded)
+
+def encodeItem(item: LexItem) -> tuple:
+    if isinstance(item, Include):
+        return (0, item.path, encodeLocation(item.location), encodeLocation(item.resume), item.resumeOffset, item.endsFile)
+    if isinstance(item, EndOfFile):
+        return (1,)
+    return (2, item.message, encodeLocation(item.location))
+
+def decodeItem(encoded: tuple) -> LexItem:
+    if encoded[0] == 0:
+        _, path, location, resume, resumeOffset, endsFile = encoded
+        return Include(path, decodeLocation(location), decodeLocation(resume), resumeOffset, endsFile)
+    if encoded[0] == 1:
+        return EndOfFile()
+    _, message, location = encoded
+    return Core.CompileError(message, decodeLocation(location))
+
+# Entries are the store's arrays as raw bytes and the items as plain tuples, written with marshal. Unlike
+# unpickling, reading one back can't run anything whatever is in the file, and anything that doesn't decode
+# to a sensible lex is just a miss
+def encodeLexed(lexed: LexedFile) -> bytes:
+    store = lexed.store
+    arrays = tuple([(a.typecode, a.tobytes()) for a in [store.ttypes, store.details, store.starts, store.lengths, store.fileIds]])
+    return marshal.dumps((CACHE_VERSION, arrays, tuple([(count, encodeItem(item)) for count, item in lexed.events])))
+
+def decodeLexed(data: bytes) -> LexedFile | None:
+    decoded = marshal.loads(data)
+    if decoded[0] != CACHE_VERSION:
+        return None
+    _, arrays, events = decoded
+    store = TokenStore()
+    storeArrays: List[array] = [store.ttypes, store.details, store.starts, store.lengths, store.fileIds]
+    if len(arrays) != len(storeArrays):
+        return None
+    for a, (typecode, raw) in zip(storeArrays, arrays):
+        if typecode != a.typecode:
+            return None
+        a.frombytes(raw)
+    if len(set([len(a) for a in storeArrays])) != 1:
+        return None
+    decodedEvents = [(count, decodeItem(item)) for count, item in events]
+    if any([not 0 <= count <= len(store) for count, _ in decodedEvents]):
+        return None
+    return LexedFile(store, decodedEvents)
+
+# Keeps what lexing each file gave on disk, one entry per file, named after a hash of the scanner version,
+# the file's name and its contents. Changing any of those just means a different entry, so nothing is ever
+# invalidated, old entries fall out the back once the cache is over its size limit
+class TokenCache:
+    DIRECTORY = ".sylph-cache"
+    MAX_BYTES = 64 * 1024 * 1024
+    EXTENSION = ".tokens"
+
+    def __init__(self, directory: str = DIRECTORY, maxBytes: int = MAX_BYTES):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.stats = CacheStats()
+        os.makedirs(directory, exist_ok=True)
+
+        # Entry name to size, least recently used first. Uses touch the file, so the order survives between runs
+        self.entries: OrderedDict[str, int] = OrderedDict()
+        found = []
+        for name in os.listdir(directory):
+            if name.endswith(TokenCache.EXTENSION):
+                try:
+                    info = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                found.append((info.st_mtime, name, info.st_size))
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+        self.totalBytes = sum(self.entries.values())
+
+    # Locations in the lexed items name the file, so the name is part of the key along with the contents
+    @staticmethod
+    def key(filename: str, source: SourceFile) -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update((str(CACHE_VERSION) + "\0" + str(SCANNER_VERSION) + "\0" + filename + "\0").encode("utf-8"))
+        digest.update(source.buffer)
+        return digest.hexdigest() + TokenCache.EXTENSION
+
+    def get(self, name: str, sourceBytes: int) -> LexedFile | None:
+        if not name in self.entries:
+            self.stats.misses += 1
+            return None
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as io:
+                lexed = decodeLexed(io.read())
+        except Exception:
+            # Deleted from under us, or left half written by a run that was killed
+            lexed = None
+        if lexed is None:
+            self.forget(name)
+            self.stats.misses += 1
+            return None
+
+        self.entries.move_to_end(name)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.stats.hits += 1
+        self.stats.bytesSaved += sourceBytes
+        return lexed
+
+    def put(self, name: str, lexed: LexedFile):
+        data = encodeLexed(lexed)
+        if len(data) > self.maxBytes:
+            return
+        path = os.path.join(self.directory, name)
+        # Written to the side and moved into place so other runs never see part of an entry
+        partial = path + "." + str(os.getpid())
+        try:
+            with open(partial, "wb") as io:
+                io.write(data)
+            os.replace(partial, path)
+        except OSError:
+            # The cache is only ever an optimisation
+            return
+
+        if name in self.entries:
+            self.totalBytes -= self.entries.pop(name)
+        self.entries[name] = len(data)
+        self.totalBytes += len(data)
+        self.stats.bytesWritten += len(data)
+        self.evict()
+
+    def evict(self):
+        while self.totalBytes > self.maxBytes and len(self.entries) > 0:
+            name, _ = next(iter(self.entries.items()))
+            self.forget(name)
+            self.stats.evictions += 1
+
+    def forget(self, name: str):
+        self.totalBytes -= self.entries.pop(name, 0)
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def lex(self, filename: str, source: SourceFile) -> LexedFile:
+        name = TokenCache.key(filename, source)
+        lexed = self.get(name, len(source))
+        if lexed is None:
+            lexed = FastScanner.lexEvents(source)
+            self.put(name, lexed)
+        return lexed
+
+    # For FastScanner.batches, so files are only lexed when they aren't in the cache
+    def opener(self):
+        def openFile(filename: str, location: Core.SourceInfo, store: TokenStore):
+            if not os.path.exists(filename):
+                raise Core.CompileError("Cannot find file '" + filename + "'", location)
+            source = SourceFile.load(filename, False)
+            fileId = store.addFile(source)
+            return FastScanner.replay(self.lex(filename, source), store, fileId), fileId
+        return openFile
@@ -0,0 +1,146 @@
+import re
+from array import array
+from collections.abc import Sequence
+from itertools import groupby, accumulate
+from typing import List, Dict, Iterator
+import Core
+from Scanner.Tokens import *
+from Scanner.Source import SourceFile
+from Scanner.Brackets import BracketIndex
+
+# Tokens are stored as small integer codes. A token type's code is just its value,
+# subtypes are numbered by their position in this table
+TokenTypes: List[TT | None] = [None] * 256
+for tokenType in TT:
+    TokenTypes[tokenType.value] = tokenType
+
+Subtypes: List[TokenSubtype] = [None, *LiteralType, *IdentifierType, *Keywords, *TagType]
+SubtypeCodes = {subtype: code for code, subtype in enumerate(Subtypes)}
+
+# Every bracket type's code, from OpenBracket up to CloseCurly
+BracketPattern = re.compile(rb"[\x00-\x05]")
+
+# Struct of arrays token buffer. Rather than a Token, a SourceInfo and a string per token, each token
+# is a type code, a subtype code, a file id and a slice of that file's buffer; around 12 bytes all told.
+# Indexing hands out Token views built on demand, so anything taking a list of tokens can take one of these
+class TokenStore(Sequence):
+
+    def __init__(self):
+        self.ttypes = array("B")
+        self.details = array("B")
+        self.starts = array("I")
+        self.lengths = array("I")
+        self.fileIds = array("H")
+
+        self.sources: List[SourceFile] = []
+        self.bracketIndex: BracketIndex | None = None
+
+    def addFile(self, source: SourceFile) -> int:
+        self.sources.append(source)
+        return len(self.sources) - 1
+
+    def append(self, ttype: TT, detail: TokenSubtype, fileId: int, start: int, length: int):
+        self.ttypes.append(ttype.value)
+        self.details.append(SubtypeCodes[detail])
+        self.fileIds.append(fileId)
+        self.starts.append(start)
+        self.lengths.append(length)
+
+    # Copies tokens [start, end) of another store in, as coming from file fileId of this one
+    def extendFrom(self, other: "TokenStore", start: int, end: int, fileId: int):
+        if end <= start:
+            return
+        self.ttypes.extend(other.ttypes[start:end])
+        self.details.extend(other.details[start:end])
+        self.starts.extend(other.starts[start:end])
+        self.lengths.extend(other.lengths[start:end])
+        self.fileIds.extend(array("H", [fileId]) * (end - start))
+
+    def __len__(self) -> int:
+        return len(self.ttypes)
+
+    def __getitem__(self, index: int | slice) -> Token | List[Token]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return Token(TokenTypes[self.ttypes[index]], Subtypes[self.details[index]], self.locationAt(index), self.stringAt(index))
+
+    def __iter__(self) -> Iterator[Token]:
+        for i in range(len(self)):
+            yield self[i]
+
+    # Every token at once. Much quicker than going through the views, as tokens from a file come out in order
+    # so each one's line is found by stepping forward from the last rather than searching
+    def tokens(self) -> List[Token]:
+        tokens: List[Token] = []
+        append = tokens.append
+        SI = Core.SourceInfo
+        strings: Dict[bytes, str] = {}
+        lines = [0] * len(self.sources)
+        fileIds = self.fileIds
+        index = 0
+        # A run of tokens at a time, all from the same file
+        while index < len(fileIds):
+            fileId = fileIds[index]
+            runEnd = index + 1
+            while runEnd < len(fileIds) and fileIds[runEnd] == fileId:
+                runEnd += 1
+
+            source = self.sources[fileId]
+            buffer = source.buffer
+            filename = source.filename
+            lineStarts = source.getLineStarts()
+            lastLine = len(lineStarts) - 1
+            source.locate(0)
+            nonAsciiLines = source.nonAsciiLines
+            line = lines[fileId]
+            lineStart = lineStarts[line]
+            nextLineStart = lineStarts[line + 1] if line < lastLine else len(buffer) + 1
+            for ttype, detail, start, length in zip(self.ttypes[index:runEnd], self.details[index:runEnd], self.starts[index:runEnd], self.lengths[index:runEnd]):
+                raw = buffer[start:start + length]
+                string = strings.get(raw)
+                if string is None:
+                    string = strings[raw] = raw.decode("utf-8", "replace")
+
+                if start >= nextLineStart or start < lineStart:
+                    if start < lineStart:
+                        line = source.locate(start).line_number
+                    while line < lastLine and lineStarts[line + 1] <= start:
+                        line += 1
+                    lineStart = lineStarts[line]
+                    nextLineStart = lineStarts[line + 1] if line < lastLine else len(buffer) + 1
+                if line in nonAsciiLines:
+                    location = source.locate(start)
+                else:
+                    location = SI(filename, line, start - lineStart)
+                append(Token(TokenTypes[ttype], Subtypes[detail], location, string))
+            lines[fileId] = line
+            index = runEnd
+        return tokens
+
+    def ttypeAt(self, index: int) -> TT:
+        return TokenTypes[self.ttypes[index]]
+
+    def detailAt(self, index: int) -> TokenSubtype:
+        return Subtypes[self.details[index]]
+
+    def stringAt(self, index: int) -> str:
+        start = self.starts[index]
+        return self.sources[self.fileIds[index]].string(start, start + self.lengths[index])
+
+    def locationAt(self, index: int) -> Core.SourceInfo:
+        return self.sources[self.fileIds[index]].locate(self.starts[index])
+
+    # Made the first time it's asked for, and again if tokens have been added since. The brackets are found
+    # by searching the type codes, and the file runs by grouping the file ids, without a step per token
+    def brackets(self) -> BracketIndex:
+        if self.bracketIndex is None or len(self.bracketIndex) != len(self):
+            codes = self.ttypes.tobytes()
+            positions = [m.start() for m in BracketPattern.finditer(codes)]
+            fileStarts = list(accumulate([len(list(run)) for _, run in groupby(self.fileIds)]))[:-1]
+            self.bracketIndex = BracketIndex.build(len(self), positions, [codes[position] for position in positions], fileStarts)
+        return self.bracketIndex
+
+    def nbytes(self) -> int:
+        return sum([a.itemsize * len(a) for a in [self.ttypes, self.details, self.starts, self.lengths, self.fileIds]])
@@ -1,7 +1,7 @@
 from enum import Enum
 from dataclasses import dataclass
 import Core
-from typing import List
+from typing import List, Dict
 
 class charset:
     roman = [chr(i) for i in range(ord('a'), ord('z') + 1)] + [chr(i) for i in range(ord('A'), ord('Z') + 1)]
@@ -68,6 +68,10 @@ TagTypeMap = {
     "prefix": TagType.Prefix, "infix": TagType.Infix, "postfix": TagType.Postfix
 }
 
+LiteralMap = {
+    "true": LiteralType.BoolLit, "false": LiteralType.BoolLit, "null": LiteralType.NullLit
+}
+
 class TokenType(Enum):
     OpenBracket = 0
     CloseBracket = 1
@@ -101,7 +105,14 @@ TokenTypeMap = {
 
 TokenSubtype = LiteralType | IdentifierType | Keywords | TagType | None
 
-@dataclass
+# Scanners read the longest identifier they can and then classify it here with a single lookup,
+# so adding keywords doesn't make every identifier slower. Anything missing is a plain identifier
+WordMap: Dict[str, tuple[TT, TokenSubtype]] = {
+    **{word: (TT.Keyword, keyword) for word, keyword in KeywordMap.items()},
+    **{word: (TT.Literal, literal) for word, literal in LiteralMap.items()}
+}
+
+@dataclass(slots=True)
 class Token:
     ttype: TT
     detail: TokenSubtype
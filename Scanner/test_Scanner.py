@@ -0,0 +1,122 @@
+import os
+import pickle
+import pytest
+from Scanner.Scanner import Scanner, ScanEngine
+from Scanner.Source import SourceFile
+from Scanner.TokenCache import TokenCache
+
+# The reader engine is the reference, the fast engine has to give exactly the same tokens for the same files,
+# in a list or a TokenStore
+
+def tokensOf(tokens) -> list:
+    return [(token.ttype, token.detail, token.string, token.location) for token in tokens]
+
+def scanBoth(path, text: str) -> tuple[tuple, tuple, tuple]:
+    # Written as is, so carriage returns stay where they were put
+    with open(path, "w", newline="") as io:
+        io.write(text)
+    reader = Scanner.scan(path.name, ScanEngine.Reader)
+    fast = Scanner.scan(path.name, ScanEngine.Fast)
+    compact = Scanner.scan(path.name, ScanEngine.Fast, compact=True)
+    return reader, fast, compact
+
+def assertSame(reader: tuple, fast: tuple, compact: tuple):
+    assert reader[0] == fast[0] == compact[0]
+    if reader[0]:
+        assert tokensOf(reader[1]) == tokensOf(fast[1]) == tokensOf(compact[1].tokens())
+    else:
+        assert [str(error) for error in reader[1]] == [str(error) for error in fast[1]] == [str(error) for error in compact[1]]
+
+@pytest.mark.parametrize("text", [
+    "using A = i32 ",
+    "using A = i32\t\t",
+    "using A = i32 \t ",
+    "using A = i32\n   ",
+    "func f() -> i32 = 1 ",
+    "func f() -> i32 = 1",
+    "func f() -> i32 {\n    return 1\n}  \t",
+    "# just a comment ",
+    "   ",
+])
+def test_trailing_whitespace(tmp_path, monkeypatch, text: str):
+    monkeypatch.chdir(tmp_path)
+    reader, fast, compact = scanBoth(tmp_path / "trailing.syl", text)
+    assert reader[0], reader[1]
+    assertSame(reader, fast, compact)
+
+@pytest.mark.parametrize("text", [
+    "using A = (i32, i32) -> i32\nfunc f(a: A) -> i32 {\n    return a(1, 2)\n}\n",
+    "@infix\nfunc +(a: i32, b: i32) -> i32 = a\n",
+    "func f() -> string = \"héllo\" # ünicode\n",
+    "func f() -> i32 = \"unterminated\n",
+    "@nothing\n",
+    "func f() -> i32 = 1.5f + 2\n",
+    "include 5\nusing A = i32\n",
+    "include @bad x\nusing A = i32\n",
+    "include",
+    "using A = i32\rusing B = i32\r\n",
+    "using A = i32\n \r\r# comment\n\rusing B = i32\n",
+    "@bad\n\rusing A = i32\n",
+    "x := \"bad\ny := @oops\nz\n",
+    "",
+])
+def test_engines_agree(tmp_path, monkeypatch, text: str):
+    monkeypatch.chdir(tmp_path)
+    assertSame(*scanBoth(tmp_path / "source.syl", text))
+
+def test_includes_agree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "included.syl").write_text("using B = i32 ")
+    assertSame(*scanBoth(tmp_path / "source.syl", "include \"included.syl\"\nusing A = B\n"))
+
+# A TokenStore's tokens read their strings out of the source long after scanning, which has to keep working
+# whatever happens to the file. Had the source still been mapped, cutting the file short would be a SIGBUS
+@pytest.mark.parametrize("workers, cached", [(1, False), (1, True), (2, False)])
+def test_stores_outlive_their_files(tmp_path, monkeypatch, workers: int, cached: bool):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "included.syl").write_text("using B = i32\n" * 2000)
+    (tmp_path / "source.syl").write_text("include \"included.syl\"\nusing A = B\n")
+    cache = TokenCache(str(tmp_path / "cache")) if cached else None
+    success, store = Scanner.scan("source.syl", compact=True, workers=workers, cache=cache)
+    assert success, store
+    expected = tokensOf(Scanner.scan("source.syl")[1])
+    (tmp_path / "included.syl").write_text("")
+    (tmp_path / "source.syl").write_text("")
+    assert tokensOf(store.tokens()) == expected
+
+CACHED = "include \"included.syl\"\nusing A = B\nfunc f() -> i32 = \"unterminated\n"
+
+# Cached lexes come back as the same tokens and errors, includes and all
+def test_cached_lexes_agree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "included.syl").write_text("using B = i32\n")
+    (tmp_path / "source.syl").write_text(CACHED)
+    uncached = Scanner.scan("source.syl")
+    cache = TokenCache(str(tmp_path / "cache"))
+    for _ in range(2):
+        assertSame(uncached, Scanner.scan("source.syl", cache=cache), Scanner.scan("source.syl", compact=True, cache=TokenCache(str(tmp_path / "cache"))))
+    assert cache.stats.hits == 2
+
+# Whatever ends up in an entry, reading it back never runs anything, and an entry that doesn't decode is lexed again
+class Planted:
+    def __init__(self, marker: str):
+        self.marker = marker
+
+    def __reduce__(self):
+        return (os.mkdir, (self.marker,))
+
+@pytest.mark.parametrize("planted", ["pickle", "garbage", "empty"])
+def test_bad_entries_are_misses(tmp_path, monkeypatch, planted: str):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "included.syl").write_text("using B = i32\n")
+    (tmp_path / "source.syl").write_text(CACHED)
+    marker = str(tmp_path / "ran")
+    data = {"pickle": pickle.dumps(Planted(marker)), "garbage": b"\xff" * 64, "empty": b""}[planted]
+    for filename in ["source.syl", "included.syl"]:
+        name = TokenCache.key(filename, SourceFile.load(filename, False))
+        os.makedirs("cache", exist_ok=True)
+        (tmp_path / "cache" / name).write_bytes(data)
+    cache = TokenCache(str(tmp_path / "cache"))
+    assertSame(Scanner.scan("source.syl"), Scanner.scan("source.syl", cache=cache), Scanner.scan("source.syl", compact=True))
+    assert not os.path.exists(marker)
+    assert (cache.stats.hits, cache.stats.misses) == (0, 2)
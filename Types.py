@@ -1,65 +1,94 @@
-from dataclasses import dataclass
-from typing import List
-
-# How big is a pointer
-ARCH_PTR_SIZE = 8
+from dataclasses import dataclass, fields
+from typing import List, Dict
 
 # TODO: All sorts of stuff to check which type gets a free cast and to compare if two types are equal
 
-class SylphType:
-    def getSize(self):
-        pass
+# Every distinct type only ever exists once. Making one looks it up by its (normalised) fields first,
+# so two types are equal exactly when they're the same object, and they hash as cheaply as any object
+class InternedType(type):
+    table: Dict[tuple, object] = {}
+
+    def __call__(cls, *args, **kwargs):
+        args = cls.normalise(*args, **kwargs)
+        # Some types normalise to something else entirely, like a sum with only one option
+        if not isinstance(args, tuple):
+            return args
+        key = (cls, *args)
+        interned = InternedType.table.get(key)
+        if interned is None:
+            interned = InternedType.table[key] = super().__call__(*args)
+        return interned
+
+class SylphType(metaclass=InternedType):
+    @classmethod
+    def normalise(cls, *args, **kwargs) -> tuple:
+        if not kwargs:
+            return args
+        return args + tuple([kwargs[field.name] for field in fields(cls)[len(args):]])
+
+    # Sizes depend on what we're compiling for, so the layout engine works them out (once) for a target
+    def getSize(self, target=None) -> int:
+        from Layout import LayoutEngine, DEFAULT_TARGET
+        return LayoutEngine.forTarget(target or DEFAULT_TARGET).sizeOf(self)
+
+    # Copies and unpickled types go back through the table like any other
+    def __reduce__(self):
+        return (self.__class__, tuple([getattr(self, field.name) for field in fields(self)]))
 
 class BaseType(SylphType):
     pass
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class IntType(BaseType):
     unsigned: bool
     sizeBytes: int
-    def getSize(self):
-        return self.sizeBytes
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class FloatType(BaseType):
     double: bool
-    def getSize(self):
-        return 8 if self.double else 4
 
+@dataclass(frozen=True, eq=False)
 class BoolType(BaseType):
-    def getSize(self):
-        return 1
+    pass
 
 # Under the hood its just a pointer
+@dataclass(frozen=True, eq=False)
 class StringType(BaseType):
-    def getSize(self):
-        return ARCH_PTR_SIZE
+    pass
 
+@dataclass(frozen=True, eq=False)
 class NullType(BaseType):
-    # Now... I really hope 0 makes sense
-    def getSize(self):
-        return 0
+    pass
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class PtrType(SylphType):
     ptrOf: SylphType
     isArray: bool
     length: int | None
-    def getSize(self):
-        if self.isArray:
-            return self.ptrOf.getSize() * self.length
-        return ARCH_PTR_SIZE
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class FunctionPtr(SylphType):
-    argumentTypes: List[SylphType]
+    argumentTypes: tuple[SylphType, ...]
     returnType: SylphType
-    def getSize(self):
-        return ARCH_PTR_SIZE
 
-@dataclass
+    @classmethod
+    def normalise(cls, argumentTypes: List[SylphType], returnType: SylphType) -> tuple:
+        return (tuple(argumentTypes), returnType)
+
+@dataclass(frozen=True, eq=False)
 class SumType(SylphType):
-    options: List[SylphType]
-    # Largest option, plus one 8 bit tag of what the type is rn
-    def getSize(self):
-        return max([i.getSize() for i in self.options]) + 1
+    options: tuple[SylphType, ...]
+
+    # Sums of sums are one sum, and each option only counts once. Order is kept, first appearance first
+    @classmethod
+    def normalise(cls, options: List[SylphType]) -> tuple | SylphType:
+        flattened: Dict[SylphType, None] = {}
+        for option in options:
+            if isinstance(option, SumType):
+                for inner in option.options:
+                    flattened[inner] = None
+            else:
+                flattened[option] = None
+        if len(flattened) == 1:
+            return next(iter(flattened))
+        return (tuple(flattened),)
@@ -0,0 +1,47 @@
+import argparse
+import json
+import os
+import socket
+import sys
+from typing import List
+
+# Hands files to a running server.py to compile. Only the standard library is imported here, so starting
+# this up costs next to nothing next to running main.py
+
+SOCKET = ".sylph-server.sock"
+
+def request(message: dict, socketPath: str = SOCKET) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socketPath)
+        with connection.makefile("rwb") as io:
+            io.write((json.dumps(message) + "\n").encode("utf-8"))
+            io.flush()
+            return json.loads(io.readline())
+
+def main(arguments: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="sylph-client", description="Compiles Sylph source files on a running server.py")
+    parser.add_argument("files", nargs="*", default=["simple.syl"])
+    parser.add_argument("--socket", default=SOCKET, help="where the server is listening")
+    parser.add_argument("--time-passes", "--stats", dest="stats", action="store_true", help="report time and counters for each phase")
+    parser.add_argument("--workers", type=int, default=1, help="parse function bodies across this many processes")
+    parser.add_argument("--target", default="x86_64", help="what machine to lay data out for")
+    parser.add_argument("--quiet", action="store_true", help="don't print the collected module")
+    parser.add_argument("--shutdown", action="store_true", help="stop the server")
+    options = parser.parse_args(arguments)
+
+    if options.shutdown:
+        message = {"command": "shutdown"}
+    else:
+        message = {"command": "compile", "cwd": os.getcwd(), "files": options.files, "target": options.target,
+                   "workers": options.workers, "quiet": options.quiet, "stats": options.stats}
+    try:
+        response = request(message, options.socket)
+    except OSError as error:
+        print("Couldn't reach the server at " + options.socket + ": " + str(error))
+        return -1
+    if response.get("output"):
+        print(response["output"])
+    return 0 if response["success"] else -1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
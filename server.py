@@ -0,0 +1,5 @@
+import sys
+from CompileServer import main
+
+# See CompileServer.py, or run with --help, for the options. Compile against it with client.py
+sys.exit(main(sys.argv[1:]))
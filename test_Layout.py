@@ -0,0 +1,56 @@
+from Types import *
+from Layout import LayoutEngine, X86_64, SNES
+
+# SumTest from test.syl
+SUM_TEST = PtrType(SumType([IntType(True, 1), PtrType(StringType(), False, None), FunctionPtr([], NullType()), SumType([IntType(False, 4), FloatType(False)])]), True, 64)
+
+# The old sizes, the largest option plus a byte with no padding, which arrays of sums shouldn't ever be bigger than
+OLD_SIZES = [
+    (SUM_TEST, 576),
+    (PtrType(SumType([IntType(False, 4), FloatType(False)]), True, 1000), 5000),
+    (PtrType(SumType([FloatType(True), IntType(True, 1)]), True, 1000), 9000),
+]
+
+# Arrays of sums keep their tags apart by default: 64 payloads of 8 bytes, then 64 tags of 3 bits
+def test_arrays_of_sums_split_their_tags():
+    engine = LayoutEngine(X86_64)
+    array = engine.layout(SUM_TEST)
+    assert (array.size, array.offsets, array.tag.offset, array.tag.size, array.tag.bits) == (536, (0, 512), 512, 24, 3)
+    for arrayType, oldSize in OLD_SIZES:
+        assert engine.sizeOf(arrayType) < oldSize
+
+def test_referenced_arrays_stay_whole():
+    engine = LayoutEngine(X86_64)
+    holder = SumType([SUM_TEST, NullType()])
+    assert engine.sizeOf(holder) == 544
+    engine.keepWhole(SUM_TEST)
+    element = engine.layout(SUM_TEST.ptrOf)
+    array = engine.layout(SUM_TEST)
+    # Element i is i strides in, tag and all
+    assert (array.size, array.offsets, array.tag) == (element.size * 64, (0,), None)
+    # What had the array inside it is laid out again around its new size. The array's free tag values are enough
+    # to say it's Null
+    assert engine.sizeOf(holder) == 1024
+    # Only the array that was told to is kept whole
+    assert engine.layout(PtrType(SUM_TEST.ptrOf, True, 32)).tag is not None
+
+def test_split_tags_only_when_smaller():
+    small = PtrType(SumType([IntType(True, 1), BoolType()]), True, 1)
+    assert LayoutEngine(SNES).layout(small).tag is None
+
+# Arrays of arrays of sums only split the inner arrays, which are already whole elements
+def test_nested_arrays_split_once():
+    engine = LayoutEngine(X86_64)
+    outer = PtrType(SUM_TEST, True, 4)
+    assert (engine.sizeOf(outer), engine.layout(outer).tag) == (536 * 4, None)
+
+def test_sum_test_sizes():
+    assert LayoutEngine(X86_64).sizeOf(SUM_TEST) == 536
+    assert LayoutEngine(SNES).sizeOf(SUM_TEST) == 280
+
+def test_engines_are_shared_while_the_whole_arrays_match():
+    engine = LayoutEngine.forTarget(X86_64)
+    assert LayoutEngine.forTarget(X86_64) is engine
+    whole = LayoutEngine.forTarget(X86_64, {SUM_TEST})
+    assert whole is not engine and whole.sizeOf(SUM_TEST) == 1024
+    assert LayoutEngine.forTarget(X86_64).sizeOf(SUM_TEST) == 536